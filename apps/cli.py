@@ -0,0 +1,120 @@
+# apps/cli.py - Liste Anteprime in modalità batch, senza interfaccia grafica
+#
+# Uso:  python -m winfile scan <cartelle o file>... [--csv lista.csv] [--pdf report.pdf]
+#                               [--html cartella/] [--filtro "tipo:pdf area>1"] [--doppioni] [--jobs N] [--processes]
+#
+# Stesso motore (ScanEngine: analisi, cache, esportazioni CSV, report PDF e anteprima
+# miniature HTML) della scheda Liste Anteprime, senza importare Tk: si può eseguire su
+# un server senza display o in uno script notturno.
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from apps.scanner import (DEFAULT_RENDER_WORKERS, DEFAULT_SCAN_WORKERS, DUPLICATES_PROGRESS, HTML_THUMB_DIR, RENDER_PROGRESS,
+                          SCAN_BATCH, SCAN_PROGRESS, ScanEngine, open_caches)
+
+# Intervallo minimo tra due righe di avanzamento
+PROGRESS_INTERVAL = 1.0
+
+
+class _Progress:
+    """Avanzamento su stderr, al più una riga ogni PROGRESS_INTERVAL secondi."""
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self._last = 0.0
+
+    def __call__(self, text, force=False):
+        if self.quiet: return
+        now = time.monotonic()
+        if not force and now - self._last < PROGRESS_INTERVAL: return
+        self._last = now
+        print(text, file=sys.stderr, flush=True)
+
+
+def run_scan(args):
+    progress = _Progress(args.quiet)
+    paths = [os.path.abspath(p) for p in args.paths]
+    if missing := [p for p in paths if not os.path.exists(p)]:
+        print(f"Percorsi inesistenti: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    scan_workers = args.jobs or DEFAULT_SCAN_WORKERS
+    render_workers = args.jobs or DEFAULT_RENDER_WORKERS
+    engine = ScanEngine(*open_caches()) if not args.no_cache else ScanEngine()
+    # Un solo thread: i blocchi della scansione entrano subito nei risultati
+    engine.subscribe(SCAN_BATCH, engine.add_files)
+    engine.subscribe(SCAN_PROGRESS, lambda current_dir, count: progress(f"Scansione: {current_dir} ({count} file trovati)"))
+    engine.subscribe(DUPLICATES_PROGRESS, lambda done, total: progress(f"Doppioni: {done}/{total} file controllati", force=done == total))
+    engine.subscribe(RENDER_PROGRESS, lambda done, total, rate: progress(f"Miniature: {done}/{total} pagine ({rate:.1f} pag/s)", force=done == total))
+
+    started = time.perf_counter()
+    engine.add_sources(paths)
+    engine.scan(paths, scan_workers)
+    engine.scan_finished()
+    pages, grand = engine.pages(), engine.aggregator.grand
+    area_text = f"{grand.sqm:.4f} m²"
+    if grand.has_trim: area_text += f" (al vivo {grand.trim_sqm:.4f} m²)"
+    progress(f"Scansione completata in {time.perf_counter() - started:.1f} s: {len(engine.results)} file, {len(pages)} pagine, {area_text}", force=True)
+    if args.duplicates:
+        # Prima del filtro: "doppione>0" esporta solo i file doppi
+        engine.apply_duplicates(groups := engine.find_duplicates(engine.duplicate_candidates(), args.jobs))
+        progress(f"Doppioni: {len(engine.duplicates)} file in {len(groups)} gruppi", force=True)
+    if args.filter:
+        # Si esportano solo i file che soddisfano il filtro, come con la ricerca della scheda
+        files = engine.filter(args.filter)
+        pages = engine.pages(files)
+        progress(f"Filtro \"{args.filter}\": {len(files)} file, {len(pages)} pagine", force=True)
+    if not pages:
+        print("Nessun file trovato." if not args.filter else "Nessun file soddisfa il filtro.", file=sys.stderr)
+        return 1
+
+    if args.csv:
+        engine.export_csv(args.csv, pages)
+        progress(f"CSV: {args.csv}", force=True)
+    if args.pdf:
+        engine.export_pdf(args.pdf, pages, columns=args.columns, orientation=args.orientation, processes=args.processes, max_workers=render_workers)
+        progress(f"Report PDF: {args.pdf}", force=True)
+    if args.html:
+        thumbs_dir = os.path.join(args.html, HTML_THUMB_DIR)
+        os.makedirs(thumbs_dir, exist_ok=True)
+        index_path = os.path.join(args.html, "index.html")
+        with open(index_path, 'w', encoding='utf-8') as f:
+            engine.export_html(f, pages, args.quality, thumbs_dir, args.processes, max_workers=render_workers)
+        progress(f"Anteprima miniature: {index_path}", force=True)
+    progress(f"Completato in {time.perf_counter() - started:.1f} s", force=True)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="winfile", description="WinFile - Liste Anteprime in modalità batch")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan_parser = commands.add_parser("scan", help="scansiona cartelle e file ed esporta lista, report e miniature")
+    scan_parser.add_argument("paths", nargs="+", help="cartelle o file da analizzare")
+    scan_parser.add_argument("--csv", metavar="FILE", help="lista delle pagine in CSV")
+    scan_parser.add_argument("--pdf", metavar="FILE", help="report PDF con le miniature")
+    scan_parser.add_argument("--html", metavar="CARTELLA", help="anteprima miniature (index.html e immagini JPEG)")
+    scan_parser.add_argument("--filtro", dest="filter", metavar="TESTO",
+                             help="esporta solo i file trovati dalla ricerca (parole del nome o della sottocartella, "
+                                  "area>M2, pagine>=N, tipo:pdf,tif, colore:cmyk)")
+    scan_parser.add_argument("--doppioni", dest="duplicates", action="store_true",
+                             help="cerca i file con lo stesso contenuto: colonna \"Gruppo Doppioni\" nel CSV e filtro doppione>0")
+    scan_parser.add_argument("--jobs", "-j", type=int, metavar="N", help="thread di scansione e di rendering (predefinito: automatico)")
+    scan_parser.add_argument("--processes", action="store_true", help="renderizza le miniature in processi separati")
+    scan_parser.add_argument("--columns", type=int, default=4, choices=range(1, 21), metavar="1-20", help="colonne del report PDF (predefinito: 4)")
+    scan_parser.add_argument("--orientation", choices=("portrait", "landscape"), default="portrait", help="orientamento del report PDF")
+    scan_parser.add_argument("--quality", choices=("fast", "high"), default="fast", help="risoluzione delle miniature HTML")
+    scan_parser.add_argument("--no-cache", action="store_true", help="non usa né aggiorna le cache di metadati e miniature")
+    scan_parser.add_argument("--quiet", "-q", action="store_true", help="nessun messaggio di avanzamento")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "scan": return run_scan(args)
+    return 2
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,30 @@
+# apps/scanner - Componenti di scansione e analisi usati da Liste Anteprime
+from PIL import Image
+
+# Disabilita il limite di dimensione per le immagini grandi (anche nei processi worker)
+Image.MAX_IMAGE_PIXELS = None
+
+from .scan import DEFAULT_SCAN_WORKERS, PROGRESS_INTERVAL, ParallelScanner, ScanJob, diff_scan, iter_scan_files
+from .metadata_cache import MetadataCache, get_user_cache_dir
+from .image_probe import probe_image
+from .pdf_geometry import iter_page_geometry, read_page_geometry
+from .results import ResultStore, full_path_of
+from .page_table import PageTable, PageList, page_totals
+from .aggregate import AreaAggregator, Totals, display_subfolder, subfolder_sort_key
+from .render_pool import DEFAULT_RENDER_WORKERS, RenderPool
+from .thumbnails import placeholder_bytes, placeholder_image, render_thumbnail, thumbnail_job
+from .document_cache import DocumentCache, shared_documents
+from .thumbnail_cache import ThumbnailCache
+from .report_writer import REPORT_THUMB_DPI, StreamingDocTemplate, report_thumb_size, write_pdf_report
+from .analyzer import DEFAULT_DPI, PDF_EAGER_PAGES, FileAnalyzer, pdf_page_detail
+from .csv_export import write_csv
+from .html_gallery import HTML_THUMB_DIR, write_html_gallery
+from .model import FileInfo, PageDetails, PageRef, PageRefs
+from .engine import (DUPLICATES_PROGRESS, REFRESH_CHANGES, RENDER_PROGRESS, SCAN_BATCH, SCAN_FINISHED, SCAN_PROGRESS, WATCH_CHANGES,
+                     WATCH_WARNING, ScanEngine, open_caches, path_is_within)
+from .preview import PREVIEW_CACHE_ITEMS, PREVIEW_DEBOUNCE, PreviewService
+from .sort_keys import SORT_COLUMNS, SortKeys, natural_key
+from .search import FILTER_FIELDS, SearchIndex, SearchQuery, parse_query
+from .watch import (POLL_INTERVAL, WATCH_MAX_DELAY, WATCH_SETTLE, FileWatcher, InotifyBackend, PollingBackend,
+                    default_watch_backend, scan_root_for)
+from .duplicates import DEFAULT_HASH_WORKERS, HASH_READ_RATE, PARTIAL_HASH_BYTES, DuplicateFinder, DuplicateGroup, ReadThrottle
@@ -0,0 +1,134 @@
+# apps/scanner/aggregate.py - Totali per cartella e sottocartella dei risultati
+#
+# I totali (file, pagine, m², m² al vivo) di ogni cartella di scansione e di ogni
+# sottocartella sono mantenuti in modo incrementale: aggiungere, sostituire o
+# rimuovere un file costa quanto le sue pagine, non quanto l'intero elenco.
+# Tabella, copie ed esportazioni leggono i totali da qui.
+import os
+
+from .page_table import file_totals, page_areas
+from .results import full_path_of
+
+
+def display_subfolder(file_info):
+    """Sottocartella del file rispetto alla cartella di scansione: "." oppure "a > b"."""
+    scan_root = file_info.get('scan_root', '')
+    file_dir = file_info['path']
+    if not scan_root or os.path.normpath(file_dir) == os.path.normpath(scan_root):
+        return "."
+    try:
+        return os.path.relpath(file_dir, scan_root).replace(os.path.sep, ' > ')
+    except ValueError:
+        return os.path.basename(file_dir)
+
+
+def subfolder_sort_key(subfolder):
+    # I file della cartella principale (".") vanno in fondo, come nelle esportazioni
+    return subfolder == ".", subfolder
+
+
+class Totals:
+    __slots__ = ("files", "pages", "sqm", "trim_sqm", "pending")
+
+    def __init__(self):
+        self.files = self.pages = self.pending = 0
+        self.sqm = self.trim_sqm = 0.0
+
+    def _apply(self, contribution, sign):
+        self.files += sign
+        self.pages += sign * contribution[2]
+        self.sqm += sign * contribution[3]
+        self.trim_sqm += sign * contribution[4]
+        self.pending += sign * contribution[5]
+
+    def copy(self):
+        other = Totals()
+        other.files, other.pages, other.sqm, other.trim_sqm, other.pending = self.files, self.pages, self.sqm, self.trim_sqm, self.pending
+        return other
+
+    @property
+    def has_trim(self):
+        return abs(self.sqm - self.trim_sqm) > 0.0001
+
+
+class AreaAggregator:
+    """
+    Totali per scan_root, per (scan_root, sottocartella) e complessivi.
+    Ogni file contribuisce una volta sola: aggiungerlo di nuovo ne sostituisce i valori.
+    """
+    def __init__(self):
+        self._roots = {}
+        self._subfolders = {}
+        self._contributions = {}   # percorso -> (scan_root, sottocartella, pagine, m², m² al vivo, in attesa)
+        self.grand = Totals()
+
+    def __len__(self):
+        return len(self._contributions)
+
+    def _apply(self, key, contribution, sign):
+        root, subfolder = contribution[0], contribution[1]
+        for table, table_key in ((self._roots, root), (self._subfolders, (root, subfolder))):
+            totals = table.get(table_key) or table.setdefault(table_key, Totals())
+            totals._apply(contribution, sign)
+            if totals.files == 0: del table[table_key]
+        self.grand._apply(contribution, sign)
+        if sign > 0: self._contributions[key] = contribution
+        else: del self._contributions[key]
+
+    def add_files(self, files):
+        """Aggiunge (o aggiorna) i file con tutte le loro pagine."""
+        files = list(files)
+        areas, trim_areas = file_totals(file_info['pages_details'] for file_info in files)
+        for file_info, area, trim_area in zip(files, areas, trim_areas):
+            key = full_path_of(file_info)
+            if key in self._contributions: self._apply(key, self._contributions[key], -1)
+            contribution = (file_info.get('scan_root', 'N/A'), display_subfolder(file_info), file_info.get('page_count', 1),
+                            area, trim_area, 1 if file_info.get('pages_pending') else 0)
+            self._apply(key, contribution, +1)
+
+    def copy(self):
+        """Copia indipendente, per leggere i totali in un altro thread mentre i risultati cambiano."""
+        other = AreaAggregator()
+        other._roots = {key: totals.copy() for key, totals in self._roots.items()}
+        other._subfolders = {key: totals.copy() for key, totals in self._subfolders.items()}
+        other._contributions = dict(self._contributions)
+        other.grand = self.grand.copy()
+        return other
+
+    def remove_paths(self, paths):
+        for key in paths:
+            if key in self._contributions: self._apply(key, self._contributions[key], -1)
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Totali di un sottoinsieme di pagine ([{'file_info', 'page_num'}], es. una selezione)."""
+        aggregator = cls()
+        areas, trim_areas = page_areas((p['file_info']['pages_details'], p['page_num']) for p in pages)
+        per_file = {}
+        for page_data, area, trim_area in zip(pages, areas, trim_areas):
+            file_info = page_data['file_info']
+            key = full_path_of(file_info)
+            if (entry := per_file.get(key)) is None:
+                entry = per_file[key] = [file_info.get('scan_root', 'N/A'), display_subfolder(file_info), 0, 0.0, 0.0, 0]
+            entry[2] += 1; entry[3] += area; entry[4] += trim_area
+        for key, entry in per_file.items():
+            aggregator._apply(key, tuple(entry), +1)
+        return aggregator
+
+    # --- Lettura ---
+
+    def root(self, scan_root):
+        return self._roots.get(scan_root) or Totals()
+
+    def subfolder(self, scan_root, subfolder):
+        return self._subfolders.get((scan_root, subfolder)) or Totals()
+
+    def file_summary(self, full_path):
+        """(sottocartella, m², m² al vivo) del file come conteggiato nei totali, oppure None."""
+        contribution = self._contributions.get(full_path)
+        return (contribution[1], contribution[3], contribution[4]) if contribution else None
+
+    def subfolder_of(self, file_info):
+        """Sottocartella già calcolata per il file (evita di ripetere relpath)."""
+        contribution = self._contributions.get(full_path_of(file_info))
+        return contribution[1] if contribution else display_subfolder(file_info)
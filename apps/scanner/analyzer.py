@@ -0,0 +1,128 @@
+# apps/scanner/analyzer.py - Analisi dei singoli file (dimensioni, pagine, DPI) per Liste Anteprime
+#
+# Nessuna dipendenza dall'interfaccia: la usano sia la scheda Tk sia la modalità a riga
+# di comando. get_file_details può essere chiamata da più thread insieme.
+import os
+import sys
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from .image_probe import probe_image
+from .pdf_geometry import read_page_geometry
+
+DEFAULT_DPI = 96
+# Pagine lette subito per i PDF lunghi quando è attiva l'opzione "solo prime pagine"
+PDF_EAGER_PAGES = 20
+
+
+def pdf_page_detail(width_pt, height_pt, trim_pt=None):
+    w_cm, h_cm = (width_pt/72)*2.54, (height_pt/72)*2.54
+    page_detail = {
+        "dimensions_cm": f"{w_cm:.2f} x {h_cm:.2f}",
+        "width_cm": w_cm, "height_cm": h_cm,
+        "area_sqm": (w_cm * h_cm) / 10000
+    }
+    if trim_pt:
+        trim_w_cm, trim_h_cm = (trim_pt[0] / 72) * 2.54, (trim_pt[1] / 72) * 2.54
+        page_detail['trim_dimensions_cm'] = f"{trim_w_cm:.2f} x {trim_h_cm:.2f}"
+        page_detail['trim_width_cm'], page_detail['trim_height_cm'] = trim_w_cm, trim_h_cm
+        page_detail['trim_area_sqm'] = (trim_w_cm * trim_h_cm) / 10000
+    return page_detail
+
+
+class FileAnalyzer:
+    """
+    Dettagli dei file (dict file_info) con cache dei metadati opzionale.
+    page_table, se presente, conserva le dimensioni delle pagine in forma compatta.
+    Con pdf_lazy_pages dei PDF lunghi si leggono solo le prime PDF_EAGER_PAGES pagine
+    (file_info['pages_pending']): le altre con read_remaining_pages.
+    """
+    def __init__(self, metadata_cache=None, page_table=None, pdf_lazy_pages=False):
+        self.metadata_cache = metadata_cache
+        self.page_table = page_table
+        self.pdf_lazy_pages = pdf_lazy_pages
+
+    def get_file_details(self, file_path):
+        """Dettagli del file, letti dalla cache se il file non è cambiato dall'ultima analisi."""
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            stat_result = None
+        cached = None
+        if stat_result and self.metadata_cache:
+            try: cached = self.metadata_cache.get(file_path, stat_result)
+            except Exception as e: print(f"Errore lettura cache per {file_path}: {e}")
+        # Una voce con pagine mancanti vale solo se è ancora attiva l'opzione "solo prime pagine"
+        if cached and cached.get('pages_pending') and not self.pdf_lazy_pages: cached = None
+        details = cached or self.read_file_details(file_path)
+        if stat_result and self.metadata_cache and not cached:
+            try: self.metadata_cache.put(file_path, stat_result, details)
+            except Exception as e: print(f"Errore scrittura cache per {file_path}: {e}")
+        if stat_result and details:
+            # Firma usata da "Aggiorna" per riconoscere i file modificati
+            details['size'], details['mtime_ns'] = stat_result.st_size, stat_result.st_mtime_ns
+        if details:
+            # Le cartelle si ripetono per migliaia di file: una sola copia della stringa
+            details['path'] = sys.intern(details['path'])
+            if self.page_table is not None: details['pages_details'] = self.page_table.add(details['pages_details'])
+        return details
+
+    def read_file_details(self, file_path):
+        try:
+            ext = os.path.splitext(file_path)[1].lower()
+            details = {"filename": os.path.basename(file_path), "type": ext.replace('.', '').upper(), "path": os.path.dirname(file_path)}
+            if ext in ('.jpg', '.jpeg', '.tif', '.tiff', '.png'):
+                # Prima si leggono solo gli header; PIL solo per le varianti non riconosciute
+                if not (header := probe_image(file_path)):
+                    with Image.open(file_path) as img:
+                        header = {"size": img.size, "mode": img.mode, "dpi": img.info.get('dpi')}
+                color_mode = header["mode"]
+                w_px, h_px = header["size"]; dpi_x, dpi_y = header["dpi"] or (DEFAULT_DPI, DEFAULT_DPI)
+                w_cm = (w_px / (dpi_x or DEFAULT_DPI)) * 2.54; h_cm = (h_px / (dpi_y or DEFAULT_DPI)) * 2.54
+                area_sqm = (w_cm * h_cm) / 10000
+                details.update({"w_px": w_px, "h_px": h_px, "page_count": 1,
+                                "pages_details": [{"dimensions_cm": f"{w_cm:.2f} x {h_cm:.2f}", "width_cm": w_cm, "height_cm": h_cm, "area_sqm": area_sqm}],
+                                "dpi_str": f"{int(dpi_x or DEFAULT_DPI)} DPI",
+                                "color_mode": color_mode})
+                return details
+            elif ext in ('.pdf', '.ai'):
+                try:
+                    with fitz.open(file_path) as doc:
+                        if not doc: raise ValueError("Documento vuoto")
+                        page_count = len(doc)
+                        # Con "solo prime pagine" le restanti si leggono all'apertura del nodo nell'albero
+                        eager = PDF_EAGER_PAGES if self.pdf_lazy_pages and page_count > PDF_EAGER_PAGES else page_count
+                        pages_details = [pdf_page_detail(*geometry) for geometry in read_page_geometry(doc, 0, eager)]
+                        details.update({"page_count": page_count, "pages_details": pages_details, "type": "AI" if ext == '.ai' else "PDF"})
+                        if eager < page_count: details['pages_pending'] = True
+                        return details
+                except Exception:
+                    details.update({"type": "AI (Non compatibile)" if ext == '.ai' else "PDF (Danneggiato)", "page_count": 1, "pages_details": [{"dimensions_cm": "Non rilevabili", "width_cm": 0, "height_cm": 0, "area_sqm": 0}]})
+                    return details
+            else:
+                details.update({"page_count": 1, "pages_details": [{"dimensions_cm": "Anteprima non disponibile", "width_cm": 0, "height_cm": 0, "area_sqm": 0}], "type": "NON SUPPORTATO"})
+                return details
+        except Exception as e:
+            print(f"Errore analisi file {file_path}: {e}")
+            return {"filename": os.path.basename(file_path), "type": "ERRORE", "path": os.path.dirname(file_path), "page_count": 1, "pages_details": [{"dimensions_cm": "Errore lettura", "width_cm": 0, "height_cm": 0, "area_sqm": 0}]}
+
+    def read_remaining_pages(self, file_info):
+        """Legge le pagine non ancora analizzate di un PDF e aggiorna la cache. Restituisce None in caso di errore."""
+        full_path = os.path.join(file_info['path'], file_info['filename'])
+        try:
+            with fitz.open(full_path) as doc:
+                pages = [pdf_page_detail(*geometry) for geometry in read_page_geometry(doc, len(file_info['pages_details']), file_info['page_count'])]
+            stat_result = os.stat(full_path)
+        except Exception as e:
+            print(f"Errore lettura pagine di {full_path}: {e}")
+            return None
+        # Si salva la voce completa solo se il file è ancora quello analizzato durante la scansione
+        if self.metadata_cache and (stat_result.st_size, stat_result.st_mtime_ns) == (file_info.get('size'), file_info.get('mtime_ns')):
+            complete = {k: v for k, v in file_info.items() if k != 'pages_pending'}
+            complete['pages_details'] = file_info['pages_details'] + pages
+            try:
+                self.metadata_cache.put(full_path, stat_result, complete)
+                self.metadata_cache.flush()
+            except Exception as e: print(f"Errore scrittura cache per {full_path}: {e}")
+        return pages
@@ -0,0 +1,50 @@
+# apps/scanner/csv_export.py - Esportazione della lista pagine in CSV (separatore ";", per Excel)
+import csv
+
+from .results import full_path_of
+
+
+def write_csv(file_path, pages_to_export, aggregator, duplicates=None):
+    """
+    Una riga per pagina, raggruppate per cartella di scansione (riga vuota tra i gruppi).
+    Con duplicates ({percorso: gruppo}, dopo la ricerca dei doppioni) si aggiunge la colonna
+    del gruppo, vuota per i file senza doppioni.
+    """
+    pages_to_export = sorted(pages_to_export, key=lambda p: p['file_info'].get('scan_root', 'N/A'))
+
+    with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow([
+            "Nome File", "Tipo", "Pagina",
+            "Dimensioni (cm)", "Area (m²)",
+            "Dimensioni Al vivo (cm)", "Area Al vivo (m²)",
+            "Sottocartella", "Cartella Principale",
+            *(["Gruppo Doppioni"] if duplicates is not None else [])
+        ])
+
+        last_folder = None
+        for page_data in pages_to_export:
+            item, page_num = page_data['file_info'], page_data['page_num']
+
+            current_folder = item.get('scan_root', 'N/A')
+            if current_folder != last_folder:
+                if last_folder is not None:
+                    writer.writerow([])
+                last_folder = current_folder
+
+            display_path = aggregator.subfolder_of(item)
+            page_details = item['pages_details'][page_num]
+
+            area_sqm = page_details.get('area_sqm', 0)
+            trim_dims = page_details.get('trim_dimensions_cm', '')
+            trim_area = page_details.get('trim_area_sqm', 0)
+            page_str = f"{page_num + 1} di {item.get('page_count', 1)}"
+
+            row = [
+                item['filename'], item['type'], page_str,
+                page_details['dimensions_cm'], f"{area_sqm:.4f}",
+                trim_dims, f"{trim_area:.4f}" if trim_area > 0 else "",
+                display_path, item.get('scan_root', '')
+            ]
+            if duplicates is not None: row.append(duplicates.get(full_path_of(item), ""))
+            writer.writerow(row)
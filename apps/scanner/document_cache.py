@@ -0,0 +1,76 @@
+# apps/scanner/document_cache.py - Documenti PyMuPDF aperti, riusati tra una pagina e l'altra
+#
+# Anteprima ed esportazioni renderizzano una pagina alla volta: senza cache un PDF di
+# 200 pagine viene aperto e analizzato 200 volte. Ogni thread (o processo worker) ha
+# la propria cache, perché un fitz.Document non va usato da più thread insieme.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+
+
+class DocumentCache:
+    """
+    LRU di documenti aperti per thread, con al massimo max_documents per thread.
+    Un documento viene chiuso se il file cambia (dimensione o data di modifica) o se resta
+    inutilizzato per più di idle_seconds: i file aperti restano bloccati su Windows. Quelli
+    dei thread terminati (i worker di un pool chiuso) si chiudono con release_finished.
+    I documenti restituiti da get non vanno chiusi da chi li usa.
+    """
+    def __init__(self, max_documents=8, idle_seconds=30.0):
+        self.max_documents = max_documents
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads = {}   # thread -> i suoi documenti
+
+    def _documents(self):
+        if (documents := getattr(self._local, 'documents', None)) is None:
+            documents = self._local.documents = OrderedDict()   # percorso -> (doc, firma, ultimo uso)
+            with self._lock: self._threads[threading.current_thread()] = documents
+        return documents
+
+    def get(self, full_path):
+        st = os.stat(full_path)
+        signature, now = (st.st_size, st.st_mtime_ns), time.monotonic()
+        documents = self._documents()
+        entry = documents.pop(full_path, None)
+        if entry and entry[1] != signature:
+            entry[0].close(); entry = None
+        doc = entry[0] if entry else fitz.open(full_path)
+        documents[full_path] = (doc, signature, now)
+        self._evict(documents, now)
+        return doc
+
+    def discard(self, full_path):
+        """Chiude il documento (es. dopo un errore di lettura): alla prossima richiesta si riapre."""
+        if entry := self._documents().pop(full_path, None): entry[0].close()
+
+    def sweep(self):
+        """Chiude i documenti inutilizzati del thread corrente e quelli dei thread terminati."""
+        self._evict(self._documents(), time.monotonic())
+        self.release_finished()
+
+    def release_finished(self):
+        """Chiude i documenti dei thread terminati: nessuno li userà più, ma restano aperti finché non li si chiude."""
+        with self._lock:
+            finished = [self._threads.pop(thread) for thread in list(self._threads) if not thread.is_alive()]
+        for documents in finished:
+            while documents: documents.popitem()[1][0].close()
+
+    def clear(self):
+        documents = self._documents()
+        while documents: documents.popitem()[1][0].close()
+
+    def _evict(self, documents, now):
+        while len(documents) > self.max_documents:
+            documents.popitem(last=False)[1][0].close()
+        # In ordine di utilizzo: i più vecchi sono in testa
+        while documents and now - next(iter(documents.values()))[2] > self.idle_seconds:
+            documents.popitem(last=False)[1][0].close()
+
+
+# Cache condivisa da anteprima ed esportazioni (ogni thread vede solo i propri documenti)
+shared_documents = DocumentCache()
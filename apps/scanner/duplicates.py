@@ -0,0 +1,151 @@
+# apps/scanner/duplicates.py - Ricerca dei file doppi (stesso contenuto) tra le cartelle scansionate
+#
+# La stessa grafica consegnata due volte con nomi diversi si scopriva in fatturazione.
+# Confrontare il contenuto di tutti i file vorrebbe dire rileggere l'intero archivio:
+# qui i candidati si restringono per passi sempre più costosi. Prima la dimensione (già
+# nota dalla scansione, nessuna lettura), poi un hash dell'inizio e della fine del file
+# (due letture brevi), infine l'hash completo, solo per i file che coincidono ancora e
+# sono più grandi delle parti già lette. Le letture passano da un pool limitato di thread
+# e da un limite di banda, per non saturare il disco di rete durante il lavoro; gli hash
+# sono salvati nella cache dei metadati, così una nuova ricerca rilegge solo i file cambiati.
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from .scan import PROGRESS_INTERVAL
+
+# Byte letti all'inizio e alla fine di ogni file per l'hash parziale
+PARTIAL_HASH_BYTES = 64 * 1024
+# Letture dell'hash completo
+HASH_CHUNK = 1024 * 1024
+# Pochi lettori: il collo di bottiglia è il disco, non la CPU
+DEFAULT_HASH_WORKERS = 4
+# Limite di lettura predefinito (byte al secondo), None = nessun limite
+HASH_READ_RATE = 100 * 1024 * 1024
+
+
+class DuplicateGroup(NamedTuple):
+    size: int        # dimensione in byte di ciascun file
+    paths: tuple     # percorsi completi dei file con lo stesso contenuto, ordinati
+
+
+class ReadThrottle:
+    """Limite di banda condiviso dai thread di lettura: consume(n) attende il turno per leggere n byte."""
+    def __init__(self, rate=HASH_READ_RATE):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, nbytes):
+        if not self.rate: return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + nbytes / self.rate
+        if start > now: time.sleep(start - now)
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+class DuplicateFinder:
+    """
+    Raggruppa i file con lo stesso contenuto. cache (MetadataCache) fornisce e conserva gli
+    hash, validi finché dimensione e data di modifica del file non cambiano; max_workers
+    thread leggono i file, insieme al più read_rate byte al secondo.
+    """
+    def __init__(self, cache=None, max_workers=None, read_rate=HASH_READ_RATE):
+        self.cache = cache
+        self.max_workers = max(1, max_workers or DEFAULT_HASH_WORKERS)
+        self.throttle = ReadThrottle(read_rate)
+
+    def _read(self, f, nbytes):
+        self.throttle.consume(nbytes)
+        return f.read(nbytes)
+
+    def _hash_file(self, path, size, partial=None):
+        """
+        Hash parziale (partial None) o completo del file: (parziale, completo), con completo
+        None se non ancora calcolato; None se il file non è leggibile o è cambiato dopo la scansione.
+        """
+        try:
+            st = os.stat(path)
+            if st.st_size != size: return None
+            cached = self.cache.get_hashes(path, st) if self.cache else None
+            if cached and (partial is None or cached[1]): return cached
+            with open(path, "rb") as f:
+                if partial is None and size > 2 * PARTIAL_HASH_BYTES:
+                    digest = _new_hash()
+                    digest.update(self._read(f, PARTIAL_HASH_BYTES))
+                    f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+                    digest.update(self._read(f, PARTIAL_HASH_BYTES))
+                    hashes = digest.hexdigest(), None
+                else:
+                    # Per i file piccoli le parti lette sono già tutto il file
+                    digest = _new_hash()
+                    while chunk := self._read(f, HASH_CHUNK): digest.update(chunk)
+                    hashes = (partial or digest.hexdigest()), digest.hexdigest()
+        except OSError:
+            return None
+        if self.cache: self.cache.put_hashes(path, st, *hashes)
+        return hashes
+
+    def _hash_all(self, items, job, progress):
+        # {percorso: hash} di items [(percorso, dimensione, hash parziale o None)]; None se interrotto
+        def work(item):
+            if job and not job.checkpoint(): return None
+            return self._hash_file(*item)
+        hashes = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for (path, _, partial), result in zip(items, executor.map(work, items)):
+                progress()
+                if job and job.cancelled: continue
+                if result: hashes[path] = result[0] if partial is None else result[1]
+        return None if job and job.cancelled else hashes
+
+    def run(self, files, job=None, on_progress=None):
+        """
+        Gruppi (DuplicateGroup) di files, coppie (percorso, dimensione), con lo stesso
+        contenuto, dal gruppo che spreca più spazio. on_progress(file controllati, file da
+        controllare) al più ogni PROGRESS_INTERVAL secondi; None se job viene interrotto.
+        I file vuoti sono esclusi: sono tutti uguali e non c'è niente da stampare.
+        """
+        by_size = defaultdict(list)
+        for path, size in files:
+            if size: by_size[size].append(path)
+        candidates = [(path, size, None) for size, paths in by_size.items() if len(paths) > 1 for path in paths]
+        done, total, last = 0, len(candidates), 0.0
+
+        def progress(force=False):
+            nonlocal done, last
+            done += not force
+            if on_progress and (force or time.monotonic() - last >= PROGRESS_INTERVAL):
+                last = time.monotonic()
+                on_progress(done, total)
+
+        if (partial := self._hash_all(candidates, job, progress)) is None: return None
+        groups = defaultdict(list)
+        for path, size, _ in candidates:
+            if path in partial: groups[size, partial[path]].append(path)
+        # L'hash completo serve solo se le parti lette non coprono tutto il file
+        needs_full = [(path, size, digest) for (size, digest), paths in groups.items()
+                      if len(paths) > 1 and size > 2 * PARTIAL_HASH_BYTES for path in paths]
+        total += len(needs_full)
+        if (full := self._hash_all(needs_full, job, progress)) is None: return None
+        progress(force=True)
+        duplicates = defaultdict(list)
+        for (size, digest), paths in groups.items():
+            if len(paths) < 2: continue
+            if size <= 2 * PARTIAL_HASH_BYTES:
+                duplicates[size, digest] = paths
+                continue
+            for path in paths:
+                if path in full: duplicates[size, full[path]].append(path)
+        result = [DuplicateGroup(size, tuple(sorted(paths))) for (size, _), paths in duplicates.items() if len(paths) > 1]
+        result.sort(key=lambda group: (-group.size * (len(group.paths) - 1), group.paths))
+        return result
@@ -0,0 +1,502 @@
+# apps/scanner/engine.py - Motore di Liste Anteprime, senza interfaccia
+#
+# Stato dei risultati (file, totali, pagine), scansione, "Aggiorna" ed esportazioni in un
+# oggetto Python puro: la scheda Tk e la modalità batch lo usano allo stesso modo, e lo si
+# può profilare o eseguire in un altro processo senza importare Tk.
+#
+# Due tipi di metodi:
+#   - di lavoro (scan, find_changes, watch, find_duplicates, export_*): bloccanti, da eseguire in un thread;
+#     l'avanzamento è notificato con gli eventi qui sotto, chiamati da quel thread;
+#   - di stato (add_files, apply_delta, remove, clear...): modificano i risultati e vanno
+#     chiamati sempre dallo stesso thread (quello dell'interfaccia, se c'è).
+import os
+import threading
+from collections import Counter, defaultdict
+from functools import partial
+
+import numpy as np
+
+from .aggregate import AreaAggregator
+from .analyzer import FileAnalyzer
+from .csv_export import write_csv
+from .duplicates import HASH_READ_RATE, DuplicateFinder
+from .html_gallery import write_html_gallery
+from .metadata_cache import MetadataCache
+from .page_table import PageList, PageTable, page_areas
+from .report_writer import write_pdf_report
+from .results import full_path_of
+from .scan import ParallelScanner, diff_scan
+from .search import SearchIndex, parse_query
+from .sort_keys import SortKeys
+from .thumbnail_cache import ThumbnailCache
+from .watch import FileWatcher, default_watch_backend, scan_root_for
+
+# Eventi (argomenti del callback)
+SCAN_PROGRESS = "scan_progress"       # cartella corrente, file trovati (al più 10 volte al secondo)
+SCAN_BATCH = "scan_batch"             # lista di FileInfo appena analizzati, nell'ordine di enumerazione
+SCAN_FINISHED = "scan_finished"       # True se la scansione è stata interrotta
+REFRESH_CHANGES = "refresh_changes"   # numero di file nuovi o modificati da rianalizzare
+RENDER_PROGRESS = "render_progress"   # miniature fatte, totali, pagine al secondo
+WATCH_CHANGES = "watch_changes"       # FileInfo nuovi o modificati, percorsi spariti (file o cartelle), job di watch
+WATCH_WARNING = "watch_warning"       # messaggio: cartelle non sorvegliate, passaggio al controllo a intervalli
+DUPLICATES_PROGRESS = "duplicates_progress"   # file controllati, file da controllare
+
+# Le righe dei file aggiornati o rimossi (tabella delle pagine, chiavi di ordinamento, indice
+# di ricerca) si eliminano quando sono più della metà, se le righe sono almeno queste
+COMPACT_MIN_ROWS = 4096
+
+# Pagina di un file non più leggibile (modificato o rimosso dopo la scansione)
+UNREADABLE_PAGE = {"dimensions_cm": "Non rilevabili", "width_cm": 0, "height_cm": 0, "area_sqm": 0}
+
+
+def _evict(cache, label):
+    try: cache.evict()
+    except Exception as e: print(f"Errore pulizia cache {label}: {e}")
+
+
+def open_caches(evict=False):
+    """
+    Cache dei metadati e delle miniature nel profilo utente; None per quelle non disponibili.
+    Con evict la pulizia delle voci vecchie parte in background.
+    """
+    caches = []
+    for cache_class, label in ((MetadataCache, "metadati"), (ThumbnailCache, "miniature")):
+        try:
+            cache = cache_class()
+        except Exception as e:
+            print(f"Cache {label} non disponibile: {e}")
+            cache = None
+        if cache and evict: threading.Thread(target=_evict, args=(cache, label), daemon=True).start()
+        caches.append(cache)
+    return tuple(caches)
+
+
+def _outermost(folders):
+    """Le sole cartelle di folders ({cartella: scan_root}) non contenute in un'altra."""
+    kept = {}
+    for folder in sorted(folders, key=len):
+        parent = os.path.dirname(folder)
+        while parent not in kept and parent != os.path.dirname(parent): parent = os.path.dirname(parent)
+        if parent not in kept: kept[folder] = folders[folder]
+    return kept
+
+
+def _update_known(known, updated, gone):
+    # Firme dei file come le vede la sorveglianza dopo un gruppo (gone: file o cartelle spariti)
+    folders = tuple(path.rstrip(os.sep) + os.sep for path in gone if path not in known)
+    for item in updated: known[full_path_of(item)] = (item.get('size'), item.get('mtime_ns'))
+    for path in gone: known.pop(path, None)
+    if folders:
+        for path in [path for path in known if path.startswith(folders)]: del known[path]
+
+
+def path_is_within(path, root):
+    try: return os.path.commonpath([os.path.normcase(path), os.path.normcase(root)]) == os.path.normcase(root)
+    except ValueError: return False
+
+
+class ScanEngine:
+    """
+    Risultati di una o più scansioni (results: lista di FileInfo, nell'ordine di
+    visualizzazione) con i totali per cartella (aggregator) e le dimensioni delle pagine
+    a colonne (page_table). sources sono le cartelle e i file scansionati, riusati da
+    "Aggiorna"; excluded i file rimossi a mano, da non reinserire. Le chiavi di
+    ordinamento (sort_keys) e l'indice di ricerca (search_index) sono aggiornati quando
+    un file entra o cambia nei risultati. duplicates ({percorso: gruppo}) sono i file doppi
+    trovati da find_duplicates, None finché la ricerca non è stata fatta.
+    """
+    def __init__(self, metadata_cache=None, thumbnail_cache=None, pdf_lazy_pages=False):
+        self.metadata_cache = metadata_cache
+        self.thumbnail_cache = thumbnail_cache
+        self._listeners = defaultdict(list)
+        self.analyzer = FileAnalyzer(metadata_cache, pdf_lazy_pages=pdf_lazy_pages)
+        self._reset()
+
+    def _reset(self):
+        self.results = []
+        self.sources, self.excluded = [], set()
+        self._by_path = {}
+        self._rows = np.zeros(0, dtype=np.int64)   # riga di sort_keys di ogni file, allineate a results
+        self.sort_keys = SortKeys()
+        self.search_index = SearchIndex()
+        self.duplicates = None
+        self.page_table = self.analyzer.page_table = PageTable()
+        self.aggregator = AreaAggregator()
+
+    @property
+    def thumbnail_cache_dir(self):
+        return self.thumbnail_cache.cache_dir if self.thumbnail_cache else None
+
+    @property
+    def pdf_lazy_pages(self):
+        return self.analyzer.pdf_lazy_pages
+
+    @pdf_lazy_pages.setter
+    def pdf_lazy_pages(self, value):
+        self.analyzer.pdf_lazy_pages = bool(value)
+
+    # --- Eventi ---
+
+    def subscribe(self, event, callback):
+        self._listeners[event].append(callback)
+        return callback
+
+    def unsubscribe(self, event, callback):
+        if callback in self._listeners[event]: self._listeners[event].remove(callback)
+
+    def emit(self, event, *args):
+        for callback in list(self._listeners[event]): callback(*args)
+
+    # --- Lavoro (in un thread) ---
+
+    def scan(self, paths, max_workers=None, job=None):
+        """
+        Analizza paths (bloccante). I file arrivano a blocchi con SCAN_BATCH e non sono
+        aggiunti ai risultati: lo fa add_files, sul thread che possiede lo stato.
+        job (ScanJob) la mette in pausa o la interrompe; i blocchi già emessi restano validi.
+        """
+        try:
+            return ParallelScanner(self.analyzer.get_file_details, max_workers=max_workers).run(
+                paths, on_batch=partial(self.emit, SCAN_BATCH), on_progress=partial(self.emit, SCAN_PROGRESS), job=job)
+        finally:
+            self.flush_metadata()
+            self.emit(SCAN_FINISHED, bool(job and job.cancelled))
+
+    def refresh_snapshot(self):
+        """Argomenti di find_changes, da prendere sul thread che possiede lo stato."""
+        known = {full_path_of(item): (item.get('size'), item.get('mtime_ns')) for item in self.results}
+        return list(self.sources), known, set(self.excluded)
+
+    def find_changes(self, snapshot, max_workers=None, job=None):
+        """
+        Confronta le sorgenti con il disco e rianalizza i file nuovi o modificati: (aggiornati, rimossi).
+        None se job viene interrotto durante il confronto; interrotto durante l'analisi
+        restituisce i file aggiornati fin lì (e tutti i rimossi).
+        """
+        sources, known, excluded = snapshot
+        try:
+            if (diff := diff_scan(sources, known, max_workers=max_workers, job=job)) is None: return None
+            changed, removed = diff
+            changed = [(full_path, root) for full_path, root in changed if full_path not in excluded]
+            self.emit(REFRESH_CHANGES, len(changed))
+            updated = []
+            ParallelScanner(self.analyzer.get_file_details, max_workers=max_workers).run_files(changed, on_batch=updated.extend, job=job)
+            return updated, removed
+        finally:
+            self.flush_metadata()
+
+    def watch(self, snapshot, job, backend=None, max_workers=None):
+        """
+        Sorveglia le sorgenti di snapshot (refresh_snapshot) finché job non viene interrotto
+        (bloccante). I percorsi toccati arrivano a gruppi (FileWatcher): i file nuovi o
+        modificati di ogni gruppo sono analizzati e consegnati con WATCH_CHANGES, insieme ai
+        percorsi spariti (da passare ad apply_watch) e a job: un gruppo consegnato dopo
+        l'interruzione va scartato. backend predefinito: default_watch_backend.
+        Le cartelle segnalate (spostate dentro le sorgenti, o le sorgenti intere quando il
+        backend ha perso eventi) si confrontano con le firme note, tenute aggiornate gruppo
+        dopo gruppo: se ne consegnano solo i file nuovi o modificati e quelli spariti.
+        I problemi che non fermano la sorveglianza arrivano con WATCH_WARNING; un errore del
+        backend termina watch con l'eccezione.
+        """
+        sources, known, excluded = snapshot
+        known = dict(known)
+        watcher = FileWatcher(sources, backend or default_watch_backend(known), known=known, on_warning=partial(self.emit, WATCH_WARNING))
+        scanner = ParallelScanner(self.analyzer.get_file_details, max_workers=max_workers)
+        for paths in watcher.batches(job):
+            changed, gone, folders = {}, [], {}
+            for path in paths:
+                if (scan_root := scan_root_for(path, sources)) is None: continue
+                if os.path.isfile(path): changed[path] = scan_root
+                elif os.path.isdir(path): folders[os.path.normpath(path)] = scan_root
+                else: gone.append(path)
+            if folders := _outermost(folders):
+                prefixes = tuple(folder.rstrip(os.sep) + os.sep for folder in folders)
+                diff = diff_scan(list(folders), {path: signature for path, signature in known.items() if path.startswith(prefixes)},
+                                 max_workers=max_workers, job=job)
+                if diff is None: return
+                changed.update((full_path, folders[folder]) for full_path, folder in diff[0])
+                gone.extend(diff[1])
+            updated = []
+            try:
+                scanner.run_files([(full_path, root) for full_path, root in changed.items() if full_path not in excluded],
+                                  on_batch=updated.extend, job=job)
+            finally:
+                self.flush_metadata()
+            if job.cancelled: return
+            _update_known(known, updated, gone)
+            if updated or gone: self.emit(WATCH_CHANGES, updated, gone, job)
+
+    def find_duplicates(self, files, max_workers=None, job=None, read_rate=HASH_READ_RATE):
+        """
+        Gruppi (DuplicateGroup) dei file con lo stesso contenuto tra files
+        (duplicate_candidates), da passare ad apply_duplicates; None se job viene
+        interrotto. Gli hash calcolati restano nella cache dei metadati.
+        """
+        try:
+            return DuplicateFinder(self.metadata_cache, max_workers, read_rate).run(files, job, on_progress=partial(self.emit, DUPLICATES_PROGRESS))
+        finally:
+            self.flush_metadata()
+
+    def read_remaining_pages(self, file_info):
+        return self.analyzer.read_remaining_pages(file_info)
+
+    def flush_metadata(self):
+        if self.metadata_cache:
+            try: self.metadata_cache.flush()
+            except Exception as e: print(f"Errore salvataggio cache metadati: {e}")
+
+    # --- Stato ---
+
+    def add_sources(self, paths):
+        for path in map(os.path.normpath, paths):
+            if path not in self.sources: self.sources.append(path)
+            # Una nuova scansione esplicita reinserisce anche i file rimossi a mano
+            self.excluded = {p for p in self.excluded if not path_is_within(p, path)}
+
+    def add_files(self, files):
+        """Aggiunge i file non ancora presenti nei risultati; restituisce quelli aggiunti."""
+        added = []
+        for item in files:
+            full_path = full_path_of(item)
+            if full_path not in self._by_path:
+                self._by_path[full_path] = item; added.append(item)
+        self.results.extend(added)
+        self.aggregator.add_files(added)
+        self._rows = np.concatenate([self._rows, np.asarray(self._index(added), dtype=np.int64)])
+        return added
+
+    def _index(self, files):
+        """Aggiorna chiavi di ordinamento e indice di ricerca dei file (già nei totali); restituisce le loro righe."""
+        with_pages = [fi for fi in files if fi['pages_details']]
+        # Area (al vivo) della prima pagina, con una sola lettura vettoriale della PageTable
+        first_page_area = dict(zip(map(id, with_pages), page_areas((fi['pages_details'], 0) for fi in with_pages)[1]))
+        rows = []
+        for fi in files:
+            full_path = full_path_of(fi)
+            subfolder, _, file_area = self.aggregator.file_summary(full_path)
+            row = self.sort_keys.set(full_path, fi['filename'], subfolder, first_page_area.get(id(fi), 0.0), file_area)
+            self.search_index.set(row, fi['filename'], subfolder, fi.get('type'), fi.get('color_mode'), fi.get('page_count', 1), file_area)
+            rows.append(row)
+        self.search_index.build()
+        return rows
+
+    def apply_delta(self, updated, removed):
+        """Applica il risultato di find_changes; restituisce (nuovi, modificati)."""
+        updated_by_path = {full_path_of(item): item for item in updated}
+        merged, replaced = [], 0
+        for item in self.results:
+            full_path = full_path_of(item)
+            if full_path in removed: continue
+            if full_path in updated_by_path:
+                item = updated_by_path.pop(full_path); replaced += 1
+            merged.append(item)
+        added = list(updated_by_path.values())
+        self.results = merged + added
+        self._by_path = {full_path_of(item): item for item in self.results}
+        self.aggregator.remove_paths(removed)
+        self.aggregator.add_files(updated)
+        self._index(updated)
+        self._rows = np.fromiter(map(self.sort_keys.row, self._by_path), dtype=np.int64, count=len(self._by_path))
+        # Il contenuto dei file modificati non è più quello confrontato
+        self._forget_duplicates([*removed, *map(full_path_of, updated)])
+        self._compact()
+        return len(added), replaced
+
+    def apply_watch(self, updated, gone):
+        """
+        Applica un gruppo di WATCH_CHANGES: gone sono file o cartelle spariti (di una cartella
+        si tolgono tutti i file). I file esclusi a mano o di sorgenti non più presenti sono
+        ignorati. Restituisce (nuovi, modificati, rimossi).
+        """
+        updated = [item for item in updated
+                   if (full_path := full_path_of(item)) not in self.excluded and scan_root_for(full_path, self.sources) is not None]
+        removed = {path for path in gone if path in self._by_path}
+        if folders := tuple(path.rstrip(os.sep) + os.sep for path in gone if path not in self._by_path):
+            removed.update(path for path in self._by_path if path.startswith(folders))
+        if not updated and not removed: return 0, 0, 0
+        added, replaced = self.apply_delta(updated, removed)
+        return added, replaced, len(removed)
+
+    def remove(self, paths=(), folders=()):
+        """Toglie dai risultati i file paths e le cartelle di scansione folders, che "Aggiorna" non reinserirà."""
+        paths, folders = set(paths), set(folders)
+        self.excluded |= paths
+        self.sources = [src for src in self.sources if (src if os.path.isdir(src) else os.path.dirname(src)) not in folders]
+        kept, keep, dropped = [], [], []
+        for item in self.results:
+            full_path = full_path_of(item)
+            keep.append(not (full_path in paths or item.get('scan_root') in folders))
+            if keep[-1]: kept.append(item)
+            else: dropped.append(full_path)
+        self.results, self._rows = kept, self._rows[np.asarray(keep, dtype=bool)]
+        for full_path in dropped: del self._by_path[full_path]
+        self.aggregator.remove_paths(dropped)
+        self._forget_duplicates(dropped)
+        self._compact()
+
+    def _compact(self):
+        """
+        "Aggiorna" e la sorveglianza lasciano righe inutilizzate: le pagine di ogni versione
+        di un file e le chiavi dei percorsi spariti. Con una scheda aperta tutto il giorno
+        crescerebbero senza limite; oltre metà delle righe si ricostruisce con le sole vive.
+        """
+        page_lists = [(fi, fi['pages_details']) for fi in self.results if isinstance(fi['pages_details'], PageList)]
+        if len(self.page_table) >= COMPACT_MIN_ROWS and 2 * sum(len(pages) for _, pages in page_lists) < len(self.page_table):
+            table, compacted = PageTable.compacted(pages for _, pages in page_lists)
+            # Un nuovo PageList per file: chi legge quello vecchio vede ancora la vecchia tabella
+            for (fi, _), pages in zip(page_lists, compacted): fi['pages_details'] = pages
+            self.page_table = self.analyzer.page_table = table
+        else:
+            # Un worker della sorveglianza può aver letto la tabella appena prima che fosse
+            # sostituita: quelle righe si copiano nell'attuale, o la vecchia resterebbe in memoria
+            for fi, pages in page_lists: fi['pages_details'] = self.page_table.adopt(pages)
+        if len(self.sort_keys) >= COMPACT_MIN_ROWS and 2 * len(self.results) < len(self.sort_keys):
+            self.sort_keys, self.search_index = SortKeys(), SearchIndex()
+            self._rows = np.asarray(self._index(self.results), dtype=np.int64)
+            if self.duplicates: self._sync_duplicates()
+
+    def duplicate_candidates(self):
+        """Argomento di find_duplicates, da prendere sul thread che possiede lo stato: (percorso, dimensione) dei file."""
+        return [(full_path_of(item), item.get('size')) for item in self.results]
+
+    def apply_duplicates(self, groups):
+        """Segna i file dei gruppi di find_duplicates (ancora nei risultati), numerando i gruppi da 1."""
+        self.duplicates, number = {}, 0
+        for group in groups:
+            if len(paths := [path for path in group.paths if path in self._by_path]) > 1:
+                number += 1
+                self.duplicates.update(dict.fromkeys(paths, number))
+        self._sync_duplicates()
+
+    def _forget_duplicates(self, paths):
+        if not self.duplicates or not (stale := self.duplicates.keys() & set(paths)): return
+        for path in stale: del self.duplicates[path]
+        # Un file rimasto solo nel suo gruppo non è più un doppione
+        counts = Counter(self.duplicates.values())
+        self.duplicates = {path: number for path, number in self.duplicates.items() if counts[number] > 1}
+        self._sync_duplicates()
+
+    def _sync_duplicates(self):
+        self.search_index.set_duplicates({self.sort_keys.row(path): number for path, number in self.duplicates.items()})
+
+    def duplicate_group(self, file_info):
+        """Numero del gruppo di doppioni del file, o None."""
+        return self.duplicates.get(full_path_of(file_info)) if self.duplicates else None
+
+    def clear(self):
+        self._reset()
+
+    def scan_finished(self):
+        """Da chiamare sul thread dello stato a fine scansione: compatta la tabella delle pagine."""
+        self.page_table.shrink()
+
+    def find(self, full_path):
+        return self._by_path.get(full_path)
+
+    def pending_files(self, pages=None):
+        """I PDF letti solo in parte tra i risultati (o tra i file di pages)."""
+        files = self.results if pages is None else {id(page['file_info']): page['file_info'] for page in pages}.values()
+        return [item for item in files if item.get('pages_pending')]
+
+    def apply_loaded_pages(self, file_info, pages):
+        """
+        Completa un PDF letto solo in parte con le pagine di read_remaining_pages (None se
+        non più leggibile). Restituisce True se il file è nei risultati e i totali sono cambiati.
+        """
+        if not file_info.get('pages_pending'): return False
+        missing = file_info['page_count'] - len(file_info['pages_details'])
+        pages = (pages or [])[:missing]
+        file_info['pages_details'].extend(pages + [UNREADABLE_PAGE] * (missing - len(pages)))
+        del file_info['pages_pending']
+        if self.find(full_path_of(file_info)) is not file_info: return False
+        self.aggregator.add_files([file_info])
+        self._index([file_info])
+        return True
+
+    def sort(self, columns):
+        """
+        Ordina results secondo columns, coppie (colonna di SORT_COLUMNS, decrescente) dalla
+        più importante; a parità di chiavi resta l'ordine precedente.
+        """
+        order = self.sort_keys.order(self._rows, columns)
+        self.results = [self.results[i] for i in order.tolist()]
+        self._rows = self._rows[order]
+
+    def match(self, query):
+        """
+        Maschera booleana, allineata a results, dei file che soddisfano query (il testo della
+        ricerca: parole nel nome o nella sottocartella e filtri, vedi parse_query); None se
+        query è vuota.
+        """
+        if (parsed := parse_query(query)) is None: return None
+        return self.search_index.match(parsed)[self._rows]
+
+    def filter(self, query):
+        """I file di results che soddisfano query, nell'ordine di visualizzazione."""
+        if (mask := self.match(query)) is None: return list(self.results)
+        return [self.results[i] for i in np.flatnonzero(mask).tolist()]
+
+    def complete_pending_pages(self, pages=None):
+        """
+        Legge subito le pagine mancanti dei PDF (di tutti, o dei soli file di pages; bloccante):
+        copie ed esportazioni richiedono l'elenco completo.
+        """
+        for file_info in self.pending_files(pages):
+            self.apply_loaded_pages(file_info, self.read_remaining_pages(file_info))
+
+    # --- Lettura ---
+
+    def pages(self, files=None):
+        """Tutte le pagine dei risultati (o dei soli files), nell'ordine di visualizzazione."""
+        return [{'file_info': fi, 'page_num': pn} for fi in (self.results if files is None else files) for pn in range(fi.get('page_count', 1))]
+
+    def page_count(self):
+        return sum(item.get('page_count', 1) for item in self.results)
+
+    def subfolder_of(self, file_info):
+        return self.aggregator.subfolder_of(file_info)
+
+    def totals_for(self, pages):
+        """Totali delle pagine da esportare: quelli già pronti se sono tutte le pagine, altrimenti calcolati."""
+        if len(pages) == self.aggregator.grand.pages and not self.aggregator.grand.pending: return self.aggregator
+        return AreaAggregator.from_pages(pages)
+
+    def export_snapshot(self, pages):
+        """
+        (totali di pages, gruppi di doppioni) da passare alle esportazioni eseguite in un altro
+        thread: copie, che "Aggiorna" e la sorveglianza non modificano durante l'esportazione.
+        """
+        totals = self.totals_for(pages)
+        return (totals.copy() if totals is self.aggregator else totals), (dict(self.duplicates) if self.duplicates is not None else None)
+
+    # --- Esportazioni (in un thread) ---
+    # snapshot è export_snapshot(pages), preso sul thread dello stato; senza, si leggono i
+    # totali attuali (va bene solo se nessuno modifica i risultati durante l'esportazione)
+
+    def export_csv(self, file_path, pages, snapshot=None):
+        totals, duplicates = snapshot or (self.totals_for(pages), self.duplicates)
+        write_csv(file_path, pages, totals, duplicates)
+
+    def export_pdf(self, file_path, pages, columns=4, orientation="portrait", processes=False, max_workers=None, snapshot=None):
+        totals = snapshot[0] if snapshot else self.totals_for(pages)
+        try:
+            write_pdf_report(file_path, pages, totals, columns=columns, orientation=orientation, processes=processes,
+                             max_workers=max_workers, on_progress=partial(self.emit, RENDER_PROGRESS), cache_dir=self.thumbnail_cache_dir)
+        finally:
+            self.evict_thumbnails()
+
+    def export_html(self, out, pages, quality='fast', thumbs_dir=None, processes=False, max_workers=None, snapshot=None):
+        """Anteprima miniature scritta nel file di testo out (immagini in thumbs_dir, o incorporate)."""
+        totals = snapshot[0] if snapshot else self.totals_for(pages)
+        try:
+            write_html_gallery(out, pages, totals, quality, thumbs_dir, processes, max_workers=max_workers,
+                               on_progress=partial(self.emit, RENDER_PROGRESS), cache_dir=self.thumbnail_cache_dir)
+        finally:
+            self.evict_thumbnails()
+
+    def evict_thumbnails(self):
+        if self.thumbnail_cache: _evict(self.thumbnail_cache, "miniature")
+
+    def clear_caches(self):
+        if self.metadata_cache: self.metadata_cache.clear()
+        if self.thumbnail_cache: self.thumbnail_cache.clear()
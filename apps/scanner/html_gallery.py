@@ -0,0 +1,928 @@
+# apps/scanner/html_gallery.py - Anteprima miniature HTML (pagine A4 riordinabili, stampa, annotazioni)
+#
+# Scritta in streaming: intestazione, poi una cartella alla volta con le miniature
+# prodotte dal RenderPool nell'ordine di uscita. Usata dalla scheda Liste Anteprime e
+# dalla modalità a riga di comando.
+import base64
+import contextlib
+import html
+import os
+from collections import defaultdict
+
+from .aggregate import subfolder_sort_key
+from .render_pool import RenderPool
+from .thumbnails import placeholder_bytes, render_thumbnail, thumbnail_job
+
+# Pagine renderizzate in anticipo (limita la memoria) e sottocartella delle immagini
+HTML_RENDER_AHEAD = 64
+HTML_THUMB_DIR = "miniature"
+
+
+def _thumbnail_data_uri(data):
+    """Miniatura incorporata nell'HTML come data URI PNG."""
+    return f"data:image/png;base64,{base64.b64encode(data or placeholder_bytes('PNG')).decode('utf-8')}"
+
+
+def _save_thumbnail_file(data, thumbs_dir, index):
+    """Miniatura salvata come JPEG accanto all'HTML; restituisce il percorso relativo per src."""
+    file_name = f"{index:06d}.jpg"
+    with open(os.path.join(thumbs_dir, file_name), 'wb') as f:
+        f.write(data or placeholder_bytes('JPEG'))
+    return f"{HTML_THUMB_DIR}/{file_name}"
+
+
+def write_html_gallery(out, pages_to_export, aggregator, quality='fast', thumbs_dir=None, processes=False,
+                       max_workers=None, on_progress=None, cache_dir=None):
+    """
+    Scrive l'anteprima miniature su out un elemento alla volta; con thumbs_dir le immagini
+    sono file JPEG esterni, altrimenti PNG incorporati. aggregator fornisce totali e
+    sottocartelle delle pagine esportate. max_workers, processes e on_progress sono
+    passati al RenderPool; con cache_dir le miniature passano dalla ThumbnailCache.
+    """
+    grouped_pages = defaultdict(list)
+    selected_pages_keys = {(os.path.join(p['file_info']['path'], p['file_info']['filename']), p['page_num']) for p in pages_to_export}
+    
+    for page in pages_to_export:
+         full_path = os.path.join(page['file_info']['path'], page['file_info']['filename'])
+         if (full_path, page['page_num']) in selected_pages_keys:
+            grouped_pages[page['file_info']['scan_root']].append(page)
+
+    file_colors = ['#DB4437', '#4285F4', '#F4B400', '#0F9D58', '#AB47BC', '#E91E63', '#9C27B0', '#673AB7', '#009688']
+    unique_file_paths = sorted({os.path.join(p['file_info']['path'], p['file_info']['filename']) for p in pages_to_export})
+    file_path_to_color = {path: file_colors[i % len(file_colors)] for i, path in enumerate(unique_file_paths)}
+    
+    js_libraries = """
+        <script src="https://cdnjs.cloudflare.com/ajax/libs/Sortable/1.15.0/Sortable.min.js"></script>
+        <script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
+        <script src="https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js"></script>
+        """
+    
+    if quality == 'fast':
+        pdf_dpi = 72
+        img_thumb_size = (750, 750)
+    else: # high quality
+        pdf_dpi = 150
+        img_thumb_size = (1500, 1500)
+
+    css = """<style>
+            @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@400;700&display=swap');
+            :root { --a4-width: 21cm; --a4-height: 29.7cm; --item-width: 200px; --annotation-font-size: 18px; }
+            body{font-family:'Roboto',sans-serif;margin:0;background-color:#d2d2d2; color:#333;}
+            .controls{display:flex;flex-wrap:wrap;align-items:center;gap:10px;background:#fff;padding:10px 20px;box-shadow:0 2px 4px #0000001a;position:sticky;top:0;z-index:1000}
+            .controls button, .controls input, .controls select {padding:8px 12px;font-size:14px;border:1px solid #ccc;border-radius:5px;font-family:'Roboto',sans-serif;}
+            .controls button {background-color:#e9e9e9;color:#333;cursor:pointer;font-weight:700}
+            .print-button{background-color:#4285f4;color:#fff;border-color:#4285f4}
+            .control-group{display:flex;align-items:center;gap:5px;padding:5px;border:1px solid #e0e0e0;border-radius:5px}
+            #view-container { padding: 20px; }
+            .page {
+                background: white;
+                box-shadow: 0 0 10px rgba(0,0,0,0.2);
+                margin: 20px auto;
+                position: relative;
+                width: var(--a4-width);
+                height: var(--a4-height);
+            }
+            .page.landscape { width: var(--a4-height); height: var(--a4-width); }
+            .page-content { padding: 1cm; display: flex; flex-wrap: wrap; align-content: flex-start; gap: 5px; height: calc(100% - 2cm); width: calc(100% - 2cm); overflow: hidden; }
+            
+            .folder-header{
+                display: flex;
+                justify-content: space-between;
+                align-items: center;
+                background-color:#e0e0e0;
+                padding:10px 15px;
+                border-left:5px solid #4285f4;
+                border-radius:0 5px 5px 0;
+                width:100%;
+                box-sizing:border-box;
+                margin-bottom:5px;
+            }
+            .folder-path-input {
+                font-family: 'Roboto', sans-serif;
+                font-weight: 700;
+                font-size: 1.2em;
+                color: #333;
+                border: none;
+                background: transparent;
+                padding: 2px 5px;
+                margin: -2px -5px; /* Counteract padding to keep alignment */
+                width: 70%;
+                border-radius: 3px;
+            }
+            .folder-path-input:focus {
+                outline: none;
+                background: #fff;
+                box-shadow: 0 0 0 2px #4285f4;
+            }
+            .folder-stats{font-size:.9em;color:#555;line-height:1.5em; text-align: right;}
+
+            .subfolder-separator-container { width: 100%; display: flex; align-items: center; gap: 10px; margin: 15px 0 5px 0; }
+            .subfolder-separator { flex-grow: 1; border: 0; border-top: 1px solid #ccc; }
+            .breadcrumb-container { display: flex; align-items: center; gap: 5px; }
+            .breadcrumb-crumb { padding: 2px 8px; border-radius: 4px; color: white; font-size: 0.9em; font-weight: bold; -webkit-print-color-adjust: exact; print-color-adjust: exact; }
+            .breadcrumb-separator { font-weight: bold; color: #555; }
+            .subfolder-stats { font-size: 0.8em; color: #666; white-space: nowrap; }
+            
+            .page-content.page-layout .folder-header, .page-content.page-layout .folder-annotation, .page-content.page-layout .subfolder-separator-container { flex-basis: 100%; }
+            .page-content.list-layout .folder-header, .page-content.list-layout .folder-annotation, .page-content.list-layout .subfolder-separator-container { width: 100%; }
+            .page-content.grid-layout .folder-header, .page-content.grid-layout .folder-annotation, .page-content.grid-layout .subfolder-separator-container { grid-column: 1 / -1; }
+            .folder-annotation { margin-bottom: 10px; }
+            
+            .page-content.grid-layout { display: grid; grid-template-columns: repeat(auto-fill, minmax(var(--item-width), 1fr)); gap: 10px; align-content: start; }
+            .page-content.list-layout { display: flex; flex-direction: column; gap: 8px; flex-wrap: nowrap; }
+            .page-content.page-layout { display: flex; flex-wrap: wrap; gap: 5px; justify-content: center; }
+            
+            .item {box-sizing: border-box; background-color:#fff; box-shadow: 0 1px 3px rgba(0,0,0,0.1); cursor: grab; display: flex; flex-direction: column; position: relative;}
+            .item.sortable-ghost {opacity: 0.4;}
+            .item-img-container { width: 100%; background-color: #fff; display: flex; align-items: center; justify-content: center; border-bottom:1px solid #ccc; }
+            .item-img{display:block; max-width: 100%; max-height: 100%; object-fit: contain; border: 1px solid #000; box-sizing: border-box;}
+            
+            .item-info {
+                padding: 8px; font-size: 12px; text-align: left; background: #f8f9fa; 
+                width: 100%; box-sizing: border-box;
+                display: flex; flex-direction: column;
+                flex-grow: 1;
+            }
+            .item-info-header { 
+                display: flex; justify-content: flex-end;
+                width: 100%;
+                order: 3;
+                margin-top: 4px;
+            }
+            .metadata { font-size: 11px; color: #6c757d; order: 1; }
+            .filename-container {
+                margin-top: 5px;
+                border-top: 1px solid #eee;
+                padding-top: 5px;
+                order: 2;
+            }
+            .filename { font-weight: 700; color: #212529; word-break: break-word; }
+            .trim-info{font-size: 10px; color: #d9534f; font-weight: bold;}
+            .page-indicator{font-size:.8em;color:#fff;padding:2px 5px;border-radius:3px; text-shadow: 1px 1px 2px #000; flex-shrink: 0; font-weight: bold;}
+
+            .item-checkbox {position: absolute; top: 8px; left: 8px; width: 20px; height: 20px; z-index: 10; cursor: pointer; background-color: rgba(255,255,255,0.7); border-radius: 3px;}
+            
+            .page-content.page-layout .item { width: var(--item-width); }
+            .page-content.grid-layout .item-img-container { height: calc(var(--item-width) * 0.75); }
+            .page-content.list-layout .item { flex-direction: row; align-items: stretch; width: 100%; height: calc(var(--item-width) * 0.75); }
+            .page-content.list-layout .item-img-container { width: calc(var(--item-width)); height: 100%; flex-shrink: 0; border-right: 1px solid #ccc; border-bottom: none; padding: 5px; box-sizing: border-box; }
+            .page-content.list-layout .item-info { flex-grow: 1; border: none; justify-content: center; }
+            
+            .annotation-area{width:100% !important;box-sizing:border-box;margin:0;padding:5px;border:1px dashed #ccc;border-top: 1px solid #ccc;font-family:sans-serif;resize:vertical;min-height:40px;font-size:var(--annotation-font-size); color: red;}
+            #loader {position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.7); color: white; display: flex; align-items: center; justify-content: center; font-size: 2em; z-index: 2000;}
+            
+            .summary-container { 
+                font-size: 12px;
+                width: 100%; 
+                box-sizing: border-box;
+            }
+            .summary-container h2 { margin-top: 0; border-bottom: 2px solid #ccc; padding-bottom: 8px; font-size: 1.8em; }
+            .summary-list-wrapper {
+                column-count: 1;
+                column-gap: 2em;
+            }
+            .summary-list-wrapper.two-columns {
+                column-count: 2;
+            }
+            .summary-container ul { list-style-type: none; padding-left: 0; margin: 0; }
+            .summary-container > ul > li { margin-bottom: 15px; font-size: 1.3em; break-inside: avoid; }
+            .summary-container ul ul { padding-left: 20px; margin-top: 6px; }
+            .summary-container ul ul li { font-weight: bold; font-size: 0.9em; }
+            .summary-container ul ul ul { list-style-type: '- '; padding-left: 20px; }
+            .summary-container ul ul ul li { padding: 3px 0; font-size: 1.1em; color: #333; font-weight: normal;}
+            .summary-container ul ul ul li small { color: #555; font-size: 0.9em; }
+
+            body.annotations-hidden .annotation-area { display: none !important; }
+            body.trim-hidden .trim-info { display: none !important; }
+            body.normal-hidden .normal-info { display: none !important; }
+            .switch { position: relative; display: inline-block; width: 40px; height: 20px; vertical-align: middle;}
+            .switch input { opacity: 0; width: 0; height: 0; }
+            .slider { position: absolute; cursor: pointer; top: 0; left: 0; right: 0; bottom: 0; background-color: #ccc; transition: .4s; border-radius: 20px; }
+            .slider:before { position: absolute; content: ""; height: 16px; width: 16px; left: 2px; bottom: 2px; background-color: white; transition: .4s; border-radius: 50%; }
+            input:checked + .slider { background-color: #f44336; }
+            input:checked + .slider:before { transform: translateX(20px); }
+
+            @media print{
+                body{background-color:#fff !important; margin:0; padding:0;}
+                .controls, #loader, .item-checkbox {display:none !important;}
+                #view-container { padding: 0 !important; }
+                .page { margin: 0; box-shadow: none; page-break-after: always; }
+                .page:last-child { page-break-after: auto; }
+                .folder-header{background-color:#f0f0f0!important;-webkit-print-color-adjust:exact;}
+                .item.hide-for-print { display: none !important; }
+                .item-info {background-color: #fff !important; border-color: #ddd !important; color: #000 !important; -webkit-print-color-adjust: exact;}
+                .page-indicator{background-color:var(--bg-color)!important;-webkit-print-color-adjust:exact;print-color-adjust:exact;}
+            }
+            </style>"""
+    js_script = """<script>
+            const state = {
+                view: 'grid', 
+                itemWidth: 200, 
+                pageBreakOnSubfolder: false,
+                annotationFontSize: 18,
+            };
+            
+            const pageSizes = {
+                'A4': { width: '21cm', height: '29.7cm' },
+                'A3': { width: '29.7cm', height: '42cm' }
+            };
+
+            function syncStateToSource() {
+                const viewContainer = document.getElementById('view-container');
+                const sourceData = document.getElementById('source-data');
+                if (!viewContainer || !sourceData) return;
+
+                // Sync inputs by updating the value attribute
+                viewContainer.querySelectorAll('input.folder-path-input').forEach(visibleInput => {
+                    const sourceInput = sourceData.querySelector(`#${CSS.escape(visibleInput.id)}`);
+                    if (sourceInput) {
+                        sourceInput.setAttribute('value', visibleInput.value);
+                    }
+                });
+
+                // Sync textareas by updating their textContent, which is copied by cloneNode
+                viewContainer.querySelectorAll('textarea.folder-annotation, textarea.annotation-area').forEach(visibleTextarea => {
+                    const sourceTextarea = sourceData.querySelector(`#${CSS.escape(visibleTextarea.id)}`);
+                    if (sourceTextarea) {
+                        sourceTextarea.textContent = visibleTextarea.value;
+                    }
+                });
+            }
+
+            function updatePageLayout() {
+                const size = document.getElementById('page-size-select').value;
+                const dimensions = pageSizes[size];
+                
+                document.documentElement.style.setProperty('--a4-width', dimensions.width);
+                document.documentElement.style.setProperty('--a4-height', dimensions.height);
+                
+                renderAllPages(); 
+            }
+
+            function switchView(viewName) {
+                state.view = viewName;
+                document.querySelectorAll('.view-switch-btn').forEach(btn => btn.style.backgroundColor = '');
+                document.querySelector(`[onclick="switchView('${viewName}')"]`).style.backgroundColor = '#c0c0c0';
+                renderAllPages();
+            }
+
+            function toggleAnnotationsVisibility(hide) {
+                document.body.classList.toggle('annotations-hidden', hide);
+            }
+
+            function toggleTrimVisibility(hide) {
+                document.body.classList.toggle('trim-hidden', hide);
+            }
+
+            function toggleNormalVisibility(hide) {
+                document.body.classList.toggle('normal-hidden', hide);
+            }
+
+            function togglePageBreak(enabled) {
+                state.pageBreakOnSubfolder = enabled;
+                renderAllPages();
+            }
+
+            function generateSummaryHTML(sourceNode) {
+                let listHtml = '<ul>';
+                const folders = sourceNode.querySelectorAll('.folder-container');
+                
+                folders.forEach(folder => {
+                    if (folder.style.display === 'none') return;
+                    
+                    const folderNameInput = folder.querySelector('.folder-path-input');
+                    const folderName = folderNameInput ? folderNameInput.getAttribute('value') : 'Cartella Sconosciuta';
+                    listHtml += `<li><strong>${folderName}</strong>`;
+
+                    const subfolderSections = new Map();
+                    let currentSectionName = 'File nella cartella principale';
+                    let currentSectionItems = [];
+
+                    Array.from(folder.children).forEach(child => {
+                        if (child.classList.contains('subfolder-separator-container')) {
+                            if (currentSectionItems.length > 0) {
+                                subfolderSections.set(currentSectionName, currentSectionItems);
+                            }
+                            const breadcrumbs = Array.from(child.querySelectorAll('.breadcrumb-crumb')).map(c => c.textContent).join(' > ');
+                            currentSectionName = breadcrumbs || 'Sottocartella';
+                            if (currentSectionName === 'File nella cartella principale') {
+                                const rootBreadcrumb = child.querySelector('.breadcrumb-crumb');
+                                if (rootBreadcrumb) currentSectionName = rootBreadcrumb.textContent;
+                            }
+                            currentSectionItems = [];
+                        } else if (child.classList.contains('item') && child.style.display !== 'none') {
+                            currentSectionItems.push(child);
+                        }
+                    });
+                    if (currentSectionItems.length > 0) {
+                        subfolderSections.set(currentSectionName, currentSectionItems);
+                    }
+
+                    if (subfolderSections.size > 0) {
+                        listHtml += '<ul>';
+                        subfolderSections.forEach((items, name) => {
+                             const visibleItems = items.filter(item => item.style.display !== 'none');
+                             if(visibleItems.length > 0) {
+                                listHtml += `<li>${name}<ul>`;
+                                visibleItems.forEach(item => {
+                                    const filename = item.querySelector('.filename')?.textContent || '';
+                                    const pageIndicator = item.querySelector('.page-indicator')?.textContent || '';
+                                    listHtml += `<li>${filename} ${pageIndicator}</li>`;
+                                });
+                                listHtml += '</ul></li>';
+                             }
+                        });
+                        listHtml += '</ul>';
+                    }
+                    listHtml += '</li>';
+                });
+
+                listHtml += '</ul>';
+                
+                let html = `<div class="summary-container">
+                                <h2>Riepilogo Contenuto</h2>
+                                <div class="summary-list-wrapper">${listHtml}</div>
+                            </div>`;
+                return html;
+            }
+
+            function renderAllPages() {
+                syncStateToSource();
+                const viewContainer = document.getElementById('view-container');
+                viewContainer.innerHTML = '';
+                
+                const sourceData = document.getElementById('source-data');
+                const contentToLayout = sourceData.cloneNode(true);
+                const folders = Array.from(contentToLayout.querySelectorAll('.folder-container'));
+
+                if (folders.length === 0) return;
+
+                let currentPage, contentWrapper;
+                let pageContentHeight = 0; 
+
+                const setupNewPage = () => {
+                    currentPage = createNewPage();
+                    viewContainer.appendChild(currentPage);
+                    contentWrapper = currentPage.querySelector('.page-content');
+                    contentWrapper.className = `page-content`; // Default to no special layout
+                    if (pageContentHeight === 0) {
+                        pageContentHeight = contentWrapper.clientHeight;
+                    }
+                };
+                
+                const hasSubfolders = Array.from(sourceData.querySelectorAll('.subfolder-separator-container')).some(el => {
+                    const parentFolder = el.closest('.folder-container');
+                    return parentFolder && parentFolder.style.display !== 'none';
+                });
+
+                if (state.pageBreakOnSubfolder && hasSubfolders) {
+                    setupNewPage();
+
+                    const firstVisibleFolder = Array.from(folders).find(f => f.style.display !== 'none');
+                    if (firstVisibleFolder) {
+                        const firstFolderHeader = firstVisibleFolder.querySelector('.folder-header').cloneNode(true);
+                        const input = firstFolderHeader.querySelector('.folder-path-input');
+                        if(input) {
+                            const sourceInput = document.getElementById(input.id);
+                            input.value = sourceInput ? sourceInput.getAttribute('value') : '';
+                        }
+                        contentWrapper.appendChild(firstFolderHeader);
+                    }
+                    
+                    const summaryDiv = document.createElement('div');
+                    summaryDiv.innerHTML = generateSummaryHTML(contentToLayout);
+                    
+                    const summaryWrapper = summaryDiv.querySelector('.summary-list-wrapper');
+                    
+                    contentWrapper.appendChild(summaryDiv);
+                    
+                    if (summaryWrapper.scrollHeight > pageContentHeight) {
+                        summaryWrapper.classList.add('two-columns');
+                        void summaryWrapper.offsetHeight;
+                    }
+                    
+                    // Paginate the summary itself if it still overflows
+                    while (contentWrapper.scrollHeight > pageContentHeight) {
+                        const allLIs = Array.from(contentWrapper.querySelectorAll('.summary-container li'));
+                        let lastVisibleLI = null;
+
+                        for(let i = allLIs.length - 1; i >= 0; i--) {
+                            const li = allLIs[i];
+                            if (li.offsetTop < pageContentHeight) {
+                                lastVisibleLI = li;
+                                break;
+                            }
+                        }
+
+                        if (!lastVisibleLI) { 
+                            break;
+                        }
+
+                        let breakList = lastVisibleLI.parentElement;
+                        const itemsToMove = [];
+                        let sibling = lastVisibleLI.nextElementSibling;
+                        while(sibling) {
+                            itemsToMove.push(sibling);
+                            sibling = sibling.nextElementSibling;
+                        }
+                        
+                        setupNewPage();
+                        contentWrapper.className = 'page-content'; 
+                        const newList = breakList.cloneNode(false);
+                        itemsToMove.forEach(item => {
+                            newList.appendChild(item);
+                        });
+
+                        let currentNewList = newList;
+                        let currentOldList = breakList;
+                        while(currentOldList.parentElement && currentOldList.parentElement.closest('.summary-container')) {
+                             const newParentList = currentOldList.parentElement.cloneNode(false);
+                             newParentList.appendChild(currentNewList);
+                             currentNewList = newParentList;
+                             
+                             let parentSibling = currentOldList.parentElement.nextElementSibling;
+                             while(parentSibling){
+                                currentNewList.appendChild(parentSibling);
+                                parentSibling = parentSibling.nextElementSibling;
+                             }
+                             currentOldList = currentOldList.parentElement;
+                        }
+                        contentWrapper.appendChild(currentNewList);
+                    }
+
+
+                    const hasVisibleItems = contentToLayout.querySelector(".item:not([style*='display: none'])");
+                    if (hasVisibleItems) {
+                        setupNewPage(); 
+                    } else {
+                        contentWrapper = null; 
+                    }
+                } else {
+                    setupNewPage(); 
+                }
+                
+                if (!contentWrapper) {
+                    initDragAndDrop();
+                    return;
+                }
+                
+                contentWrapper.className = `page-content ${state.view}-layout`;
+
+                for (const folder of folders) {
+                    if(folder.style.display === 'none') continue;
+                    
+                    const childrenToProcess = Array.from(folder.children);
+                    const isFirstFolder = folder === folders.find(f => f.style.display !== 'none');
+
+                    for (const child of childrenToProcess) {
+                        if(child.style.display === 'none') continue;
+                        
+                        if(state.pageBreakOnSubfolder && hasSubfolders) {
+                            if (isFirstFolder && child.classList.contains('folder-header')) {
+                                continue;
+                            }
+                            if (!isFirstFolder && child.classList.contains('folder-header') && contentWrapper.children.length > 0) {
+                                setupNewPage();
+                                contentWrapper.className = `page-content ${state.view}-layout`;
+                            }
+                            if (child.classList.contains('subfolder-separator-container') && contentWrapper.querySelector('.item')) {
+                               setupNewPage();
+                               contentWrapper.className = `page-content ${state.view}-layout`;
+                            }
+                        }
+
+                        if(child.classList.contains('folder-header')){
+                            const input = child.querySelector('.folder-path-input');
+                            if(input) {
+                                const sourceInput = document.getElementById(input.id);
+                                input.value = sourceInput ? sourceInput.getAttribute('value') : '';
+                            }
+                        }
+                        contentWrapper.appendChild(child);
+                        if (pageContentHeight > 0 && contentWrapper.scrollHeight > pageContentHeight) {
+                            contentWrapper.removeChild(child);
+                            setupNewPage();
+                            contentWrapper.className = `page-content ${state.view}-layout`;
+                            contentWrapper.appendChild(child);
+                        }
+                    }
+                }
+                
+                if (contentWrapper && contentWrapper.children.length === 0 && viewContainer.children.length > 1) {
+                    viewContainer.removeChild(currentPage);
+                }
+
+                initDragAndDrop();
+            }
+            
+            function createNewPage() {
+                const page = document.createElement('div');
+                page.className = 'page';
+                const orientation = document.getElementById('page-orientation-select').value;
+                if (orientation === 'landscape') {
+                    page.classList.add('landscape');
+                }
+                page.innerHTML = '<div class="page-content"></div>';
+                return page;
+            }
+
+            function changeSize(amount) {
+                state.itemWidth = Math.max(100, Math.min(1600, state.itemWidth + amount * 25));
+                document.getElementById('zoom-slider').value = state.itemWidth;
+                document.documentElement.style.setProperty('--item-width', state.itemWidth + 'px');
+                renderAllPages();
+            }
+
+            function changeAnnotationSize(amount) {
+                state.annotationFontSize = Math.max(8, Math.min(40, state.annotationFontSize + amount));
+                const slider = document.getElementById('annotation-slider');
+                if (slider) slider.value = state.annotationFontSize;
+                document.documentElement.style.setProperty('--annotation-font-size', state.annotationFontSize + 'px');
+            }
+
+            function setAnnotationZoom(value) {
+                state.annotationFontSize = parseInt(value, 10);
+                document.documentElement.style.setProperty('--annotation-font-size', state.annotationFontSize + 'px');
+            }
+
+            function setZoom(value) {
+                state.itemWidth = parseInt(value, 10);
+                document.documentElement.style.setProperty('--item-width', state.itemWidth + 'px');
+                renderAllPages();
+            }
+
+            function filterFiles(){
+                const query = document.getElementById("search-box").value.toLowerCase();
+                document.querySelectorAll("#source-data .folder-container").forEach(folder => {
+                    let visibleItems = 0;
+                    folder.querySelectorAll(".item").forEach(item => {
+                        const filename = item.querySelector(".filename").textContent.toLowerCase();
+                        const isVisible = filename.includes(query);
+                        item.style.display = isVisible ? "flex" : "none";
+                        if(isVisible) visibleItems++;
+                    });
+                    folder.style.display = visibleItems > 0 ? "block" : "none";
+                });
+                renderAllPages();
+            }
+            
+            function initDragAndDrop() {
+                 document.querySelectorAll('.page-content').forEach(container => {
+                    if (container.sortableInstance) container.sortableInstance.destroy();
+                    container.sortableInstance = new Sortable(container, {
+                        group: 'shared-items',
+                        animation: 150,
+                        ghostClass: 'sortable-ghost',
+                        onEnd: (evt) => {
+                           const itemId = evt.item.id;
+                           const sourceItem = document.querySelector(`#source-data #${itemId}`);
+                           const nextSibling = evt.item.nextElementSibling;
+                           
+                           if(nextSibling) {
+                               const nextSourceSibling = document.querySelector(`#source-data #${nextSibling.id}`);
+                               if (nextSourceSibling) {
+                                   nextSourceSibling.parentNode.insertBefore(sourceItem, nextSourceSibling);
+                               }
+                           } else {
+                               const toContainerId = evt.to.parentElement.id;
+                               const fromContainerId = evt.from.parentElement.id;
+                               // This is a simplified logic, might need adjustment for complex cases
+                               const sourceParentContainer = document.querySelector(`#source-data #${evt.to.querySelector('.item').id}`).parentElement;
+                               if(sourceParentContainer) {
+                                    sourceParentContainer.appendChild(sourceItem);
+                               }
+                           }
+                           renderAllPages();
+                        }
+                    });
+                });
+            }
+
+            function toggleSelectAll(shouldBeChecked) {
+                document.querySelectorAll('.item-checkbox').forEach(cb => { cb.checked = shouldBeChecked; });
+            }
+
+            // Le miniature si caricano solo quando diventano visibili (loading="lazy"):
+            // prima di stampare o catturare una vista vanno caricate tutte
+            function loadAllImages(root) {
+                const images = [...root.querySelectorAll('img.item-img')];
+                images.forEach(img => { img.loading = 'eager'; });
+                return Promise.all(images.map(img => img.decode().catch(() => {})));
+            }
+
+            async function prepareAndPrintStandard() {
+                await loadAllImages(document.getElementById('view-container'));
+                document.querySelectorAll('#view-container .item').forEach(item => {
+                    const checkbox = item.querySelector('.item-checkbox');
+                    item.classList.toggle('hide-for-print', checkbox && !checkbox.checked);
+                });
+
+                const emptyAnnotations = [];
+                if (!document.body.classList.contains('annotations-hidden')) {
+                    document.querySelectorAll('#view-container .annotation-area').forEach(area => {
+                        if (area.value.trim() === '') {
+                            area.style.display = 'none';
+                            emptyAnnotations.push(area);
+                        }
+                    });
+                }
+
+                window.print();
+
+                emptyAnnotations.forEach(area => {
+                    area.style.display = '';
+                });
+            }
+            
+            async function createWysiwygPdf(outputAction = 'save') {
+                const { jsPDF } = window.jspdf;
+                const loader = document.getElementById('loader');
+                
+                let printWindow = null;
+                if (outputAction === 'print') {
+                    printWindow = window.open('', '_blank');
+                    if (!printWindow) { alert('Impossibile aprire la finestra di anteprima. Disabilitare il blocco pop-up e riprovare.'); return; }
+                    printWindow.document.write('<html><head><title>Stampa Fedele</title></head><body><p>Generazione PDF...</p></body></html>');
+                }
+                
+                loader.style.display = 'flex';
+                
+                try {
+                    const orientation = document.getElementById('page-orientation-select').value;
+                    const size = document.getElementById('page-size-select').value.toLowerCase();
+                    const pdf = new jsPDF(orientation, 'mm', size);
+
+                    const sourceElements = document.querySelectorAll('#view-container .page');
+                    let firstPage = true;
+
+                    for (const element of sourceElements) {
+                        const contentToPrint = element.cloneNode(true);
+                        
+                        contentToPrint.querySelectorAll('input.folder-path-input').forEach(input => {
+                            const newSpan = document.createElement('span');
+                            newSpan.className = 'folder-path-input'; // Keep class for styling
+                            newSpan.textContent = input.value;
+                            input.parentNode.replaceChild(newSpan, input);
+                        });
+
+                        contentToPrint.querySelectorAll('.item:not([style*="display: none"])').forEach(clonedItem => {
+                             const originalCheckbox = document.getElementById(clonedItem.id)?.querySelector('.item-checkbox');
+                             if (originalCheckbox && !originalCheckbox.checked) {
+                                 clonedItem.style.display = 'none';
+                             } else {
+                                clonedItem.querySelector('.item-checkbox')?.remove();
+                                const originalTextarea = document.getElementById(clonedItem.id)?.querySelector('.annotation-area');
+                                const clonedTextarea = clonedItem.querySelector('.annotation-area');
+                                if (document.body.classList.contains('annotations-hidden') || (originalTextarea && originalTextarea.value.trim() === '')) {
+                                    clonedTextarea?.remove();
+                                } else if (originalTextarea && clonedTextarea) {
+                                    clonedTextarea.textContent = originalTextarea.value;
+                                }
+                             }
+                        });
+
+                        contentToPrint.querySelectorAll('.folder-annotation, .subfolder-separator-container').forEach(clonedAnnotation => {
+                           const originalAnnotation = document.getElementById(clonedAnnotation.id);
+                           if (originalAnnotation && originalAnnotation.tagName === 'TEXTAREA') {
+                               if (document.body.classList.contains('annotations-hidden') || (originalAnnotation && originalAnnotation.value.trim() === '')) {
+                                   clonedAnnotation.remove();
+                               } else if (originalAnnotation) {
+                                   clonedAnnotation.textContent = originalAnnotation.value;
+                               }
+                           }
+                        });
+                        
+                        document.body.appendChild(contentToPrint);
+                        await loadAllImages(contentToPrint);
+                        const canvas = await html2canvas(contentToPrint, { scale: 2.5 });
+                        document.body.removeChild(contentToPrint);
+                        
+                        const imgData = canvas.toDataURL('image/png');
+                        const imgProps = pdf.getImageProperties(imgData);
+                        const pdfWidth = pdf.internal.pageSize.getWidth();
+                        const pdfHeight = pdf.internal.pageSize.getHeight();
+                        const imgWidth = pdfWidth;
+                        const imgHeight = (imgProps.height * imgWidth) / imgProps.width;
+
+                        if (!firstPage) pdf.addPage(size, orientation);
+                        pdf.addImage(imgData, 'PNG', 0, 0, imgWidth, imgHeight);
+                        firstPage = false;
+                    }
+                    
+                    const pdfData = pdf.output('blob');
+                    const url = URL.createObjectURL(pdfData);
+
+                    if (outputAction === 'save') {
+                        const link = document.createElement('a');
+                        link.href = url;
+                        link.download = 'Anteprima-Miniature.pdf';
+                        document.body.appendChild(link); link.click(); document.body.removeChild(link);
+                        URL.revokeObjectURL(url);
+                    } else { 
+                        printWindow.location.href = url;
+                    }
+                } catch (e) {
+                    console.error("Errore generazione PDF:", e);
+                    alert("Si è verificato un errore durante la generazione del PDF.");
+                    if(printWindow) printWindow.close();
+                } finally {
+                    loader.style.display = 'none';
+                }
+            }
+            
+            function syncInputValues(source, dest) {
+                const sourceInputs = source.querySelectorAll('input.folder-path-input');
+                const destInputs = dest.querySelectorAll('input.folder-path-input');
+                sourceInputs.forEach((sIn, i) => {
+                    if (destInputs[i]) {
+                        destInputs[i].value = sIn.value;
+                    }
+                });
+            }
+
+            document.addEventListener("DOMContentLoaded", () => {
+                document.getElementById('zoom-slider').value = state.itemWidth;
+                const annotationSlider = document.getElementById('annotation-slider');
+                if (annotationSlider) annotationSlider.value = state.annotationFontSize;
+                updatePageLayout(); // Chiamata iniziale
+                switchView('grid');
+            });
+        </script>"""
+    
+    body_start = """<body>
+            <div id="loader" style="display: none;"><span>Generazione PDF...</span></div>
+            <div class="controls">
+                <div class="control-group">
+                    <button class="view-switch-btn" onclick="switchView('grid')">Griglia A4</button>
+                    <button class="view-switch-btn" onclick="switchView('page')">Vista Nesting</button>
+                    <button class="view-switch-btn" onclick="switchView('list')">Elenco A4</button>
+                </div>
+                <div class="control-group">
+                    <label>Formato:</label>
+                    <select id="page-size-select" onchange="updatePageLayout()">
+                        <option value="A4">A4</option>
+                        <option value="A3">A3</option>
+                    </select>
+                    <select id="page-orientation-select" onchange="updatePageLayout()">
+                        <option value="portrait">Verticale</option>
+                        <option value="landscape">Orizzontale</option>
+                    </select>
+                </div>
+                <div class="control-group">
+                    <button onclick="prepareAndPrintStandard()" title="Usa la stampa veloce del browser per la vista attiva.">Stampa Veloce</button>
+                    <button onclick="createWysiwygPdf('print')" class="print-button" title="Genera un PDF fedele della vista attiva e la invia alla stampante.">Stampa Fedele</button>
+                    <button onclick="createWysiwygPdf('save')" title="Genera e salva un PDF fedele della vista attiva.">Salva PDF Fedele</button>
+                </div>
+                <div class="control-group">
+                    <button onclick="toggleSelectAll(true)">Seleziona Tutti</button>
+                    <button onclick="toggleSelectAll(false)">Deseleziona Tutti</button>
+                </div>
+                <div class="control-group">
+                    <input type="text" id="search-box" onkeyup="filterFiles()" placeholder="Cerca per nome file...">
+                    <label>Dimensione:</label>
+                    <button onclick="changeSize(-1)" title="Rimpicciolisci">-</button>
+                    <input type="range" id="zoom-slider" min="100" max="1600" value="200" oninput="setZoom(this.value)">
+                    <button onclick="changeSize(1)" title="Ingrandisci">+</button>
+                </div>
+                <div class="control-group">
+                    <label>Testo Note:</label>
+                    <button onclick="changeAnnotationSize(-1)" title="Rimpicciolisci">-</button>
+                    <input type="range" id="annotation-slider" min="8" max="40" value="18" oninput="setAnnotationZoom(this.value)">
+                    <button onclick="changeAnnotationSize(1)" title="Ingrandisci">+</button>
+                </div>
+                <div class="control-group" style="margin-left: auto; display: flex; gap: 15px;">
+                    <div style="display: flex; align-items: center; gap: 5px;">
+                        <label for="toggle-normal-cb" style="cursor:pointer; user-select: none;">Nascondi misure normali</label>
+                        <label class="switch">
+                            <input type="checkbox" id="toggle-normal-cb" onchange="toggleNormalVisibility(this.checked)">
+                            <span class="slider"></span>
+                        </label>
+                    </div>
+                    <div style="display: flex; align-items: center; gap: 5px;">
+                        <label for="toggle-trim-cb" style="cursor:pointer; user-select: none;">Nascondi misure al vivo</label>
+                        <label class="switch">
+                            <input type="checkbox" id="toggle-trim-cb" onchange="toggleTrimVisibility(this.checked)">
+                            <span class="slider"></span>
+                        </label>
+                    </div>
+                    <div style="display: flex; align-items: center; gap: 5px;">
+                        <label for="toggle-annotations-cb" style="cursor:pointer; user-select: none;">Nascondi Annotazioni</label>
+                        <label class="switch">
+                            <input type="checkbox" id="toggle-annotations-cb" onchange="toggleAnnotationsVisibility(this.checked)">
+                            <span class="slider"></span>
+                        </label>
+                    </div>
+                    <div style="display: flex; align-items: center; gap: 5px;">
+                        <label for="toggle-page-break-cb" style="cursor:pointer; user-select: none;">Interruzione per sottocartella</label>
+                        <label class="switch">
+                            <input type="checkbox" id="toggle-page-break-cb" onchange="togglePageBreak(this.checked)">
+                            <span class="slider"></span>
+                        </label>
+                    </div>
+                </div>
+            </div>
+            <div id="view-container"></div>
+            <div id="source-data" style="display:none;">"""
+
+    out.write(f"<!DOCTYPE html><html><head><meta charset='UTF-8'><title>Anteprima Miniature</title>{js_libraries}{css}{js_script}</head>")
+    out.write(body_start)
+
+    sorted_grouped_pages = sorted(grouped_pages.items(), key=lambda item: item[0])
+    for _, pages in sorted_grouped_pages:
+        pages.sort(key=lambda p: subfolder_sort_key(aggregator.subfolder_of(p['file_info'])))
+    # Tutte le miniature in un unico pool, nell'ordine in cui compaiono nell'HTML
+    ordered_pages = [p for _, pages in sorted_grouped_pages for p in pages]
+    thumb_format = "JPEG" if thumbs_dir else "PNG"
+    jobs = [thumbnail_job(p['file_info'], p['page_num'], pdf_dpi, img_thumb_size, thumb_format, cache_dir=cache_dir) for p in ordered_pages]
+    render_pool = RenderPool(max_workers=max_workers, ahead=HTML_RENDER_AHEAD, on_progress=on_progress, processes=processes)
+
+    item_counter = 0
+    with contextlib.closing(render_pool.imap(render_thumbnail, jobs)) as thumbnails:
+        for folder_idx, (folder, pages) in enumerate(sorted_grouped_pages):
+            display_folder = os.path.basename(folder)
+            totals = aggregator.root(folder)
+        
+            folder_stats_text = f"File: {totals.files} | Pagine: {totals.pages} | Area: {totals.sqm:.2f} m²"
+            if totals.has_trim:
+                folder_stats_text += f" (Al vivo: {totals.trim_sqm:.2f} m²)"
+
+            folder_id = f"folder-{folder_idx}"
+            input_id = f"folder-path-input-{folder_idx}"
+            out.write(f"""<div class="folder-container" data-folder-id="{folder_id}">
+                    <div class="folder-header">
+                        <input type="text" class="folder-path-input" id="{input_id}" value="{html.escape(display_folder)}">
+                        <span class="folder-stats">{folder_stats_text}</span>
+                    </div>
+                    <textarea class="annotation-area folder-annotation" id="anno-{folder_id}" placeholder="Annotazione cartella..."></textarea>""")
+
+            last_subfolder = None
+            for i, page_data in enumerate(pages):
+                current_subfolder = aggregator.subfolder_of(page_data['file_info'])
+            
+                if current_subfolder != last_subfolder:
+                    stats = aggregator.subfolder(folder, current_subfolder)
+                    stats_text = f"File: {stats.files} | Pagine: {stats.pages} | Area: {stats.sqm:.2f} m²"
+                    if stats.has_trim:
+                        stats_text += f" (Al vivo: {stats.trim_sqm:.2f} m²)"
+
+                    header_content = ''
+                    if current_subfolder == ".":
+                        header_content = '<div class="breadcrumb-container"><span class="breadcrumb-crumb" style="background-color: #6c757d;">File nella cartella principale</span></div>'
+                    else:
+                        header_content = '<div class="breadcrumb-container">'
+                        crumbs = current_subfolder.split(' > ')
+                        breadcrumb_colors = ['#4A90E2', '#50E3C2', '#F5A623', '#BD10E0', '#9013FE']
+                        for j, crumb in enumerate(crumbs):
+                            color = breadcrumb_colors[j % len(breadcrumb_colors)]
+                            header_content += f'<span class="breadcrumb-crumb" style="background-color: {color};">{html.escape(crumb)}</span>'
+                            if j < len(crumbs) - 1:
+                                header_content += '<span class="breadcrumb-separator">&gt;</span>'
+                        header_content += '</div>'
+
+                    out.write(f'''<div class="subfolder-separator-container">
+                            {header_content}
+                            <hr class="subfolder-separator">
+                            <span class="subfolder-stats">{stats_text}</span>
+                        </div>''')
+                    last_subfolder = current_subfolder
+
+                item_data, page_num = page_data['file_info'], page_data['page_num']
+                full_path = os.path.join(item_data['path'], item_data['filename'])
+                page_details = item_data["pages_details"][page_num]
+            
+                if thumbs_dir: img_src = _save_thumbnail_file(next(thumbnails), thumbs_dir, item_counter)
+                else: img_src = _thumbnail_data_uri(next(thumbnails))
+            
+                page_count = item_data.get('page_count', 1)
+                current_color = file_path_to_color.get(full_path, '#808080')
+            
+                area_sqm_val = page_details.get('area_sqm', 0)
+                trim_area_sqm_val = page_details.get('trim_area_sqm', area_sqm_val)
+            
+                color_mode_prefix = ""
+                if color_mode := item_data.get('color_mode'):
+                    color_mode_prefix = f"<strong>{html.escape(color_mode)}:</strong> "
+            
+                dims_html = f'<div class="normal-info"><span>{color_mode_prefix}{page_details["dimensions_cm"]} cm &nbsp; {area_sqm_val:.3f} m²</span></div>'
+                trim_html = ''
+                if 'trim_dimensions_cm' in page_details:
+                    trim_html = f'<div class="trim-info">Al vivo: {page_details["trim_dimensions_cm"]} cm &nbsp; {trim_area_sqm_val:.3f} m²</div>'
+            
+                page_indicator_span = f'<span class="page-indicator" style="--bg-color: {current_color}; background-color: {current_color};">Pag. {page_num + 1}/{page_count}</span>' if page_count > 1 else ''
+            
+                out.write(f"""<div class="item" id="item-{item_counter}" data-folder-id="{folder_id}">
+                        <input type="checkbox" class="item-checkbox" checked>
+                        <div class="item-img-container"><img class="item-img" src="{img_src}" loading="lazy" decoding="async" alt="Anteprima"></div>
+                        <div class="item-info">
+                            <div class="metadata">{dims_html}{trim_html}</div>
+                            <div class="filename-container">
+                                <span class="filename">{html.escape(item_data["filename"])}</span>
+                            </div>
+                            <div class="item-info-header">{page_indicator_span}</div>
+                        </div>
+                        <textarea class="annotation-area" id="item-anno-{item_counter}" placeholder="Annotazione..."></textarea>
+                    </div>""")
+                item_counter += 1
+            out.write('</div>')
+
+    out.write('</div>\n        </body></html>')
@@ -0,0 +1,222 @@
+# apps/scanner/image_probe.py - Lettura veloce dei soli header di JPEG, PNG e TIFF
+#
+# Ricava dimensioni in pixel, DPI e modalità colore senza passare dai plugin di PIL
+# e senza leggere i dati dei pixel. I valori restituiti replicano quelli di
+# Image.open(...).size / .mode / .info['dpi']; nei casi non riconosciuti si
+# restituisce None e il chiamante usa PIL.
+import io
+import struct
+
+# Marker JPEG "Start Of Frame" (esclusi DHT 0xC4, JPG 0xC8 e DAC 0xCC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+# (bit depth, color type) -> modalità PIL
+_PNG_MODES = {
+    (1, 0): "1", (2, 0): "L", (4, 0): "L", (8, 0): "L",
+    (8, 2): "RGB", (16, 2): "RGB",
+    (1, 3): "P", (2, 3): "P", (4, 3): "P", (8, 3): "P",
+    (8, 4): "LA",
+    (8, 6): "RGBA", (16, 6): "RGBA",
+}
+
+# Tag TIFF usati
+_TIFF_WIDTH, _TIFF_HEIGHT, _TIFF_BPS, _TIFF_PHOTOMETRIC = 256, 257, 258, 262
+_TIFF_SPP, _TIFF_XRES, _TIFF_YRES, _TIFF_RESUNIT = 277, 282, 283, 296
+_TIFF_EXTRASAMPLES, _TIFF_SAMPLEFORMAT = 338, 339
+# tipo TIFF -> (formato struct, dimensione)
+_TIFF_TYPES = {1: ("B", 1), 3: ("H", 2), 4: ("L", 4), 5: ("LL", 8), 9: ("l", 4), 10: ("ll", 8)}
+
+
+class _ProbeError(Exception):
+    pass
+
+
+def probe_image(file_path):
+    """
+    Restituisce {"size": (w, h), "mode": str, "dpi": (x, y) o None}, oppure None
+    se il formato o la variante non sono gestiti.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(16)
+            f.seek(0)
+            if head.startswith(b"\xff\xd8"):
+                return _probe_jpeg(f)
+            if head.startswith(b"\x89PNG\r\n\x1a\n"):
+                return _probe_png(f)
+            if head[:4] in (b"II*\x00", b"MM\x00*"):
+                return _probe_tiff(f)
+    except (OSError, struct.error, _ProbeError, ValueError, ZeroDivisionError, IndexError):
+        pass
+    return None
+
+
+def _read_exact(f, n):
+    data = f.read(n)
+    if len(data) != n: raise _ProbeError("File troncato")
+    return data
+
+
+# --- JPEG ---
+
+def _probe_jpeg(f):
+    f.seek(2)
+    size = mode = dpi = None
+    exif = None
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b"\xff": raise _ProbeError("Marker JPEG non valido")
+        marker = _read_exact(f, 1)[0]
+        while marker == 0xFF:  # byte di riempimento
+            marker = _read_exact(f, 1)[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / inizio dati compressi: header finiti
+            break
+        length = struct.unpack(">H", _read_exact(f, 2))[0]
+        if length < 2: raise _ProbeError("Segmento JPEG non valido")
+        segment = _read_exact(f, length - 2)
+        if marker == 0xE0 and segment.startswith(b"JFIF") and len(segment) >= 12:
+            unit = segment[7]
+            density = struct.unpack(">HH", segment[8:12])
+            if unit == 1:
+                dpi = density
+            elif unit == 2:
+                dpi = tuple(d * 2.54 for d in density)
+        elif marker == 0xE1 and segment.startswith(b"Exif\x00\x00") and exif is None:
+            exif = segment[6:]
+        elif marker in _JPEG_SOF_MARKERS and size is None:
+            height, width = struct.unpack(">HH", segment[1:5])
+            mode = _JPEG_MODES.get(segment[5])
+            if mode is None: return None
+            size = (width, height)
+    if size is None: return None
+    if dpi is None and exif is not None:
+        dpi = _dpi_from_exif(exif)
+    return {"size": size, "mode": mode, "dpi": dpi}
+
+
+def _dpi_from_exif(tiff_data):
+    # Stessa logica di PIL: se l'EXIF c'è ma mancano i tag di risoluzione si usano 72 DPI
+    try:
+        f = io.BytesIO(tiff_data)
+        tags = _read_tiff_ifd(f, *_read_tiff_header(f))
+        unit = tags[_TIFF_RESUNIT][0]
+        num, den = tags[_TIFF_XRES][0]
+        dpi = num / den
+        if dpi != dpi: raise ValueError
+        if unit == 3: dpi *= 2.54
+        return dpi, dpi
+    except (KeyError, IndexError, TypeError, ValueError, ZeroDivisionError, struct.error, _ProbeError):
+        return 72, 72
+
+
+# --- PNG ---
+
+def _probe_png(f):
+    f.seek(8)
+    size = mode = dpi = None
+    while True:
+        length, chunk_type = struct.unpack(">I4s", _read_exact(f, 8))
+        if chunk_type == b"IHDR":
+            data = _read_exact(f, length)
+            width, height, bit_depth, color_type = struct.unpack(">IIBB", data[:10])
+            mode = _PNG_MODES.get((bit_depth, color_type))
+            if mode is None: return None
+            size = (width, height)
+        elif chunk_type == b"pHYs":
+            px, py, unit = struct.unpack(">IIB", _read_exact(f, length)[:9])
+            if unit == 1:
+                dpi = px * 0.0254, py * 0.0254
+        elif chunk_type in (b"IDAT", b"IEND"):
+            break
+        else:
+            f.seek(length, 1)
+        f.seek(4, 1)  # CRC
+    if size is None: return None
+    return {"size": size, "mode": mode, "dpi": dpi}
+
+
+# --- TIFF ---
+
+def _read_tiff_header(f):
+    head = _read_exact(f, 8)
+    endian = {b"II": "<", b"MM": ">"}.get(head[:2])
+    if endian is None: raise _ProbeError("Byte order TIFF non valido")
+    return endian, struct.unpack(endian + "I", head[4:8])[0]
+
+
+def _read_tiff_ifd(f, endian, offset):
+    """Legge i tag di una IFD; i valori sono sempre tuple (coppie per i razionali)."""
+    f.seek(offset)
+    count = struct.unpack(endian + "H", _read_exact(f, 2))[0]
+    entries = _read_exact(f, count * 12)
+    tags = {}
+    for i in range(count):
+        entry = entries[i * 12:(i + 1) * 12]
+        tag, typ, n = struct.unpack(endian + "HHI", entry[:8])
+        if typ not in _TIFF_TYPES or n > 4096: continue
+        fmt, item_size = _TIFF_TYPES[typ]
+        total = item_size * n
+        if total <= 4:
+            raw = entry[8:8 + total]
+        else:
+            f.seek(struct.unpack(endian + "I", entry[8:12])[0])
+            raw = _read_exact(f, total)
+        values = struct.unpack(endian + fmt * n, raw)
+        if len(fmt) == 2:
+            values = tuple(zip(values[0::2], values[1::2]))
+        tags[tag] = values
+    return tags
+
+
+def _tiff_mode(photometric, samples, bps, extra):
+    if any(b != bps[0] for b in bps): return None
+    depth = bps[0]
+    if photometric in (0, 1):
+        if samples == 1 and depth in (1, 8): return "1" if depth == 1 else "L"
+        if samples == 2 and depth == 8 and extra == (2,): return "LA"
+        return None
+    if depth != 8: return None
+    if photometric == 3 and samples == 1: return "P"
+    if photometric == 2 and samples >= 3:
+        if samples == 3: return "RGB"
+        if not extra: return "RGBA" if samples == 4 else None
+        if len(extra) != samples - 3: return None
+        if extra[0] == 0: return "RGB"
+        if extra[0] in (1, 2, 999): return "RGBA"
+        return None
+    if photometric == 5 and samples >= 4:
+        if samples == 4 and not extra: return "CMYK"
+        if len(extra) == samples - 4 and all(e == 0 for e in extra): return "CMYK"
+    return None
+
+
+def _probe_tiff(f):
+    tags = _read_tiff_ifd(f, *_read_tiff_header(f))
+    if _TIFF_WIDTH not in tags or _TIFF_HEIGHT not in tags: return None
+    if any(v != 1 for v in tags.get(_TIFF_SAMPLEFORMAT, (1,))): return None
+    samples = tags.get(_TIFF_SPP, (1,))[0]
+    bps = tags.get(_TIFF_BPS, (1,))
+    if len(bps) == 1 and samples > 1: bps = bps * samples
+    if len(bps) != samples: return None
+    photometric = tags.get(_TIFF_PHOTOMETRIC, (None,))[0]
+    mode = _tiff_mode(photometric, samples, bps, tags.get(_TIFF_EXTRASAMPLES, ()))
+    if mode is None: return None
+
+    def rational(tag):
+        if tag not in tags: return 1
+        num, den = tags[tag][0]
+        if den == 0: raise _ProbeError("Risoluzione non valida")
+        return num / den
+
+    dpi = None
+    xres, yres = rational(_TIFF_XRES), rational(_TIFF_YRES)
+    if xres and yres:
+        unit = tags.get(_TIFF_RESUNIT, (None,))[0]
+        if unit in (2, None):
+            dpi = (xres, yres)
+        elif unit == 3:
+            dpi = (xres * 2.54, yres * 2.54)
+    return {"size": (tags[_TIFF_WIDTH][0], tags[_TIFF_HEIGHT][0]), "mode": mode, "dpi": dpi}
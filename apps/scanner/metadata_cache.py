@@ -0,0 +1,149 @@
+# apps/scanner/metadata_cache.py - Cache persistente (SQLite) dei metadati dei file scansionati
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+# Tipi di risultato che non vanno salvati: dipendono da errori transitori (rete, permessi)
+UNCACHEABLE_TYPES = {"ERRORE"}
+DEFAULT_MAX_AGE_DAYS = 90
+DEFAULT_MAX_ENTRIES = 200_000
+# Ogni quante scritture in sospeso viene fatto un commit durante una scansione lunga
+FLUSH_EVERY = 500
+
+
+def get_user_cache_dir():
+    """Restituisce (creandola) la cartella di cache di WinFile nel profilo utente."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+        cache_dir = os.path.join(base, "WinFile", "cache")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "winfile")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+class MetadataCache:
+    """
+    Cache dei dettagli calcolati da get_file_details, indicizzata per (percorso, dimensione, mtime_ns).
+    Un file modificato cambia dimensione o mtime e viene quindi rianalizzato.
+    Conserva anche gli hash del contenuto calcolati dalla ricerca dei doppioni, con la stessa validità.
+    Thread-safe: può essere usata direttamente dai worker della scansione.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_user_cache_dir(), "metadata.sqlite")
+        self._lock = threading.Lock()
+        self._pending = []        # righe da scrivere al prossimo flush
+        self._pending_hashes = []
+        self._touched = set()     # percorsi letti dalla cache (aggiornamento last_used)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            details TEXT NOT NULL,
+            last_used REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_files_last_used ON files(last_used)")
+        # Hash di inizio e fine del file (partial) e dell'intero file (full, NULL se non calcolato)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS hashes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            partial TEXT NOT NULL,
+            full TEXT)""")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path, stat_result):
+        """Restituisce una copia dei dettagli salvati, o None se assenti o non più validi."""
+        key = self._key(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, details FROM files WHERE path = ?", (key,)).fetchone()
+            if not row or row[0] != stat_result.st_size or row[1] != stat_result.st_mtime_ns:
+                return None
+            self._touched.add(key)
+        details = json.loads(row[2])
+        details["filename"], details["path"] = os.path.basename(path), os.path.dirname(path)
+        return details
+
+    def put(self, path, stat_result, details):
+        if not details or details.get("type") in UNCACHEABLE_TYPES: return
+        # Nome e cartella si ricavano dal percorso; scan_root dipende dalla scansione in corso
+        payload = {k: v for k, v in details.items() if k not in ("filename", "path", "scan_root")}
+        row = (self._key(path), stat_result.st_size, stat_result.st_mtime_ns, json.dumps(payload), time.time())
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def get_hashes(self, path, stat_result):
+        """(hash parziale, hash completo o None) salvati per il file, o None se assenti o non più validi."""
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, partial, full FROM hashes WHERE path = ?", (self._key(path),)).fetchone()
+        if not row or row[0] != stat_result.st_size or row[1] != stat_result.st_mtime_ns: return None
+        return row[2], row[3]
+
+    def put_hashes(self, path, stat_result, partial, full=None):
+        row = (self._key(path), stat_result.st_size, stat_result.st_mtime_ns, partial, full)
+        with self._lock:
+            self._pending_hashes.append(row)
+            if len(self._pending_hashes) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending:
+            self._conn.executemany("INSERT OR REPLACE INTO files (path, size, mtime_ns, details, last_used) VALUES (?, ?, ?, ?, ?)", self._pending)
+            self._pending = []
+        if self._pending_hashes:
+            self._conn.executemany("INSERT OR REPLACE INTO hashes (path, size, mtime_ns, partial, full) VALUES (?, ?, ?, ?, ?)", self._pending_hashes)
+            self._pending_hashes = []
+        if self._touched:
+            now = time.time()
+            self._conn.executemany("UPDATE files SET last_used = ? WHERE path = ?", [(now, key) for key in self._touched])
+            self._touched = set()
+        self._conn.commit()
+
+    def evict(self, max_age_days=DEFAULT_MAX_AGE_DAYS, max_entries=DEFAULT_MAX_ENTRIES):
+        """Elimina le voci non usate da max_age_days e le meno recenti oltre max_entries."""
+        with self._lock:
+            self._flush_locked()
+            cutoff = time.time() - max_age_days * 86400
+            removed = self._conn.execute("DELETE FROM files WHERE last_used < ?", (cutoff,)).rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            if count > max_entries:
+                removed += self._conn.execute(
+                    "DELETE FROM files WHERE path IN (SELECT path FROM files ORDER BY last_used ASC LIMIT ?)",
+                    (count - max_entries,)).rowcount
+            # Gli hash seguono i metadati del loro file
+            self._conn.execute("DELETE FROM hashes WHERE path NOT IN (SELECT path FROM files)")
+            self._conn.commit()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._pending, self._pending_hashes, self._touched = [], [], set()
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM hashes")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
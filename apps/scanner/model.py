@@ -0,0 +1,51 @@
+# apps/scanner/model.py - Tipi dei risultati di Liste Anteprime
+#
+# I risultati restano dizionari (la cache dei metadati li salva così come sono e i
+# processi del RenderPool li ricevono senza conversioni): qui ne sono descritte le chiavi,
+# per l'analisi statica e per chi usa il motore fuori dall'interfaccia.
+from typing import List, Sequence, TypedDict
+
+
+class _PageSize(TypedDict):
+    dimensions_cm: str       # "21.00 x 29.70", oppure un messaggio se non rilevabili
+    width_cm: float
+    height_cm: float
+    area_sqm: float
+
+
+class PageDetails(_PageSize, total=False):
+    """Dimensioni di una pagina; le chiavi trim_* solo se il PDF ha un TrimBox diverso."""
+    trim_dimensions_cm: str
+    trim_width_cm: float
+    trim_height_cm: float
+    trim_area_sqm: float
+
+
+class _FileBase(TypedDict):
+    filename: str
+    path: str                # cartella del file
+    type: str                # "JPG", "PDF", "AI", "PDF (Danneggiato)", "NON SUPPORTATO", "ERRORE"...
+    page_count: int
+    # Lista di PageDetails, o PageList (vista sulla PageTable) dopo la scansione
+    pages_details: Sequence[PageDetails]
+
+
+class FileInfo(_FileBase, total=False):
+    """Dettagli di un file analizzato (FileAnalyzer.get_file_details)."""
+    scan_root: str           # cartella di scansione che lo contiene
+    size: int                # firma usata da "Aggiorna"
+    mtime_ns: int
+    w_px: int                # solo immagini
+    h_px: int
+    dpi_str: str
+    color_mode: str
+    pages_pending: bool      # PDF di cui sono state lette solo le prime PDF_EAGER_PAGES pagine
+
+
+class PageRef(TypedDict):
+    """Una pagina da copiare o esportare."""
+    file_info: FileInfo
+    page_num: int
+
+
+PageRefs = List[PageRef]
@@ -0,0 +1,279 @@
+# apps/scanner/page_table.py - Dimensioni di pagina memorizzate a colonne (NumPy)
+#
+# Con centinaia di migliaia di pagine un dizionario per pagina (float e stringhe già
+# formattate) occupa centinaia di byte. Qui tutte le pagine di una sessione stanno
+# in un'unica matrice float64 (una riga per pagina); ogni file tiene solo un PageList,
+# cioè l'intervallo delle sue righe. Le aree non si memorizzano (sono sempre
+# larghezza x altezza / 10000, come in get_file_details), le stringhe "21.00 x 29.70"
+# si formattano quando vengono lette e i totali di area sono somme vettoriali.
+import threading
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+# Colonne numeriche; le colonne al vivo valgono NaN se la pagina non ha una TrimBox diversa
+_COLUMNS = ("width_cm", "height_cm", "trim_width_cm", "trim_height_cm")
+_W, _H, _TW, _TH = range(len(_COLUMNS))
+_COLUMN_INDEX = {name: i for i, name in enumerate(_COLUMNS)}
+_BASE_KEYS = ("dimensions_cm", "width_cm", "height_cm", "area_sqm")
+_TRIM_KEYS = ("trim_dimensions_cm", "trim_width_cm", "trim_height_cm", "trim_area_sqm")
+
+
+def _format_dimensions(width, height):
+    return f"{width:.2f} x {height:.2f}"
+
+
+def _parse_dimensions(text):
+    try:
+        width, height = (float(v) for v in text.split(" x "))
+        return width, height
+    except (AttributeError, ValueError):
+        return None
+
+
+class PageTable:
+    """
+    Archivio delle pagine di una sessione. Thread-safe in scrittura: i worker della
+    scansione aggiungono le pagine dei file mentre l'interfaccia legge quelle già presenti.
+    Le righe dei file rimossi o aggiornati restano inutilizzate finché la tabella non viene
+    sostituita da compacted, che copia solo le righe ancora in uso.
+    """
+    def __init__(self, capacity=4096):
+        self._lock = threading.Lock()
+        self._values = np.zeros((capacity, len(_COLUMNS)))
+        # Testo delle dimensioni quando non è numerico ("Non rilevabili", ...): 0 = da formattare
+        self._labels = np.zeros(capacity, dtype=np.int16)
+        self._label_texts = [None]
+        self._label_codes = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pages):
+        """Aggiunge le pagine (dizionari come quelli di get_file_details) e restituisce il loro PageList."""
+        rows, labels = [], []
+        for page in pages:
+            width, height = float(page.get("width_cm", 0)), float(page.get("height_cm", 0))
+            trim_w, trim_h = page.get("trim_width_cm"), page.get("trim_height_cm")
+            if trim_w is None:
+                # Voci salvate in cache prima delle colonne al vivo numeriche
+                trim_w, trim_h = _parse_dimensions(page.get("trim_dimensions_cm")) or (np.nan, np.nan)
+            rows.append((width, height, trim_w, trim_h))
+            text = page.get("dimensions_cm", "")
+            labels.append(0 if text == _format_dimensions(width, height) else self._label_code(text))
+        with self._lock:
+            start = self._size
+            self._reserve(start + len(rows))
+            if rows:
+                self._values[start:start + len(rows)] = rows
+                self._labels[start:start + len(rows)] = labels
+            self._size += len(rows)
+        return PageList(self, start, len(rows))
+
+    def _label_code(self, text):
+        with self._lock:
+            if (code := self._label_codes.get(text)) is None:
+                code = self._label_codes[text] = len(self._label_texts)
+                self._label_texts.append(text)
+        return code
+
+    def _reserve(self, needed):
+        capacity = len(self._labels)
+        if needed <= capacity: return
+        capacity = max(capacity + capacity // 2, needed, 1024)
+        # Nuove matrici assegnate solo dopo la copia: chi legge vede sempre dati validi
+        values = np.zeros((capacity, len(_COLUMNS)))
+        values[:self._size] = self._values[:self._size]
+        labels = np.zeros(capacity, dtype=np.int16)
+        labels[:self._size] = self._labels[:self._size]
+        self._values, self._labels = values, labels
+
+    @classmethod
+    def compacted(cls, page_lists):
+        """
+        Nuova tabella con le sole righe di page_lists (di questa o di altre tabelle), nello
+        stesso ordine; restituisce (tabella, nuovi PageList). Le tabelle di partenza non
+        cambiano: chi sta leggendo un vecchio PageList continua a vedere i suoi dati.
+        """
+        page_lists = list(page_lists)
+        counts = np.fromiter(map(len, page_lists), dtype=np.int64, count=len(page_lists))
+        starts = np.cumsum(counts) - counts
+        table = cls(capacity=max(int(counts.sum()), 1))
+        by_table = {}
+        for i, pages in enumerate(page_lists):
+            if pages._count: by_table.setdefault(id(pages._table), (pages._table, []))[1].append(i)
+        for source, indexes in by_table.values():
+            indexes = np.asarray(indexes, dtype=np.int64)
+            source_starts = np.fromiter((page_lists[i]._start for i in indexes.tolist()), dtype=np.int64, count=len(indexes))
+            with source._lock:
+                rows = _row_indexes(source_starts, counts[indexes])
+                values, labels, texts = source._values[rows], source._labels[rows], list(source._label_texts)
+            # I codici dei testi non numerici sono propri di ogni tabella
+            codes = np.array([0, *(table._label_code(text) for text in texts[1:])], dtype=np.int16)
+            rows = _row_indexes(starts[indexes], counts[indexes])
+            table._values[rows], table._labels[rows] = values, codes[labels]
+        table._size = int(counts.sum())
+        return table, [PageList(table, start, count) for start, count in zip(starts.tolist(), counts.tolist())]
+
+    def adopt(self, pages):
+        """pages (PageList) se è di questa tabella, altrimenti un nuovo PageList con una copia delle sue righe."""
+        return pages if pages._table is self else self.add(pages)
+
+    def shrink(self):
+        """Libera lo spazio riservato in eccesso (da chiamare a fine scansione)."""
+        with self._lock:
+            self._values = self._values[:self._size].copy()
+            self._labels = self._labels[:self._size].copy()
+
+    def _has_trim(self, row):
+        return not np.isnan(self._values[row, _TW])
+
+    def _get(self, row, key):
+        values = self._values[row]
+        if key == "dimensions_cm":
+            label = self._labels[row]
+            return self._label_texts[label] if label else _format_dimensions(values[_W], values[_H])
+        if key == "area_sqm": return float(values[_W] * values[_H]) / 10000
+        if key in _TRIM_KEYS and not self._has_trim(row): raise KeyError(key)
+        if key == "trim_dimensions_cm": return _format_dimensions(values[_TW], values[_TH])
+        if key == "trim_area_sqm": return float(values[_TW] * values[_TH]) / 10000
+        if key in _COLUMN_INDEX: return float(values[_COLUMN_INDEX[key]])
+        raise KeyError(key)
+
+    def _keys(self, row):
+        return _BASE_KEYS + _TRIM_KEYS if self._has_trim(row) else _BASE_KEYS
+
+    def totals(self, start, count):
+        """(area, area al vivo) di un intervallo di righe; senza TrimBox l'area al vivo è l'area."""
+        return _sum_areas(self._values[start:start + count])
+
+
+def _row_indexes(starts, counts):
+    # Indici di tutte le righe degli intervalli: per ognuno start, start+1, ..., start+count-1
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+def _row_areas(block):
+    """Aree delle righe; senza TrimBox l'area al vivo è l'area."""
+    area = block[:, _W] * block[:, _H] / 10000
+    trim_area = block[:, _TW] * block[:, _TH] / 10000
+    return area, np.where(np.isnan(trim_area), area, trim_area)
+
+
+def _sum_areas(block):
+    area, trim_area = _row_areas(block)
+    return float(area.sum()), float(trim_area.sum())
+
+
+class PageView(Mapping):
+    """Una pagina, letta dalla tabella: si usa come il dizionario della pagina."""
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table, self._row = table, row
+
+    def __getitem__(self, key):
+        return self._table._get(self._row, key)
+
+    def __iter__(self):
+        return iter(self._table._keys(self._row))
+
+    def __len__(self):
+        return len(self._table._keys(self._row))
+
+    def __repr__(self):
+        return f"PageView({dict(self)!r})"
+
+
+class PageList(Sequence):
+    """Le pagine di un file: sostituisce la lista pages_details di dizionari."""
+    __slots__ = ("_table", "_start", "_count")
+
+    def __init__(self, table, start, count):
+        self._table, self._start, self._count = table, start, count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0: index += self._count
+        if not 0 <= index < self._count: raise IndexError("pagina fuori intervallo")
+        return PageView(self._table, self._start + index)
+
+    def __add__(self, other):
+        return self.to_dicts() + list(other)
+
+    def to_dicts(self):
+        return [dict(page) for page in self]
+
+    def extend(self, pages):
+        # Le righe di un file devono restare contigue: il file viene riscritto in fondo alla tabella
+        moved = self._table.add(self.to_dicts() + [dict(page) for page in pages])
+        self._start, self._count = moved._start, moved._count
+
+    def totals(self):
+        return self._table.totals(self._start, self._count)
+
+
+def page_totals(page_lists):
+    """
+    (area, area al vivo) di più elenchi di pagine, con un'unica somma vettoriale per tabella.
+    Accetta anche normali liste di dizionari.
+    """
+    area = trim_area = 0.0
+    ranges = {}
+    for pages in page_lists:
+        if isinstance(pages, PageList):
+            entry = ranges.setdefault(id(pages._table), (pages._table, [], []))
+            entry[1].append(pages._start); entry[2].append(pages._count)
+        else:
+            area += sum(p.get('area_sqm', 0) for p in pages)
+            trim_area += sum(p.get('trim_area_sqm', p.get('area_sqm', 0)) for p in pages)
+    for table, starts, counts in ranges.values():
+        starts, counts = np.array(starts, dtype=np.int64), np.array(counts, dtype=np.int64)
+        file_area, file_trim_area = _sum_areas(table._values[_row_indexes(starts, counts)])
+        area += file_area; trim_area += file_trim_area
+    return area, trim_area
+
+
+def file_totals(page_lists):
+    """Liste (area, area al vivo) con i totali di ciascun elenco di pagine, nello stesso ordine."""
+    page_lists = list(page_lists)
+    areas, trim_areas = [0.0] * len(page_lists), [0.0] * len(page_lists)
+    by_table = {}
+    for i, pages in enumerate(page_lists):
+        if isinstance(pages, PageList):
+            if pages._count: by_table.setdefault(id(pages._table), (pages._table, []))[1].append(i)
+        else:
+            areas[i] = sum(p.get('area_sqm', 0) for p in pages)
+            trim_areas[i] = sum(p.get('trim_area_sqm', p.get('area_sqm', 0)) for p in pages)
+    for table, indexes in by_table.values():
+        starts = np.array([page_lists[i]._start for i in indexes], dtype=np.int64)
+        counts = np.array([page_lists[i]._count for i in indexes], dtype=np.int64)
+        area, trim_area = _row_areas(table._values[_row_indexes(starts, counts)])
+        offsets = np.cumsum(counts) - counts
+        for i, a, t in zip(indexes, np.add.reduceat(area, offsets).tolist(), np.add.reduceat(trim_area, offsets).tolist()):
+            areas[i], trim_areas[i] = a, t
+    return areas, trim_areas
+
+
+def page_areas(page_refs):
+    """Liste (area, area al vivo) delle singole pagine indicate come coppie (elenco di pagine, numero)."""
+    page_refs = list(page_refs)
+    areas, trim_areas = [0.0] * len(page_refs), [0.0] * len(page_refs)
+    by_table = {}
+    for i, (pages, page_num) in enumerate(page_refs):
+        if isinstance(pages, PageList):
+            _, indexes, rows = by_table.setdefault(id(pages._table), (pages._table, [], []))
+            indexes.append(i); rows.append(pages._start + page_num)
+        else:
+            page = pages[page_num]
+            areas[i], trim_areas[i] = page.get('area_sqm', 0), page.get('trim_area_sqm', page.get('area_sqm', 0))
+    for table, indexes, rows in by_table.values():
+        area, trim_area = _row_areas(table._values[np.array(rows, dtype=np.int64)])
+        for i, a, t in zip(indexes, area.tolist(), trim_area.tolist()):
+            areas[i], trim_areas[i] = a, t
+    return areas, trim_areas
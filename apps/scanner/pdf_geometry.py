@@ -0,0 +1,133 @@
+# apps/scanner/pdf_geometry.py - Formato pagine PDF letto dall'albero delle pagine
+#
+# Per conoscere dimensioni e TrimBox di ogni pagina non serve caricare le pagine
+# (doc.load_page / iterazione su doc, che in PyMuPDF carica anche annotazioni e link):
+# basta leggere i dizionari /Page risolvendo gli attributi ereditati dai nodi /Pages.
+# I valori restituiti coincidono con page.rect e page.trimbox di PyMuPDF.
+import re
+
+_REF_RE = re.compile(r"(\d+)\s+\d+\s+R")
+# Attributi ereditabili dai nodi /Pages (la TrimBox non lo è)
+_INHERITABLE = ("MediaBox", "CropBox", "Rotate")
+DEFAULT_MEDIABOX = (0.0, 0.0, 612.0, 792.0)  # Letter, come MuPDF
+
+
+class PageTreeError(Exception):
+    pass
+
+
+def _read_dict(doc, xref):
+    """
+    Chiavi di primo livello di un dizionario PDF, come stringhe.
+    Una sola chiamata a xref_object per nodo è molto più veloce di una xref_get_key per chiave:
+    nella forma non compressa le chiavi di primo livello sono le righe con due spazi di rientro.
+    """
+    result, key, parts = {}, None, []
+    for line in doc.xref_object(xref, compressed=False).splitlines()[1:]:
+        if line.startswith("  /") and not line.startswith("   "):
+            if key: result[key] = " ".join(parts)
+            key, _, value = line[3:].partition(" ")
+            parts = [value.strip()]
+        elif key and line.startswith("   ") and parts[0].startswith("[") and "]" not in parts[-1]:
+            parts.append(line.strip())  # array che prosegue sulla riga successiva
+    if key: result[key] = " ".join(parts)
+    return result
+
+
+def _resolve(doc, value):
+    """Se il valore è un riferimento indiretto restituisce l'oggetto puntato."""
+    if value and (ref := _REF_RE.fullmatch(value.strip())):
+        return doc.xref_object(int(ref.group(1)), compressed=True).strip()
+    return value
+
+
+def _parse_box(value):
+    if not value: return None
+    try:
+        x0, y0, x1, y1 = (float(v) for v in value.strip("[] \n").split()[:4])
+    except ValueError:
+        return None
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+def _parse_int(value, default=0):
+    try: return int(float(value))
+    except (TypeError, ValueError): return default
+
+
+def _page_geometry(mediabox, cropbox, rotate, trimbox):
+    """Restituisce (larghezza, altezza, trim) in punti, con trim = (larghezza, altezza) o None."""
+    mb = mediabox or DEFAULT_MEDIABOX
+    cb = cropbox or mb
+    # La CropBox viene ritagliata sulla MediaBox
+    cb = (max(cb[0], mb[0]), max(cb[1], mb[1]), min(cb[2], mb[2]), min(cb[3], mb[3]))
+    if cb[2] <= cb[0] or cb[3] <= cb[1]: cb = mb
+    width, height = cb[2] - cb[0], cb[3] - cb[1]
+    if rotate % 180 == 90: width, height = height, width
+    # page.rect è sempre in origine (0, 0); page.trimbox è nelle coordinate non ruotate
+    # con l'asse y verso il basso: la si confronta con page.rect come fa get_file_details.
+    # In assenza di TrimBox PyMuPDF restituisce la CropBox originale, non ritagliata
+    tb = trimbox or cropbox or mb
+    trim_rect = (tb[0], mb[3] - tb[3], tb[2], mb[3] - tb[1])
+    if trim_rect == (0.0, 0.0, width, height) or tb[2] <= tb[0] or tb[3] <= tb[1]:
+        return width, height, None
+    return width, height, (tb[2] - tb[0], tb[3] - tb[1])
+
+
+def iter_page_geometry(doc, start=0, stop=None):
+    """
+    Genera (larghezza, altezza, trim) per le pagine [start, stop) visitando l'albero /Pages.
+    I sottoalberi interamente prima di start vengono saltati usando /Count.
+    Solleva PageTreeError se l'albero non è leggibile (il chiamante userà PyMuPDF).
+    """
+    total = len(doc)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop: return
+    catalog = doc.pdf_catalog()
+    root = _REF_RE.fullmatch(_read_dict(doc, catalog).get("Pages", "")) if catalog > 0 else None
+    if not root: raise PageTreeError("Albero delle pagine non trovato")
+
+    index = 0
+    # Pila di (xref, attributi ereditati, profondità)
+    stack = [(int(root.group(1)), {}, 0)]
+    while stack:
+        xref, inherited, depth = stack.pop()
+        if depth > 64: raise PageTreeError("Albero delle pagine troppo profondo")
+        node = _read_dict(doc, xref)
+        attrs = dict(inherited)
+        for key in _INHERITABLE:
+            if key in node and node[key] != "null": attrs[key] = _resolve(doc, node[key])
+        if "Kids" in node and node.get("Type") != "/Page":
+            count = _parse_int(_resolve(doc, node.get("Count")), default=-1)
+            if 0 <= count and index + count <= start:
+                index += count  # sottoalbero interamente prima dell'intervallo richiesto
+                continue
+            children = [int(ref) for ref in _REF_RE.findall(_resolve(doc, node["Kids"]))]
+            stack.extend((child, attrs, depth + 1) for child in reversed(children))
+            continue
+        if index >= start:
+            yield _page_geometry(_parse_box(attrs.get("MediaBox")), _parse_box(attrs.get("CropBox")),
+                                 _parse_int(attrs.get("Rotate")) % 360, _parse_box(_resolve(doc, node.get("TrimBox"))))
+        index += 1
+        if index >= stop: return
+    if index < stop: raise PageTreeError("Numero di pagine incoerente")
+
+
+def read_page_geometry(doc, start=0, stop=None):
+    """
+    Lista di (larghezza, altezza, trim) per le pagine [start, stop).
+    Se l'albero delle pagine non è leggibile (PDF danneggiati riparati da MuPDF)
+    usa le pagine caricate da PyMuPDF, con lo stesso risultato.
+    """
+    stop = len(doc) if stop is None else min(stop, len(doc))
+    try:
+        return list(iter_page_geometry(doc, start, stop))
+    except (PageTreeError, ValueError, RuntimeError):
+        pass
+    geometry = []
+    for page_num in range(start, stop):
+        page = doc.load_page(page_num)
+        rect, trim_rect = page.rect, page.trimbox
+        trim = (trim_rect.width, trim_rect.height) if trim_rect and trim_rect != rect else None
+        geometry.append((rect.width, rect.height, trim))
+    return geometry
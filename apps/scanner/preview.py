@@ -0,0 +1,104 @@
+# apps/scanner/preview.py - Anteprima della riga selezionata, renderizzata in background
+#
+# Scorrendo la tabella con le frecce ogni riga chiede un'anteprima: renderizzarle tutte
+# sul thread dell'interfaccia (un TIFF grande, una tavola PDF) blocca la tabella a ogni
+# riga. Qui un thread dedicato renderizza solo l'ultima richiesta, dopo una breve attesa
+# senza nuove selezioni; le anteprime recenti restano in memoria già decodificate.
+import io
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+from .document_cache import shared_documents
+from .results import full_path_of
+from .thumbnails import render_thumbnail, thumbnail_job
+
+# Attesa senza nuove selezioni prima di renderizzare (secondi)
+PREVIEW_DEBOUNCE = 0.12
+# Anteprime tenute in memoria (circa 270 KB ciascuna a 300x300)
+PREVIEW_CACHE_ITEMS = 32
+# Le pagine PDF vengono rasterizzate alla dimensione dell'anteprima, al più a questa risoluzione
+PREVIEW_PDF_DPI = 300
+
+
+class PreviewService:
+    """
+    Anteprime grandi al più size, renderizzate da un thread dedicato.
+    request(file_info, page_num, on_ready) restituisce un numero di richiesta; on_ready(numero,
+    immagine PIL o None) è chiamata dal thread del servizio solo se nel frattempo non è
+    arrivata un'altra richiesta. cached restituisce subito le anteprime già pronte.
+    """
+    def __init__(self, size, cache_dir=None, debounce=PREVIEW_DEBOUNCE, cache_items=PREVIEW_CACHE_ITEMS):
+        self.size = size
+        self.cache_dir = cache_dir
+        self.debounce = debounce
+        self.cache_items = cache_items
+        self._images = OrderedDict()   # (percorso, firma, pagina) -> Image
+        self._condition = threading.Condition()
+        self._pending = None           # (numero, istante, file_info, pagina, on_ready)
+        self._last_seq = 0
+        self._thread = None
+
+    @staticmethod
+    def _key(file_info, page_num):
+        return full_path_of(file_info), file_info.get('size'), file_info.get('mtime_ns'), page_num
+
+    def cached(self, file_info, page_num):
+        with self._condition:
+            if (img := self._images.get(self._key(file_info, page_num))) is not None:
+                self._images.move_to_end(self._key(file_info, page_num))
+            return img
+
+    def request(self, file_info, page_num, on_ready):
+        with self._condition:
+            self._last_seq += 1
+            self._pending = (self._last_seq, time.monotonic(), file_info, page_num, on_ready)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+            return self._last_seq
+
+    def cancel(self):
+        """Scarta la richiesta in attesa; quella in corso non verrà consegnata."""
+        with self._condition:
+            self._last_seq += 1
+            self._pending = None
+
+    def clear(self):
+        with self._condition: self._images.clear()
+
+    def _run(self):
+        # I documenti PDF restano aperti in questo thread per le pagine successive
+        idle_timeout = shared_documents.idle_seconds + 0.5
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    if not self._condition.wait(idle_timeout): shared_documents.sweep()
+                seq, requested_at, file_info, page_num, on_ready = self._pending
+                # Debounce: si renderizza solo quando la selezione resta ferma
+                if (delay := requested_at + self.debounce - time.monotonic()) > 0:
+                    self._condition.wait(delay)
+                    continue
+                self._pending = None
+            img = self._render(file_info, page_num)
+            with self._condition:
+                if img is not None:
+                    self._images[self._key(file_info, page_num)] = img
+                    while len(self._images) > self.cache_items: self._images.popitem(last=False)
+                if seq != self._last_seq: continue
+            try: on_ready(seq, img)
+            except Exception as e: print(f"Errore consegna anteprima: {e}")
+
+    def _render(self, file_info, page_num):
+        try:
+            data = render_thumbnail(thumbnail_job(file_info, page_num, PREVIEW_PDF_DPI, self.size, cache_dir=self.cache_dir))
+            if not data: return None
+            img = Image.open(io.BytesIO(data))
+            img.load()
+            return img
+        except Exception as e:
+            print(f"Errore anteprima: {e}")
+            return None
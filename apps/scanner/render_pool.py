@@ -0,0 +1,79 @@
+# apps/scanner/render_pool.py - Pool di rendering delle miniature per le esportazioni
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .document_cache import shared_documents
+
+DEFAULT_RENDER_WORKERS = os.cpu_count() or 4
+
+
+class RenderPool:
+    """
+    Un unico pool per tutta l'esportazione: i lavori di tutte le cartelle vengono inviati
+    nell'ordine di uscita e i worker restano occupati anche a cavallo tra una cartella e
+    l'altra. imap restituisce i risultati nello stesso ordine appena sono pronti, così
+    l'HTML di ogni sezione si scrive senza aspettare il resto.
+    Restano in memoria al massimo `ahead` risultati non ancora consumati.
+    Con processes=True i lavori girano in processi separati (niente contesa sul GIL per
+    decodifica, ridimensionamento e codifica): func e i task devono essere serializzabili,
+    come render_thumbnail e i job di thumbnail_job.
+    on_progress(completate, totale, pagine_al_secondo) viene chiamata dai worker al più
+    ogni progress_interval secondi, e sempre all'ultima pagina.
+    """
+    def __init__(self, max_workers=None, ahead=None, on_progress=None, progress_interval=0.25, processes=False):
+        self.max_workers = max(1, max_workers or DEFAULT_RENDER_WORKERS)
+        self.processes = processes
+        self.ahead = max(self.max_workers, ahead or self.max_workers * 8)
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+
+    def _executor(self):
+        if self.processes:
+            # Su Windows ProcessPoolExecutor accetta al massimo 61 processi
+            return ProcessPoolExecutor(max_workers=min(self.max_workers, 61))
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def imap(self, func, tasks):
+        tasks = list(tasks)
+        total, lock = len(tasks), threading.Lock()
+        state = {'done': 0, 'reported': 0.0}
+        started = time.perf_counter()
+
+        def task_done(_future):
+            if not self.on_progress: return
+            with lock:
+                state['done'] += 1
+                done, now = state['done'], time.perf_counter()
+                if done < total and now - state['reported'] < self.progress_interval: return
+                state['reported'] = now
+            elapsed = now - started
+            self.on_progress(done, total, done / elapsed if elapsed > 0 else 0.0)
+
+        with contextlib.ExitStack() as stack:
+            # Alla chiusura del pool (anche interrotta) i thread worker sono terminati: i PDF che
+            # tenevano aperti si chiudono subito, senza attendere idle_seconds con i file bloccati
+            stack.callback(shared_documents.release_finished)
+            executor = stack.enter_context(self._executor())
+            pending, position = deque(), 0
+
+            def submit_until(limit):
+                nonlocal position
+                while position < min(limit, total):
+                    future = executor.submit(func, tasks[position])
+                    future.add_done_callback(task_done)
+                    pending.append(future)
+                    position += 1
+
+            submit_until(self.ahead)
+            try:
+                while pending:
+                    result = pending.popleft().result()
+                    submit_until(position + 1)
+                    yield result
+            finally:
+                # Esportazione interrotta: i lavori non ancora avviati non servono più
+                for future in pending: future.cancel()
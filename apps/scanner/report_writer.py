@@ -0,0 +1,131 @@
+# apps/scanner/report_writer.py - Report PDF ReportLab costruito in streaming
+#
+# doc.build di ReportLab consuma la lista dei flowable dalla testa: invece di preparare
+# tutta la "story" (con le miniature di ogni pagina in memoria) la si riempie man mano
+# da un generatore, così restano in memoria solo i flowable dell'ultima pagina in
+# costruzione e poche righe di anticipo.
+import contextlib
+import io
+import math
+import os
+from collections import defaultdict
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import Image as ReportLabImage, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table
+
+from .render_pool import RenderPool
+from .thumbnails import render_thumbnail, thumbnail_job
+
+# Densità delle miniature stampate nelle celle del report
+REPORT_THUMB_DPI = 150
+# Miniature renderizzate in anticipo sull'impaginazione di ReportLab
+REPORT_RENDER_AHEAD = 64
+
+
+def report_thumb_size(cell_width, dpi=REPORT_THUMB_DPI):
+    """Lato in pixel di una miniatura larga cell_width punti, stampata a dpi."""
+    side = max(1, math.ceil(cell_width / 72 * dpi))
+    return side, side
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    """
+    SimpleDocTemplate che riceve i flowable da un iterabile: build_streaming ne legge al
+    massimo `ahead` prima di quello in lavorazione (filterFlowables è chiamato da
+    ReportLab prima di ogni flowable).
+    """
+    def __init__(self, filename, ahead=8, **kw):
+        super().__init__(filename, **kw)
+        self.ahead = max(1, ahead)
+        self._source = self._pending = None
+
+    def build_streaming(self, flowables):
+        self._source, self._pending = iter(flowables), []
+        self._refill(self._pending)
+        try:
+            self.build(self._pending)
+        finally:
+            self._source = self._pending = None
+
+    def filterFlowables(self, flowables):
+        # Chiamato anche per le liste interne di ReportLab (es. _hanging): si riempie solo la nostra
+        if flowables is self._pending: self._refill(flowables)
+        super().filterFlowables(flowables)
+
+    def _refill(self, flowables):
+        while self._source is not None and len(flowables) <= self.ahead:
+            try:
+                flowables.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+
+def write_pdf_report(file_path, pages_to_export, aggregator, columns=4, orientation="portrait", processes=False,
+                     max_workers=None, on_progress=None, cache_dir=None):
+    """
+    Report PDF a griglia: una sezione per cartella di scansione con i totali, poi le
+    miniature con nome e dimensioni. Le miniature (JPEG alla dimensione della cella)
+    sono renderizzate dal RenderPool nell'ordine del report, con qualche riga di anticipo
+    sull'impaginazione; max_workers, processes e on_progress sono passati al pool.
+    """
+    grouped_pages = defaultdict(list)
+    for page in pages_to_export: grouped_pages[page['file_info']['scan_root']].append(page)
+    page_size = landscape(A4) if orientation == 'landscape' else A4
+    doc = StreamingDocTemplate(file_path, pagesize=page_size, topMargin=1.5*cm, bottomMargin=1.5*cm, leftMargin=1.5*cm, rightMargin=1.5*cm)
+    styles = getSampleStyleSheet()
+    filename_style = ParagraphStyle('file_style', parent=styles['Normal'], fontSize=8, alignment=1)
+    dims_style = ParagraphStyle('dims_style', parent=styles['Normal'], fontSize=7, textColor=colors.darkgrey, alignment=1)
+    trim_dims_style = ParagraphStyle('trim_dims_style', parent=styles['Normal'], fontSize=6, textColor=colors.red, alignment=1)
+    folder_header_style = ParagraphStyle('folder_header', parent=styles['h2'], backColor=colors.lightblue, padding=4, textColor=colors.black)
+    col_width = (doc.width / columns) - (cm * 0.2 * (columns - 1))
+    image_width = col_width * 0.9
+    thumb_size = report_thumb_size(image_width)
+    sorted_grouped_pages = sorted(grouped_pages.items(), key=lambda item: item[0])
+    # Pagine PDF al più a REPORT_THUMB_DPI, tutte entro la dimensione della cella
+    jobs = [thumbnail_job(p['file_info'], p['page_num'], REPORT_THUMB_DPI, thumb_size, "JPEG", cache_dir=cache_dir)
+            for _, pages in sorted_grouped_pages for p in pages]
+    render_pool = RenderPool(max_workers=max_workers, ahead=max(REPORT_RENDER_AHEAD, columns * 4), on_progress=on_progress, processes=processes)
+    report_images = render_pool.imap(render_thumbnail, jobs)
+    # Ogni riga della griglia è una tabella a sé: ReportLab la disegna e la rilascia
+    # prima di chiedere la successiva. Il bordo esterno è ricomposto riga per riga.
+    line = (1, colors.lightgrey)
+    row_style = [('VALIGN',(0,0),(-1,-1),'TOP'), ('ALIGN',(0,0),(-1,-1),'CENTER'), ('PADDING',(0,0),(-1,-1),6),
+                 ('LINEBEFORE',(0,0),(0,-1),*line), ('LINEAFTER',(-1,0),(-1,-1),*line)]
+
+    def cell_content(page_data, img_data):
+        item_data, page_num = page_data['file_info'], page_data['page_num']
+        page_details = item_data['pages_details'][page_num]
+        content = []
+        if img_data: content.append(ReportLabImage(io.BytesIO(img_data), width=image_width, height=image_width, kind='proportional'))
+        page_info = f" (Pag. {page_num + 1}/{item_data.get('page_count', 1)})" if item_data.get('page_count', 1) > 1 else ""
+        content.append(Paragraph(item_data['filename'] + page_info, filename_style))
+        dpi_info = f"({item_data['dpi_str']})" if item_data.get('dpi_str') else ""
+        content.append(Paragraph(page_details['dimensions_cm'] + f" cm {dpi_info}", dims_style))
+        if 'trim_dimensions_cm' in page_details:
+            content.append(Paragraph(f"Al vivo: {page_details['trim_dimensions_cm']} cm", trim_dims_style))
+        return content
+
+    def report_flowables():
+        for folder_idx, (folder, pages) in enumerate(sorted_grouped_pages):
+            if folder_idx: yield PageBreak()
+            totals = aggregator.root(folder)
+            area_text = f"Area: {totals.sqm:.2f} m²"
+            if totals.has_trim:
+                area_text += f" (Al vivo: {totals.trim_sqm:.2f} m²)"
+            yield Paragraph(os.path.basename(folder), folder_header_style)
+            yield Paragraph(f"File: {totals.files} | Pagine: {totals.pages} | {area_text}", styles['Normal'])
+            yield Spacer(1, 0.5*cm)
+            row_starts = range(0, len(pages), columns)
+            for row_start in row_starts:
+                row = [cell_content(p, next(report_images)) for p in pages[row_start:row_start + columns]]
+                row.extend([""] * (columns - len(row)))
+                style = list(row_style)
+                if row_start == row_starts[0]: style.append(('LINEABOVE',(0,0),(-1,0),*line))
+                if row_start == row_starts[-1]: style.append(('LINEBELOW',(0,-1),(-1,-1),*line))
+                yield Table([row], colWidths=[col_width]*columns, style=style)
+
+    with contextlib.closing(report_images):
+        doc.build_streaming(report_flowables())
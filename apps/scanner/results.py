@@ -0,0 +1,156 @@
+# apps/scanner/results.py - Indice dei risultati di scansione per id e per percorso
+import os
+
+import numpy as np
+
+
+def full_path_of(file_info):
+    return os.path.join(file_info['path'], file_info['filename'])
+
+
+class ResultStore:
+    """
+    Indice dei risultati di una scansione, usato per trovare in tempo costante il file
+    di una riga della tabella. Ogni file riceve un id intero, stabile finché il percorso
+    resta nei risultati (anche dopo "Aggiorna"), e gli iid della tabella sono:
+      "<id>"        riga del file (per i file a pagina singola è anche la riga della pagina)
+      "<id>.<n>"    pagina n di un file multi-pagina
+      "<id>.p"      segnaposto delle pagine non ancora lette
+      "d<id>"       cartella di scansione
+    Con filter si mostra solo una parte dei file (la ricerca): quelli nascosti non
+    compaiono nelle cartelle, in lookup e in pages_for.
+    """
+    def __init__(self):
+        self._items = {}         # id -> file_info
+        self._ids = {}           # percorso completo -> id
+        self._positions = {}     # id -> posizione nell'elenco dei risultati
+        self._folders = {}       # iid cartella -> (scan_root, [id dei file mostrati], [loro iid])
+        self._groups = {}        # iid cartella -> (scan_root, posizioni di tutti i suoi file)
+        self._order = np.zeros(0, dtype=np.int64)   # posizione -> id
+        self._order_iids = np.zeros(0, dtype=object)  # posizione -> iid della riga del file
+        self._shown = None       # maschera dei file mostrati (per posizione), None = tutti
+        self._folder_ids = {}    # scan_root -> iid cartella
+        self._next_id = 1
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id - 1
+
+    def sync(self, results):
+        """Allinea l'indice all'elenco ordinato dei risultati (O(n), senza rileggere i file)."""
+        items, ids, positions, grouped, order = {}, {}, {}, {}, []
+        for position, file_info in enumerate(results):
+            path = full_path_of(file_info)
+            file_id = self._ids.get(path) or self._new_id()
+            items[file_id], ids[path], positions[file_id] = file_info, file_id, position
+            order.append(file_id)
+            grouped.setdefault(file_info.get('scan_root', 'N/A'), []).append(position)
+        folder_ids = {root: self._folder_ids.get(root) or f"d{self._new_id()}" for root in grouped}
+        self._items, self._ids, self._positions, self._folder_ids = items, ids, positions, folder_ids
+        self._order = np.asarray(order, dtype=np.int64)
+        self._order_iids = np.array(list(map(self.file_iid, order)), dtype=object)
+        self._groups = {folder_ids[root]: (root, np.asarray(grouped[root], dtype=np.int64)) for root in sorted(grouped)}
+        self.filter(None)
+
+    def filter(self, mask=None):
+        """
+        Mostra solo i file con mask[posizione] vero (array booleano allineato all'elenco
+        passato a sync), None tutti; le cartelle senza file da mostrare spariscono.
+        Costo vettoriale per cartella, senza rileggere i file.
+        """
+        folders = {}
+        for iid, (root, positions) in self._groups.items():
+            if mask is not None: positions = positions[mask[positions]]
+            if len(positions): folders[iid] = (root, self._order[positions].tolist(), self._order_iids[positions].tolist())
+        self._folders, self._shown = folders, mask
+
+    def clear(self):
+        self.sync([])
+
+    def __len__(self):
+        return len(self._items)
+
+    def is_shown(self, file_id):
+        return self._shown is None or bool(self._shown[self._positions[file_id]])
+
+    # --- Ricerca ---
+
+    def get(self, file_id):
+        return self._items.get(file_id)
+
+    def find(self, path):
+        file_id = self._ids.get(path)
+        return self._items.get(file_id) if file_id else None
+
+    def id_of(self, file_info):
+        return self._ids.get(full_path_of(file_info))
+
+    def folder_iids(self):
+        return list(self._folders)
+
+    def folder_iid(self, scan_root):
+        return self._folder_ids.get(scan_root)
+
+    def folder(self, iid):
+        """(scan_root, [file_info]) di una riga cartella, o None."""
+        if (entry := self._folders.get(iid)) is None: return None
+        return entry[0], [self._items[file_id] for file_id in entry[1]]
+
+    def folder_file_iids(self, iid):
+        """iid delle righe dei file mostrati della cartella (la lista è condivisa: non modificarla)."""
+        entry = self._folders.get(iid)
+        return entry[2] if entry else []
+
+    def folder_scan_root(self, iid):
+        entry = self._folders.get(iid)
+        return entry[0] if entry else None
+
+    def folder_file_ids(self, iid):
+        entry = self._folders.get(iid)
+        return entry[1] if entry else []
+
+    @staticmethod
+    def file_iid(file_id):
+        return str(file_id)
+
+    @staticmethod
+    def page_iid(file_id, page_num):
+        return f"{file_id}.{page_num}"
+
+    @staticmethod
+    def pending_iid(file_id):
+        return f"{file_id}.p"
+
+    def lookup(self, iid):
+        """
+        Restituisce (file_info, pagina, riga_file) per l'iid di un file o di una pagina.
+        riga_file è True per la riga del file; (None, -1, False) se l'iid non è un file.
+        """
+        file_part, _, page_part = iid.partition(".")
+        if not file_part.isdigit() or (file_info := self._items.get(int(file_part))) is None or not self.is_shown(int(file_part)):
+            return None, -1, False
+        if not page_part: return file_info, 0, True
+        if page_part.isdigit(): return file_info, int(page_part), False
+        return None, -1, False
+
+    def pages_for(self, iids):
+        """
+        Pagine corrispondenti alle righe selezionate, come [{'file_info', 'page_num'}]
+        nell'ordine dei risultati. Costo proporzionale alle righe e pagine selezionate.
+        """
+        selected = {}   # id -> None (tutte le pagine) o insieme dei numeri di pagina
+        for iid in iids:
+            if iid in self._folders:
+                selected.update(dict.fromkeys(self._folders[iid][1]))
+                continue
+            file_info, page_num, whole_file = self.lookup(iid)
+            if file_info is None: continue
+            file_id = int(iid.partition(".")[0])
+            if whole_file: selected[file_id] = None
+            elif (pages := selected.setdefault(file_id, set())) is not None: pages.add(page_num)
+        result = []
+        for file_id in sorted(selected, key=self._positions.__getitem__):
+            file_info, pages = self._items[file_id], selected[file_id]
+            page_numbers = range(file_info.get('page_count', 1)) if pages is None else sorted(pages)
+            result.extend({'file_info': file_info, 'page_num': page_num} for page_num in page_numbers)
+        return result
@@ -0,0 +1,223 @@
+# apps/scanner/scan.py - Motore di scansione parallela per Liste Anteprime
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Numero di worker predefinito: la scansione è dominata dall'I/O (dischi di rete),
+# quindi conviene usare più thread dei core disponibili.
+DEFAULT_SCAN_WORKERS = min(32, (os.cpu_count() or 4) * 2)
+# Intervallo minimo tra due notifiche di avanzamento (10 al secondo)
+PROGRESS_INTERVAL = 0.1
+
+
+class ScanJob:
+    """
+    Controllo di una scansione in corso, da qualunque thread: pause() e resume() fermano e
+    riprendono l'enumerazione (i file già in analisi vengono completati), cancel() la
+    interrompe tenendo i risultati già analizzati.
+    """
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self):
+        if not self._cancelled.is_set(): self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def wait(self, timeout):
+        """Attende al più timeout secondi; True se nel frattempo è stata interrotta."""
+        return self._cancelled.wait(timeout)
+
+    def checkpoint(self):
+        """Attende finché la scansione è in pausa; False se è stata interrotta."""
+        self._running.wait()
+        return not self._cancelled.is_set()
+
+
+def iter_scan_files(paths, on_directory=None, job=None):
+    """
+    Enumera i file da analizzare con os.scandir, nello stesso ordine di os.walk (top-down).
+    Restituisce coppie (percorso_completo, scan_root). Con job l'enumerazione si ferma in
+    pausa e termina se la scansione viene interrotta (controllati a ogni cartella).
+    """
+    for path in paths:
+        scan_root = os.path.normpath(path)
+        if os.path.isdir(scan_root):
+            stack = [scan_root]
+            while stack:
+                current_dir = stack.pop()
+                if on_directory: on_directory(current_dir)
+                if job and not job.checkpoint(): return
+                try:
+                    with os.scandir(current_dir) as it:
+                        entries = list(it)
+                except OSError:
+                    continue
+                subdirs = []
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # Come os.walk(followlinks=False): i link a cartelle non vengono seguiti
+                        if not entry.is_symlink(): subdirs.append(entry.path)
+                    else:
+                        yield entry.path, scan_root
+                stack.extend(reversed(subdirs))
+        elif os.path.isfile(scan_root):
+            yield scan_root, os.path.dirname(scan_root)
+
+
+def _stat_signature(full_path):
+    try:
+        st = os.stat(full_path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+
+def diff_scan(paths, known, max_workers=None, job=None):
+    """
+    Confronta l'albero attuale di paths con i file già noti.
+    known: {percorso_completo: (size, mtime_ns)}.
+    Restituisce (changed, removed): changed è la lista di (percorso, scan_root) nuovi o modificati,
+    removed l'insieme dei percorsi noti che non esistono più; None se job è stato interrotto
+    (un confronto parziale segnerebbe come rimossi i file non ancora enumerati).
+    """
+    current = list(iter_scan_files(paths, job=job))
+    if job and job.cancelled: return None
+    # Lo stat di ogni file è il costo dominante su disco di rete: lo si parallelizza
+    with ThreadPoolExecutor(max_workers=max(1, max_workers or DEFAULT_SCAN_WORKERS)) as executor:
+        signatures = list(executor.map(_stat_signature, (full_path for full_path, _ in current)))
+    changed, seen = [], set()
+    for (full_path, scan_root), signature in zip(current, signatures):
+        if signature is None: continue
+        seen.add(full_path)
+        if known.get(full_path) != signature:
+            changed.append((full_path, scan_root))
+    removed = set(known) - seen
+    return changed, removed
+
+
+class ParallelScanner:
+    """
+    Scansione in pipeline: il produttore enumera i file (os.scandir) mentre un pool
+    limitato di worker ne estrae i metadati. I risultati vengono restituiti a blocchi,
+    nell'ordine di enumerazione, tramite la callback on_batch; on_progress è chiamata al
+    più una volta ogni progress_interval secondi.
+    """
+    def __init__(self, details_func, max_workers=None, batch_size=500, batch_interval=0.3, max_batch_interval=4.0,
+                 progress_interval=PROGRESS_INTERVAL):
+        self.details_func = details_func
+        self.max_workers = max(1, max_workers or DEFAULT_SCAN_WORKERS)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_batch_interval = max_batch_interval
+        self.progress_interval = progress_interval
+        # Limita i file in attesa di analisi per non tenere in memoria l'intero albero
+        self.max_in_flight = self.max_workers * 4
+
+    def _analyse(self, full_path, scan_root):
+        details = self.details_func(full_path)
+        if details: details['scan_root'] = scan_root
+        return details
+
+    def run(self, paths, on_batch, on_progress=None, job=None):
+        """
+        Esegue la scansione (bloccante) e restituisce il numero di file analizzati.
+        job (ScanJob) permette di metterla in pausa o interromperla da un altro thread.
+        """
+        return self.run_files(None, on_batch, on_progress, paths=paths, job=job)
+
+    def run_files(self, files, on_batch, on_progress=None, paths=None, job=None):
+        """Come run, ma analizza un elenco già pronto di coppie (percorso, scan_root)."""
+        found = 0
+        ready = {}           # seq -> risultato completato ma non ancora emesso
+        next_seq = 0         # prossimo numero di sequenza da emettere
+        batch = []
+        pending = set()
+        interval = self.batch_interval
+        last_flush = last_progress = time.monotonic()
+
+        def on_directory(current_dir):
+            nonlocal last_progress
+            now = time.monotonic()
+            if on_progress and now - last_progress >= self.progress_interval:
+                on_progress(current_dir, found)
+                last_progress = now
+            if job and job.paused: pause()
+
+        def pause():
+            # Prima di fermarsi si consegnano i file già analizzati
+            nonlocal pending
+            done, pending = wait(pending)
+            collect(done)
+            maybe_flush(force=True)
+
+        def collect(done_futures):
+            nonlocal next_seq, found
+            for future in done_futures:
+                seq, details = future.seq, future.result()
+                ready[seq] = details
+            # Riordina: emette solo la sequenza contigua già completata
+            while next_seq in ready:
+                details = ready.pop(next_seq)
+                next_seq += 1
+                if details:
+                    batch.append(details)
+                    found += 1
+
+        def maybe_flush(force=False):
+            nonlocal batch, last_flush, interval
+            now = time.monotonic()
+            if batch and (force or len(batch) >= self.batch_size or now - last_flush >= interval):
+                on_batch(batch)
+                batch = []
+                last_flush = now
+                # Ogni aggiornamento dell'interfaccia costa in proporzione alle righe già mostrate:
+                # allungare l'intervallo mantiene lineare il costo complessivo dei ridisegni.
+                interval = min(interval * 2, self.max_batch_interval)
+
+        if files is None: files = iter_scan_files(paths, on_directory, job)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for seq, (full_path, scan_root) in enumerate(files):
+                if job:
+                    if job.paused: pause()
+                    if not job.checkpoint(): break
+                future = executor.submit(self._analyse, full_path, scan_root)
+                future.seq = seq
+                pending.add(future)
+                if len(pending) >= self.max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                    maybe_flush()
+            if job and job.cancelled:
+                # Interrotta: si completano solo i file già in analisi. I posti di quelli
+                # annullati restano vuoti, altrimenti collect si fermerebbe al primo buco
+                for future in [future for future in pending if future.cancel()]:
+                    ready[future.seq] = None
+                    pending.discard(future)
+                collect(())
+            while pending:
+                done, pending = wait(pending, timeout=interval, return_when=FIRST_COMPLETED)
+                collect(done)
+                maybe_flush()
+        maybe_flush(force=True)
+        return found
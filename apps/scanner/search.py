@@ -0,0 +1,180 @@
+# apps/scanner/search.py - Ricerca nei risultati: indice a trigrammi e filtri a colonne
+#
+# Trovare un file in una scansione grande voleva dire scorrere la tabella. Qui nomi e
+# sottocartelle sono indicizzati quando i file entrano nei risultati: l'indice a trigrammi
+# (tre byte consecutivi del nome in minuscolo -> righe che li contengono) riduce una
+# ricerca a poche intersezioni di array, e i campi filtrabili (area, pagine, tipo, colore)
+# sono tenuti a colonne, così ogni filtro è un confronto vettoriale su tutte le righe.
+import re
+from array import array
+from typing import NamedTuple
+
+import numpy as np
+
+# Campi dei filtri ("area>1,5", "pagine>=4", "tipo:pdf,tif", "colore:cmyk", "doppione>0") e loro sinonimi
+FILTER_FIELDS = {"area": "area", "pagine": "pages", "pag": "pages", "pages": "pages",
+                 "tipo": "type", "type": "type", "colore": "color", "color": "color",
+                 "doppione": "duplicate", "doppioni": "duplicate", "dup": "duplicate"}
+_NUMERIC_FIELDS = ("area", "pages", "duplicate")
+_CODED_FIELDS = ("type", "color", "subfolder")
+_OPERATORS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal,
+              # Le aree sono mostrate con quattro decimali
+              "=": lambda column, value: np.abs(column - value) < 0.00005}
+
+_FILTER = re.compile(r"^(\w+)(>=|<=|>|<|=|:)(.*)$")
+_OPERATOR_SPACES = re.compile(r"\s*(>=|<=|>|<|=|:)\s*")
+
+
+class SearchQuery(NamedTuple):
+    terms: tuple     # testi da cercare nel nome o nella sottocartella (tutti)
+    filters: tuple   # (campo, operatore, numero) oppure (campo, "=", prefissi dei valori)
+
+
+def parse_query(text):
+    """
+    Interpreta il testo della casella di ricerca; None se è vuoto. Le parole sono cercate
+    (senza distinguere maiuscole e minuscole) nel nome del file o nella sottocartella e
+    devono esserci tutte; campo+operatore+valore è un filtro. Un filtro ancora incompleto
+    (mentre lo si scrive, "area>") viene ignorato.
+    """
+    terms, filters = [], []
+    for token in _OPERATOR_SPACES.sub(r"\1", text.casefold()).split():
+        match = _FILTER.match(token)
+        if not match or (field := FILTER_FIELDS.get(match[1])) is None:
+            terms.append(token)
+            continue
+        operator, value = match[2], match[3]
+        if field in _NUMERIC_FIELDS:
+            try: filters.append((field, "=" if operator == ":" else operator, float(value.replace(",", "."))))
+            except ValueError: pass
+        elif operator in ":=" and (prefixes := tuple(v for v in value.split(",") if v)):
+            filters.append((field, "=", prefixes))
+    return SearchQuery(tuple(terms), tuple(filters)) if terms or filters else None
+
+
+def _trigram_codes(data):
+    # Trigramma che inizia in ogni posizione di data (byte), come intero a 24 bit
+    return data[:-2] << 16 | data[1:-1] << 8 | data[2:]
+
+
+class SearchIndex:
+    """
+    Indice di ricerca dei risultati, con le stesse righe di SortKeys (un file aggiornato
+    riusa la propria riga, e con il percorso resta uguale anche il nome). I nomi delle
+    righe nuove e i campi ricevuti da set entrano nell'indice in blocco con build(); match
+    lo chiama da sé.
+    """
+    def __init__(self, capacity=1024):
+        self._names = []              # riga -> nome del file in minuscolo
+        self._postings = {}           # trigramma -> righe che lo contengono (crescenti)
+        self._indexed = 0             # righe (dalla prima) già nell'indice a trigrammi
+        self._pending = []            # campi ricevuti da set e non ancora nelle colonne
+        self._codes = {field: {} for field in _CODED_FIELDS}   # valore -> codice
+        self._texts = {field: [] for field in _CODED_FIELDS}   # codice -> valore in minuscolo
+        self._columns = {"area": np.zeros(capacity), "pages": np.zeros(capacity, dtype=np.int64),
+                         "duplicate": np.zeros(capacity, dtype=np.int64),
+                         **{field: np.zeros(capacity, dtype=np.int32) for field in _CODED_FIELDS}}
+
+    def __len__(self):
+        return len(self._names)
+
+    def set(self, row, filename, subfolder, file_type, color_mode, page_count, area):
+        """Campi di ricerca della riga row (nuova, cioè len(self), o già presente)."""
+        if row == len(self._names): self._names.append(filename.casefold())
+        self._pending.append((row, subfolder, file_type or "", color_mode or "", page_count, area))
+
+    def set_duplicates(self, groups):
+        """Gruppo di doppioni (numero da 1) delle righe in groups {riga: gruppo}; le altre righe tornano a 0."""
+        self.build()
+        column = self._columns["duplicate"]
+        column[:] = 0
+        if groups: column[np.fromiter(groups, dtype=np.int64, count=len(groups))] = list(groups.values())
+
+    def _encode(self, field, values):
+        codes, texts = self._codes[field], self._texts[field]
+        for value in set(values) - codes.keys():
+            codes[value] = len(texts); texts.append(value.casefold())
+        return [codes[value] for value in values]
+
+    def build(self):
+        """
+        Aggiunge all'indice a trigrammi i nomi delle righe nuove e porta nelle colonne i campi
+        ricevuti da set, con poche operazioni vettoriali per blocco.
+        """
+        self._index_names()
+        if not self._pending: return
+        rows, subfolders, file_types, color_modes, page_counts, areas = zip(*self._pending)
+        self._pending = []
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(self._names) > len(self._columns["area"]):
+            capacity = max(len(self._names), 2 * len(self._columns["area"]))
+            self._columns = {field: np.concatenate([column, np.zeros(capacity - len(column), dtype=column.dtype)])
+                             for field, column in self._columns.items()}
+        columns = self._columns
+        columns["area"][rows], columns["pages"][rows] = areas, page_counts
+        for field, values in (("subfolder", subfolders), ("type", file_types), ("color", color_modes)):
+            columns[field][rows] = self._encode(field, values)
+
+    def _index_names(self):
+        # Le righe nuove sono sempre in fondo
+        names, self._indexed = self._names[self._indexed:], len(self._names)
+        encoded = [name.encode() for name in names]
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64)
+        if len(data) < 3: return
+        owners = np.repeat(np.arange(self._indexed - len(names), self._indexed), [len(name) for name in encoded])
+        # Solo i trigrammi interi in un nome, ordinati per trigramma e poi per riga, senza doppioni
+        inside = owners[:-2] == owners[2:]
+        keys = np.sort(_trigram_codes(data)[inside] << 32 | owners[:-2][inside])
+        if not len(keys := keys[np.r_[True, keys[1:] != keys[:-1]]]): return
+        codes, rows = (keys >> 32).tolist(), (keys & 0xFFFFFFFF).astype(np.int32).tobytes()
+        starts = [0, *(np.flatnonzero(np.diff(keys >> 32)) + 1).tolist(), len(codes)]
+        for start, end in zip(starts, starts[1:]):
+            if (postings := self._postings.get(code := codes[start])) is None: postings = self._postings[code] = array('i')
+            postings.frombytes(rows[start * 4:end * 4])
+
+    def _name_matches(self, term, mask):
+        # Righe di mask il cui nome contiene term
+        encoded = term.encode()
+        if len(encoded) < 3:
+            candidates = np.flatnonzero(mask)
+        else:
+            codes = set(_trigram_codes(np.frombuffer(encoded, dtype=np.uint8).astype(np.int64)).tolist())
+            postings = sorted((self._postings.get(code, ()) for code in codes), key=len)
+            if not postings[0]: return np.zeros(len(mask), dtype=bool)
+            # Si parte dall'elenco più corto: le intersezioni restano piccole
+            candidates = np.frombuffer(postings[0], dtype=np.int32).astype(np.int64)
+            member = np.zeros(len(mask), dtype=bool)
+            for rows in postings[1:]:
+                member[:] = False
+                member[np.frombuffer(rows, dtype=np.int32)] = True
+                candidates = candidates[member[candidates]]
+            candidates = candidates[mask[candidates]]
+        result = np.zeros(len(mask), dtype=bool)
+        if len(encoded) == 3:
+            # Per un solo trigramma l'indice è già esatto
+            result[candidates] = True
+        elif len(candidates) > len(mask) // 2:
+            # Quasi tutte le righe: si fa prima a scorrere i nomi in ordine
+            result[:] = np.fromiter((term in name for name in self._names), dtype=bool, count=len(mask))
+            result &= mask
+        else:
+            names = self._names
+            result[candidates[np.fromiter((term in names[row] for row in candidates.tolist()), dtype=bool, count=len(candidates))]] = True
+        return result
+
+    def match(self, query):
+        """Maschera booleana (per riga) delle righe che soddisfano query (SearchQuery)."""
+        self.build()
+        count = len(self._names)
+        columns = {field: column[:count] for field, column in self._columns.items()}
+        mask = np.ones(count, dtype=bool)
+        for field, operator, value in query.filters:
+            if field in _NUMERIC_FIELDS:
+                mask &= _OPERATORS[operator](columns[field], value)
+            else:
+                mask &= np.isin(columns[field], [code for code, text in enumerate(self._texts[field]) if text.startswith(value)])
+        for term in query.terms:
+            if not mask.any(): break
+            in_subfolder = [code for code, text in enumerate(self._texts["subfolder"]) if term in text]
+            mask &= self._name_matches(term, mask) | np.isin(columns["subfolder"], in_subfolder)
+        return mask
@@ -0,0 +1,82 @@
+# apps/scanner/sort_keys.py - Chiavi di ordinamento dei risultati, calcolate una volta per file
+#
+# Ordinare la tabella ricalcolava a ogni clic, per ogni file, il percorso relativo e il
+# nome in minuscolo. Qui le chiavi sono calcolate quando il file entra nei risultati e
+# conservate a colonne: riordinare 100.000 file è un np.lexsort sugli array delle chiavi.
+import re
+
+import numpy as np
+
+# Colonne ordinabili (come le colonne della tabella)
+SORT_COLUMNS = ("filename", "dimensions_cm", "area_sqm", "path")
+
+_DIGITS = re.compile(r"\d+")
+_NUMBER_WIDTH = 20
+
+
+def natural_key(text):
+    """
+    Chiave di confronto del testo: maiuscole e minuscole equivalenti, numeri in ordine
+    numerico ("tav2" prima di "tav10"). I numeri sono allineati a zeri, così la chiave
+    si confronta come una normale stringa.
+    """
+    return _DIGITS.sub(lambda m: m.group().rjust(_NUMBER_WIDTH, "0"), text.casefold())
+
+
+class SortKeys:
+    """
+    Una riga di chiavi per file: nome e sottocartella (natural_key), area della prima pagina
+    (la colonna Dimensioni) e area del file (la colonna Area), al vivo se c'è un TrimBox.
+    Le righe si identificano con un intero; un file aggiornato riusa la propria riga.
+    """
+    def __init__(self, capacity=1024):
+        self._rows = {}                  # percorso completo -> riga
+        self._names, self._paths = [], []
+        self._subfolder_keys = {}        # le sottocartelle si ripetono per migliaia di file
+        self._areas = np.zeros((capacity, 2))   # area della prima pagina, area del file
+        self._ranks = {}                 # colonna testuale -> rango di ogni riga, finché non cambia
+
+    def __len__(self):
+        return len(self._names)
+
+    def set(self, full_path, filename, subfolder, page_area, file_area):
+        """Chiavi del file (nuove o aggiornate); restituisce la riga."""
+        row = self._rows.get(full_path)
+        if row is None:
+            row = self._rows[full_path] = len(self._names)
+            self._names.append(None); self._paths.append(None)
+            if row >= len(self._areas):
+                self._areas = np.concatenate([self._areas, np.zeros_like(self._areas)])
+        if (path_key := self._subfolder_keys.get(subfolder)) is None:
+            path_key = self._subfolder_keys[subfolder] = natural_key(subfolder)
+        self._names[row], self._paths[row] = natural_key(filename), path_key
+        self._areas[row] = page_area, file_area
+        self._ranks.clear()
+        return row
+
+    def row(self, full_path):
+        return self._rows[full_path]
+
+    def _rank(self, column):
+        # Rango di ogni riga nell'ordine del testo: le colonne testuali diventano interi
+        if (ranks := self._ranks.get(column)) is None:
+            texts = self._names if column == "filename" else self._paths
+            rank_of = {text: rank for rank, text in enumerate(sorted(set(texts)))}
+            ranks = self._ranks[column] = np.fromiter(map(rank_of.__getitem__, texts), dtype=np.int64, count=len(texts))
+        return ranks
+
+    def _column(self, column):
+        if column in ("filename", "path"): return self._rank(column)
+        return self._areas[:len(self._names), 0 if column == "dimensions_cm" else 1]
+
+    def order(self, rows, columns):
+        """
+        Permutazione (stabile) che ordina rows secondo columns: coppie (colonna, decrescente),
+        dalla più importante. Le righe con chiavi uguali restano nell'ordine attuale.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows) or not columns: return np.arange(len(rows))
+        # np.lexsort usa l'ultima chiave come principale
+        keys = [-values if reverse else values
+                for values, reverse in ((self._column(column)[rows], reverse) for column, reverse in reversed(columns))]
+        return np.lexsort(keys)
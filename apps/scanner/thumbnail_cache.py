@@ -0,0 +1,100 @@
+# apps/scanner/thumbnail_cache.py - Cache persistente su disco delle miniature renderizzate
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+from .metadata_cache import get_user_cache_dir
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# File temporanei di scritture interrotte (processo terminato) più vecchi di così vengono eliminati
+STALE_TEMP_SECONDS = 3600
+
+
+class ThumbnailCache:
+    """
+    Miniature già codificate (PNG/JPEG, quindi già compresse), un file per miniatura.
+    Il nome del file è l'hash di percorso, dimensione e data di modifica del file sorgente
+    e dei parametri di rendering (pagina, dpi, dimensione, formato): un file modificato
+    produce chiavi nuove e le vecchie miniature escono per LRU.
+    Basata solo sul filesystem: la possono usare insieme thread e processi worker.
+    L'ultimo utilizzo è la data di modifica del file, aggiornata a ogni lettura.
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or os.path.join(get_user_cache_dir(), "thumbnails")
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, full_path, *params):
+        """Chiave della miniatura, o None se il file sorgente non è accessibile."""
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+        raw = "|".join(str(v) for v in (os.path.normcase(os.path.abspath(full_path)), st.st_size, st.st_mtime_ns) + params)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Errore salvataggio miniatura in cache: {e}")
+            try: os.remove(temp_path)
+            except OSError: pass
+
+    def _entries(self):
+        for folder in os.scandir(self.cache_dir):
+            if not folder.is_dir(): continue
+            for entry in os.scandir(folder.path):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_mtime, st.st_size
+
+    def size(self):
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self, max_bytes=None):
+        """Elimina le miniature usate meno di recente finché la cache non supera max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries, total, removed = [], 0, 0
+        now = time.time()
+        for path, mtime, size in self._entries():
+            if path.endswith(".tmp"):
+                if now - mtime > STALE_TEMP_SECONDS:
+                    try: os.remove(path); removed += 1
+                    except OSError: pass
+                continue
+            entries.append((mtime, size, path)); total += size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes: break
+            try:
+                os.remove(path); total -= size; removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def clear(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir(): shutil.rmtree(entry.path, ignore_errors=True)
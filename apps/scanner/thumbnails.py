@@ -0,0 +1,123 @@
+# apps/scanner/thumbnails.py - Rendering delle miniature usato dalle esportazioni
+#
+# Le funzioni lavorano su "job" (tuple di soli valori semplici) e restituiscono i byte
+# dell'immagine già codificata: possono quindi girare sia nei thread sia nei processi
+# del RenderPool. Ogni thread o processo worker tiene aperti i propri documenti PDF.
+import functools
+import io
+import math
+import os
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+from .document_cache import shared_documents
+from .thumbnail_cache import ThumbnailCache
+
+# Da incrementare quando cambia il risultato del rendering: invalida le miniature in cache
+RENDER_VERSION = 2
+# Un'istanza per cartella di cache, creata alla prima miniatura del thread o processo
+_caches = {}
+
+
+def thumbnail_job(file_info, page_num, pdf_dpi, max_size=None, fmt="PNG", quality=85, cache_dir=None):
+    """
+    Descrizione serializzabile di una miniatura. max_size None = pagina PDF alla
+    risoluzione pdf_dpi senza ridimensionare. Con cache_dir le miniature vengono lette e
+    salvate nella ThumbnailCache di quella cartella.
+    """
+    full_path = os.path.join(file_info['path'], file_info['filename'])
+    return (full_path, file_info.get('type', ''), page_num, pdf_dpi, max_size, fmt, quality, cache_dir)
+
+
+def render_thumbnail(job):
+    """Byte dell'immagine codificata (fmt), oppure None se il file non è leggibile o non supportato."""
+    full_path, file_type, page_num, pdf_dpi, max_size, fmt, quality, cache_dir = job
+    if file_type == "NON SUPPORTATO": return None
+    cache = key = None
+    if cache_dir:
+        cache = _caches.get(cache_dir) or _caches.setdefault(cache_dir, ThumbnailCache(cache_dir))
+        if (key := cache.key(full_path, RENDER_VERSION, page_num, pdf_dpi, max_size, fmt, quality)) and (data := cache.get(key)):
+            return data
+    data = _render(full_path, file_type, page_num, pdf_dpi, max_size, fmt, quality)
+    if data and key: cache.put(key, data)
+    return data
+
+
+def placeholder_image(size, text="Anteprima non disponibile"):
+    """Immagine grigia con testo, al posto delle miniature dei file non leggibili."""
+    img = Image.new('RGB', size, color=(200, 200, 200))
+    ImageDraw.Draw(img).text((10, 10), text, fill=(0, 0, 0))
+    return img
+
+
+@functools.lru_cache(maxsize=None)
+def placeholder_bytes(fmt):
+    buffer = io.BytesIO()
+    placeholder_image((200, 150)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def _fit_size(size, max_size):
+    """Dimensione di size ridotta in proporzione per stare in max_size (mai ingrandita)."""
+    scale = min(1.0, max_size[0] / size[0], max_size[1] / size[1])
+    return max(1, math.ceil(size[0] * scale)), max(1, math.ceil(size[1] * scale))
+
+
+def _select_reduced_frame(img, needed):
+    """
+    TIFF piramidali: sceglie la più piccola delle versioni ridotte della prima pagina
+    (NewSubfileType con il bit 1) ancora grande almeno quanto needed.
+    """
+    width, height = img.size
+    best, best_width = 0, width
+    for frame in range(1, getattr(img, "n_frames", 1)):
+        img.seek(frame)
+        w, h = img.size
+        if not img.tag_v2.get(254, 0) & 1 or abs(w / h - width / height) > 0.01: continue
+        if needed[0] <= w < best_width and needed[1] <= h: best, best_width = frame, w
+    img.seek(best)
+
+
+def _open_reduced(source, max_size):
+    """
+    Chiede al decoder la risoluzione più piccola sufficiente, prima di decodificare:
+    JPEG con draft() (scala 1/2, 1/4, 1/8 in decodifica), TIFF dalla versione ridotta più
+    adatta. Si chiede il doppio della dimensione finale, come fa Image.thumbnail, per
+    lasciare a LANCZOS un margine di qualità.
+    """
+    target = _fit_size(source.size, max_size)
+    needed = (target[0] * 2, target[1] * 2)
+    if source.format == "JPEG":
+        source.draft(None, needed)
+    elif source.format == "TIFF" and getattr(source, "n_frames", 1) > 1:
+        _select_reduced_frame(source, needed)
+    return source
+
+
+def _render(full_path, file_type, page_num, pdf_dpi, max_size, fmt, quality):
+    try:
+        if file_type in ('PDF', 'AI'):
+            page = shared_documents.get(full_path).load_page(page_num)
+            zoom = pdf_dpi / 72
+            if max_size and not page.rect.is_empty:
+                # Rasterizzata direttamente alla dimensione finale, senza superare pdf_dpi
+                zoom = min(zoom, max_size[0] / page.rect.width, max_size[1] / page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            if max_size: img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        else:
+            with Image.open(full_path) as source:
+                if max_size: _open_reduced(source, max_size)
+                img = source.convert('RGB') if source.mode != 'RGB' else source
+                if max_size: img.thumbnail(max_size, Image.Resampling.LANCZOS)
+                else: img.load()
+        buffer = io.BytesIO()
+        if fmt == "JPEG": img.save(buffer, format="JPEG", quality=quality, optimize=True)
+        else: img.save(buffer, format=fmt)
+        return buffer.getvalue()
+    except Exception as e:
+        print(f"Errore anteprima per {full_path}, pag {page_num + 1}: {e}")
+        # Documento forse modificato o danneggiato: alla prossima richiesta si riapre
+        shared_documents.discard(full_path)
+        return None
@@ -0,0 +1,260 @@
+# apps/scanner/watch.py - Sorveglianza delle cartelle scansionate
+#
+# Con la scheda aperta sulla cartella dei lavori in arrivo, ogni nuovo file richiedeva un
+# "Aggiorna", cioè un confronto dell'intero albero con il disco. Qui un backend segnala i
+# percorsi toccati (inotify su Linux, altrove confronto periodico delle date di modifica)
+# e FileWatcher li raccoglie a gruppi: una copia di migliaia di file diventa pochi blocchi
+# da analizzare, non migliaia di aggiornamenti della tabella.
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# Intervallo tra due confronti del backend a intervalli (secondi)
+POLL_INTERVAL = 5.0
+# Un gruppo di modifiche si consegna dopo WATCH_SETTLE secondi senza novità, durante una
+# raffica al più ogni WATCH_MAX_DELAY secondi
+WATCH_SETTLE = 1.0
+WATCH_MAX_DELAY = 10.0
+
+
+def scan_root_for(path, sources):
+    """La cartella di scansione (scan_root, come in iter_scan_files) di path, o None se path è fuori dalle sorgenti."""
+    for source in sources:
+        if path == source:
+            return source if os.path.isdir(source) else os.path.dirname(source)
+        # Solo una cartella può contenere altri percorsi
+        if path.startswith(source.rstrip(os.sep) + os.sep): return source
+    return None
+
+
+def _snapshot(sources):
+    # {percorso: (size, mtime_ns)} dei file delle sorgenti; scandir fornisce lo stat
+    # senza altre chiamate su Windows. Stessa visita di iter_scan_files.
+    files = {}
+    for source in sources:
+        if os.path.isfile(source):
+            try: st = os.stat(source)
+            except OSError: continue
+            files[source] = (st.st_size, st.st_mtime_ns)
+            continue
+        stack = [source]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink(): stack.append(entry.path)
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files[entry.path] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+class PollingBackend:
+    """
+    Confronta ogni interval secondi dimensione e data di modifica dei file con il passaggio
+    precedente. known ({percorso: (size, mtime_ns)}, come in refresh_snapshot) è lo stato
+    di partenza: senza, il primo passaggio registra soltanto i file presenti.
+    """
+    name = "a intervalli"
+
+    def __init__(self, interval=POLL_INTERVAL, known=None):
+        self.interval = interval
+        self._files = dict(known) if known is not None else None
+
+    def run(self, sources, on_paths, job, on_warning=None):
+        while not job.cancelled:
+            current = _snapshot(sources)
+            if self._files is not None:
+                changed = [path for path, signature in current.items() if self._files.get(path) != signature]
+                if touched := changed + [path for path in self._files if path not in current]: on_paths(touched)
+            self._files = current
+            if job.wait(self.interval): return
+
+
+# Costanti di <sys/inotify.h>
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x008, 0x040, 0x080
+IN_CREATE, IN_DELETE, IN_DELETE_SELF = 0x100, 0x200, 0x400
+IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR = 0x4000, 0x8000, 0x01000000, 0x40000000
+IN_NONBLOCK, IN_CLOEXEC = os.O_NONBLOCK, 0o2000000
+_EVENT = struct.Struct("iIII")   # wd, mask, cookie, len (segue il nome, len byte)
+
+
+class InotifyBackend:
+    """
+    Notifiche del kernel Linux (inotify, tramite ctypes): una watch per cartella, aggiunte
+    anche per le cartelle create o spostate dentro le sorgenti. I file si segnalano quando
+    vengono chiusi dopo la scrittura o spostati, non a ogni blocco scritto. on_warning
+    (messaggio) segnala le cartelle che non si sono potute sorvegliare.
+    """
+    name = "inotify"
+    _MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = None
+        self._dirs = {}   # watch descriptor -> cartella
+        self._on_warning = None
+
+    @staticmethod
+    def available():
+        if not sys.platform.startswith("linux"): return False
+        try: return hasattr(ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6"), "inotify_init1")
+        except OSError: return False
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self._MASK | IN_ONLYDIR)
+        if wd < 0:
+            code = ctypes.get_errno()
+            # La cartella può sparire prima della watch; il limite di watch invece va segnalato
+            if code in (errno.ENOENT, errno.ENOTDIR, errno.EACCES): return
+            raise OSError(code, f"inotify_add_watch {directory}: {os.strerror(code)}")
+        self._dirs[wd] = directory
+
+    def _add_tree(self, directory):
+        self._add_watch(directory)
+        for parent, subdirs, _ in os.walk(directory):
+            for subdir in subdirs: self._add_watch(os.path.join(parent, subdir))
+
+    def _forget(self, directory):
+        prefix = directory.rstrip(os.sep) + os.sep
+        for wd in [wd for wd, path in self._dirs.items() if path == directory or path.startswith(prefix)]:
+            self._libc.inotify_rm_watch(self._fd, wd)
+            del self._dirs[wd]
+
+    def run(self, sources, on_paths, job, on_warning=None):
+        self._on_warning = on_warning
+        if (fd := self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)) < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, f"inotify_init1: {os.strerror(code)}")
+        self._fd, self._dirs = fd, {}
+        try:
+            for source in sources:
+                if os.path.isdir(source): self._add_tree(source)
+                # Di un file sorgente si sorveglia la cartella; gli altri file sono scartati da scan_root_for
+                elif os.path.isfile(source): self._add_watch(os.path.dirname(source))
+            while not job.cancelled:
+                if not select.select([fd], [], [], 0.5)[0]: continue
+                try: data = os.read(fd, 256 * 1024)
+                except BlockingIOError: continue
+                if touched := self._parse(data, sources): on_paths(touched)
+        finally:
+            os.close(fd)
+            self._fd = None
+
+    def _parse(self, data, sources):
+        touched = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0"))
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Eventi persi, anche di cartelle create nel frattempo e ancora senza watch: le
+                # sorgenti si sorvegliano di nuovo e si segnalano intere, da confrontare con le
+                # firme note (ScanEngine.watch)
+                for source in sources:
+                    if not os.path.isdir(source): continue
+                    try: self._add_tree(source)
+                    except OSError as e:
+                        if self._on_warning: self._on_warning(f"Sorveglianza incompleta di {source}: {e}")
+                touched.extend(sources)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if (directory := self._dirs.get(wd)) is None: continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # I file copiati prima che la watch esista si trovano enumerando la cartella
+                    try: self._add_tree(path)
+                    except OSError as e:
+                        if self._on_warning: self._on_warning(f"Sorveglianza incompleta di {path}: {e}")
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._forget(path)
+                else:
+                    continue
+            elif mask & IN_CREATE:
+                # Un file appena creato si analizza quando viene chiuso (IN_CLOSE_WRITE)
+                continue
+            touched.append(path)
+        return touched
+
+
+def default_watch_backend(known=None):
+    """inotify dove disponibile, altrimenti il confronto a intervalli (con known come stato di partenza)."""
+    return InotifyBackend() if InotifyBackend.available() else PollingBackend(known=known)
+
+
+class FileWatcher:
+    """
+    Sorveglia sources con backend (in un thread dedicato) e raccoglie i percorsi toccati:
+    batches(job) li restituisce a gruppi, quando non ne arrivano altri da settle secondi
+    o, durante una raffica, al più ogni max_delay secondi. Se il backend non può partire
+    (limite di watch inotify raggiunto) si passa al confronto a intervalli, segnalandolo
+    con on_warning (messaggio); gli altri errori del backend escono da batches.
+    """
+    def __init__(self, sources, backend, settle=WATCH_SETTLE, max_delay=WATCH_MAX_DELAY, known=None, on_warning=None):
+        self.sources = list(sources)
+        self.backend = backend
+        self.settle = settle
+        self.max_delay = max_delay
+        self._known = known
+        self.on_warning = on_warning
+        self._error = None                 # eccezione che ha fermato il backend
+        self._condition = threading.Condition()
+        self._pending = set()
+        self._first = self._last = None   # istanti del primo e dell'ultimo percorso in attesa
+
+    def _add(self, paths):
+        with self._condition:
+            now = time.monotonic()
+            self._pending.update(paths)
+            if self._first is None: self._first = now
+            self._last = now
+            self._condition.notify()
+
+    def _run(self, job):
+        try:
+            try:
+                self.backend.run(self.sources, self._add, job, self.on_warning)
+            except OSError as e:
+                if isinstance(self.backend, PollingBackend): raise
+                if self.on_warning: self.on_warning(f"Sorveglianza {self.backend.name} non disponibile ({e}): controllo a intervalli")
+                self.backend = PollingBackend(known=self._known)
+                self.backend.run(self.sources, self._add, job, self.on_warning)
+        except Exception as e:
+            # Senza backend batches resterebbe in attesa per sempre: l'errore passa a chi lo chiama
+            with self._condition:
+                self._error = e
+                self._condition.notify()
+
+    def batches(self, job):
+        """Gruppi (ordinati) di percorsi toccati, finché job non viene interrotto; solleva l'errore che ferma il backend."""
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        while True:
+            with self._condition:
+                while not job.cancelled and self._error is None:
+                    if not self._pending:
+                        self._condition.wait(0.5)
+                        continue
+                    due = min(self._last + self.settle, self._first + self.max_delay)
+                    if (delay := due - time.monotonic()) <= 0: break
+                    self._condition.wait(delay)
+                if self._error is not None: raise self._error
+                if job.cancelled: return
+                paths, self._pending, self._first = self._pending, set(), None
+            yield sorted(paths)
@@ -0,0 +1,2 @@
+# apps/widgets - Widget Tk riutilizzabili dalle app
+from .virtual_treeview import VirtualTreeview, SELECT_EVENT, OPEN_EVENT
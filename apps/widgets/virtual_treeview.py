@@ -0,0 +1,272 @@
+# apps/widgets/virtual_treeview.py - Treeview "virtuale" per elenchi molto lunghi
+#
+# Un ttk.Treeview con decine di migliaia di righe è lento da riempire, ordinare e svuotare.
+# Qui l'albero vero resta nel modello dell'applicazione: il widget tiene solo l'elenco
+# piatto delle righe visibili (nodi aperti espansi) e materializza nel Treeview
+# le sole righe che entrano nella finestra. Selezione, focus e nodi aperti sono
+# conservati nel modello, quindi sopravvivono allo scorrimento e ai refresh.
+import tkinter as tk
+from itertools import repeat
+from tkinter import ttk
+
+# Eventi generati sul Treeview interno (al posto di <<TreeviewSelect>> / <<TreeviewOpen>>)
+SELECT_EVENT = "<<VirtualTreeviewSelect>>"
+OPEN_EVENT = "<<VirtualTreeviewOpen>>"
+
+_OPEN_MARK, _CLOSED_MARK = "▼", "▶"
+_SHIFT, _CONTROL = 0x0001, 0x0004
+
+
+class VirtualTreeview:
+    """
+    Elenco gerarchico virtualizzato sopra un ttk.Treeview.
+
+    Il modello è fornito da tre funzioni:
+      children(iid)     -> lista degli iid figli ("" è la radice)
+      row(iid)          -> (values, tags, espandibile) oppure None se l'iid non esiste
+      default_open(iid) -> True se il nodo va mostrato aperto la prima volta
+    I metodi usati più spesso di ttk.Treeview (selection, focus, item, exists, heading,
+    column, tag_configure, bind, grid...) sono disponibili con lo stesso significato.
+    """
+    def __init__(self, master, children, row, default_open=None, **tree_kwargs):
+        self.tree = ttk.Treeview(master, **tree_kwargs)
+        self._children = children
+        self._row = row
+        self._default_open = default_open or (lambda iid: False)
+        self._rows = []            # righe visibili: (iid, profondità)
+        self._index = None         # iid -> posizione in _rows, ricalcolato solo quando serve
+        self._open = {}            # stato aperto/chiuso scelto dall'utente
+        self._selection = set()
+        self._focus = ""
+        self._anchor = ""
+        self._top = 0              # prima riga mostrata
+        self._yscroll = None
+        self._render_pending = False
+        self._header_height = None
+
+        # Tag dedicato prima della classe Treeview: i gestori interni possono bloccare
+        # i comportamenti predefiniti (selezione e scorrimento del solo Treeview reale)
+        tag = f"VirtualTreeview{id(self)}"
+        self.tree.bindtags((str(self.tree), tag) + tuple(t for t in self.tree.bindtags() if t != str(self.tree)))
+        for sequence, handler in (("<Button-1>", self._on_click), ("<Double-1>", self._on_double_click),
+                                  ("<MouseWheel>", self._on_mousewheel), ("<Button-4>", self._on_mousewheel),
+                                  ("<Button-5>", self._on_mousewheel), ("<Configure>", lambda e: self._schedule_render()),
+                                  ("<KeyPress>", self._on_key)):
+            self.tree.bind_class(tag, sequence, handler)
+
+    def __getattr__(self, name):
+        # heading, column, tag_configure, bind, grid, focus_set, ... del Treeview reale
+        return getattr(self.tree, name)
+
+    # --- API compatibile con ttk.Treeview ---
+
+    def configure(self, **kwargs):
+        for key in ("yscroll", "yscrollcommand"):
+            if key in kwargs:
+                self._yscroll = kwargs.pop(key)
+                self._update_scrollbar()
+        if kwargs: self.tree.configure(**kwargs)
+
+    config = configure
+
+    def selection(self):
+        # Per una sola riga non serve l'indice delle posizioni (costruirlo costa quanto l'elenco)
+        if len(self._selection) <= 1: return tuple(self._selection)
+        index = self._get_index()
+        return tuple(sorted(self._selection, key=lambda iid: index.get(iid, len(index))))
+
+    def selection_set(self, items):
+        items = (items,) if isinstance(items, str) else items
+        self._selection = {iid for iid in items if self.exists(iid)}
+        self._render()
+        self.tree.event_generate(SELECT_EVENT)
+
+    def focus(self, item=None):
+        if item is None: return self._focus
+        self._focus = item
+
+    def exists(self, iid):
+        return self._row(iid) is not None
+
+    def get_children(self, iid=""):
+        return tuple(self._children(iid))
+
+    def item(self, iid, option=None, **kwargs):
+        if "open" in kwargs:
+            self._set_open(iid, bool(kwargs.pop("open")))
+        if kwargs: raise tk.TclError(f"Opzioni non supportate: {', '.join(kwargs)}")
+        row = self._row(iid)
+        if row is None: raise tk.TclError(f"Item {iid} not found")
+        info = {"values": row[0], "tags": row[1], "open": self._is_open(iid)}
+        return info[option] if option else info
+
+    def see(self, iid):
+        if (position := self._get_index().get(iid)) is None: return
+        visible = self._visible_count()
+        if position < self._top: self._top = position
+        elif position >= self._top + visible: self._top = position - visible + 1
+        self._render()
+
+    def yview(self, *args):
+        visible = self._visible_count()
+        if args and args[0] == "moveto":
+            self._top = int(float(args[1]) * len(self._rows))
+        elif args and args[0] == "scroll":
+            amount = int(args[1]) * (visible if args[2] == "pages" else 1)
+            self._top += amount
+        self._render()
+
+    def refresh(self):
+        """Rilegge il modello mantenendo nodi aperti, selezione, focus e posizione."""
+        top_row = self._rows[self._top] if 0 <= self._top < len(self._rows) else None
+        self._rows = self._walk("", 0)
+        self._index = None
+        self._selection = {iid for iid in self._selection if self.exists(iid)}
+        if self._focus and not self.exists(self._focus): self._focus = ""
+        if top_row is not None:
+            # Una ricerca lineare costa meno dell'indice completo, che potrebbe non servire
+            try: self._top = self._rows.index(top_row)
+            except ValueError: pass
+        self._render()
+
+    # --- Modello delle righe visibili ---
+
+    def _is_open(self, iid):
+        return self._open.get(iid, self._default_open(iid))
+
+    def _walk(self, parent, depth, rows=None):
+        # Righe visibili sotto parent. L'elenco può contenere centinaia di migliaia di righe:
+        # i figli chiusi, di solito quasi tutti, sono aggiunti a blocchi; la ricorsione
+        # scende solo nei nodi aperti (al più la profondità dell'albero).
+        rows = [] if rows is None else rows
+        children = self._children(parent)
+        open_state, default_open = self._open, self._default_open
+        start = 0
+        for position, iid in enumerate(children):
+            if open_state.get(iid) or (iid not in open_state and default_open(iid)):
+                rows.extend(zip(children[start:position + 1], repeat(depth)))
+                self._walk(iid, depth + 1, rows)
+                start = position + 1
+        rows.extend(zip(children[start:], repeat(depth)))
+        return rows
+
+    def _get_index(self):
+        if self._index is None:
+            self._index = {iid: position for position, (iid, _) in enumerate(self._rows)}
+        return self._index
+
+    def _set_open(self, iid, is_open):
+        if self._is_open(iid) == is_open: return
+        if is_open:
+            # Come <<TreeviewOpen>>: l'evento precede l'apertura, così il modello può preparare i figli
+            self._focus = iid
+            self.tree.event_generate(OPEN_EVENT)
+        self._open[iid] = is_open
+        position = self._get_index().get(iid)
+        if position is None: return
+        depth = self._rows[position][1]
+        if is_open:
+            self._rows[position + 1:position + 1] = self._walk(iid, depth + 1)
+        else:
+            end = position + 1
+            while end < len(self._rows) and self._rows[end][1] > depth: end += 1
+            del self._rows[position + 1:end]
+        self._index = None
+        self._render()
+
+    # --- Disegno della finestra visibile ---
+
+    def _row_height(self):
+        try: return max(1, int(ttk.Style().lookup("Treeview", "rowheight") or 20))
+        except (tk.TclError, ValueError): return 20
+
+    def _visible_count(self):
+        height = self.tree.winfo_height()
+        if height <= 1: height = int(self.tree.cget("height")) * self._row_height()
+        header = self._header_height if self._header_height is not None else self._row_height()
+        return max(1, (height - header) // self._row_height() + 1)
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.tree.after_idle(self._render)
+
+    def _render(self):
+        self._render_pending = False
+        visible = self._visible_count()
+        self._top = max(0, min(self._top, len(self._rows) - visible + 1))
+        window = self._rows[self._top:self._top + visible]
+        self.tree.delete(*self.tree.get_children())
+        for iid, _ in window:
+            values, tags, expandable = self._row(iid)
+            mark = (_OPEN_MARK if self._is_open(iid) else _CLOSED_MARK) if expandable else ""
+            self.tree.insert("", "end", iid=iid, text=mark, values=values, tags=tags)
+        shown = [iid for iid, _ in window if iid in self._selection]
+        self.tree.selection_set(shown)
+        if self._focus and self.tree.exists(self._focus): self.tree.focus(self._focus)
+        if window and self._header_height is None and (bbox := self.tree.bbox(window[0][0])):
+            self._header_height = bbox[1]
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if not self._yscroll: return
+        total = len(self._rows)
+        if not total: return self._yscroll(0.0, 1.0)
+        visible = self._visible_count() - 1  # l'ultima riga è mostrata solo in parte
+        self._yscroll(self._top / total, min(1.0, (self._top + visible) / total))
+
+    # --- Mouse e tastiera ---
+
+    def _select_at(self, position, state):
+        iid = self._rows[position][0]
+        if state & _SHIFT and self._anchor in self._get_index():
+            start, end = sorted((self._get_index()[self._anchor], position))
+            self._selection = {row_iid for row_iid, _ in self._rows[start:end + 1]}
+        elif state & _CONTROL:
+            self._selection ^= {iid}
+            self._anchor = iid
+        else:
+            self._selection = {iid}
+            self._anchor = iid
+        self._focus = iid
+        self.see(iid)
+        self.tree.event_generate(SELECT_EVENT)
+
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) in ("heading", "separator"): return None
+        self.tree.focus_set()
+        iid = self.tree.identify_row(event.y)
+        if not iid or (position := self._get_index().get(iid)) is None: return "break"
+        if self.tree.identify_column(event.x) == "#0" and self._row(iid)[2]:
+            self._set_open(iid, not self._is_open(iid))
+            return "break"
+        self._select_at(position, event.state)
+        return "break"
+
+    def _on_double_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        if iid and self.tree.identify_column(event.x) != "#0" and self._row(iid)[2]:
+            self._set_open(iid, not self._is_open(iid))
+        return "break"
+
+    def _on_mousewheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0: step = -3
+        else: step = 3
+        self.yview("scroll", step, "units")
+        return "break"
+
+    def _on_key(self, event):
+        if not self._rows: return None
+        index = self._get_index()
+        position = index.get(self._focus, -1)
+        visible = self._visible_count() - 1
+        moves = {"Up": position - 1, "Down": position + 1, "Prior": position - visible, "Next": position + visible,
+                 "Home": 0, "End": len(self._rows) - 1}
+        if event.keysym in moves:
+            self._select_at(max(0, min(moves[event.keysym], len(self._rows) - 1)), event.state & _SHIFT)
+            return "break"
+        if event.keysym in ("Left", "Right") and position >= 0:
+            iid = self._rows[position][0]
+            if self._row(iid)[2]: self._set_open(iid, event.keysym == "Right")
+            return "break"
+        return None
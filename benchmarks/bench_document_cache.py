@@ -0,0 +1,65 @@
+# benchmarks/bench_document_cache.py - Miniature di un PDF multi-pagina: fitz.open per pagina contro DocumentCache
+#
+# Uso:  python benchmarks/bench_document_cache.py [--pages 400] [--dpi 20]
+#
+# Renderizza tutte le pagine di un PDF sintetico riaprendo il documento per ogni pagina
+# (come anteprima ed esportazioni fino alla v5.12) e con la cache dei documenti aperti.
+# A dpi bassi, come per le miniature, domina il costo di apertura e analisi del file.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+
+from apps.scanner.document_cache import DocumentCache
+
+
+def build_pdf(path, page_count):
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        page.insert_text((50, 50), f"Pagina {i + 1}")
+        for j in range(30):
+            page.draw_rect((10 + j, 10 + j, 100 + j, 100 + j))
+    doc.save(path, deflate=True)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fitz.open per pagina contro DocumentCache")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--dpi", type=int, default=20)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_docs_")
+    try:
+        pdf_path = os.path.join(work_dir, "sintetico.pdf")
+        build_pdf(pdf_path, args.pages)
+
+        start = time.perf_counter()
+        for page_num in range(args.pages):
+            with fitz.open(pdf_path) as doc:
+                doc.load_page(page_num).get_pixmap(dpi=args.dpi)
+        reopen_time = time.perf_counter() - start
+
+        cache = DocumentCache()
+        start = time.perf_counter()
+        for page_num in range(args.pages):
+            cache.get(pdf_path).load_page(page_num).get_pixmap(dpi=args.dpi)
+        cached_time = time.perf_counter() - start
+        cache.clear()
+
+        print(f"Pagine: {args.pages}, {args.dpi} dpi")
+        print(f"Apertura per pagina : {reopen_time:7.2f} s")
+        print(f"DocumentCache       : {cached_time:7.2f} s   ({reopen_time / cached_time:.1f}x)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
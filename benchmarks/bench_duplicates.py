@@ -0,0 +1,92 @@
+# benchmarks/bench_duplicates.py - Ricerca dei doppioni: hash completo di ogni file contro dimensione, hash parziale e hash completo
+#
+# Uso:  python benchmarks/bench_duplicates.py [--files 400] [--size-mb 2] [--copies 20]
+#
+# Crea in una cartella temporanea file casuali (alcuni copiati con un altro nome, altri della
+# stessa dimensione ma diversi) e confronta l'hash completo di tutti i file con DuplicateFinder,
+# senza cache, con la cache dei metadati vuota e di nuovo con la cache piena. Riporta anche i
+# byte letti: sul disco di rete sono loro il costo.
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.scanner.duplicates import DuplicateFinder
+from apps.scanner.metadata_cache import MetadataCache
+
+
+def make_files(folder, count, size, copies):
+    rng = random.Random(0)
+    files = []
+    for i in range(count - copies):
+        # Metà dei file con la stessa dimensione: l'hash parziale deve distinguerli
+        path = os.path.join(folder, f"tavola_{i}.bin")
+        with open(path, "wb") as f: f.write(rng.randbytes(size if i % 2 else size + i))
+        files.append(path)
+    for i in range(copies):
+        path = os.path.join(folder, f"copia_{i}.bin")
+        shutil.copy(files[i * 2 + 1], path)
+        files.append(path)
+    return [(path, os.path.getsize(path)) for path in files]
+
+
+def full_hash_all(files):
+    groups = {}
+    for path, _ in files:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024): digest.update(chunk)
+        groups.setdefault(digest.hexdigest(), []).append(path)
+    return [paths for paths in groups.values() if len(paths) > 1]
+
+
+class CountingFinder(DuplicateFinder):
+    bytes_read = 0
+
+    def _read(self, f, nbytes):
+        data = super()._read(f, nbytes)
+        self.bytes_read += len(data)
+        return data
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Doppioni: hash completo contro confronto a passi")
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--size-mb", type=float, default=2)
+    parser.add_argument("--copies", type=int, default=20)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_dup_")
+    try:
+        files = make_files(folder, args.files, int(args.size_mb * 1024 * 1024), args.copies)
+        total = sum(size for _, size in files)
+        naive, elapsed = timed(full_hash_all, files)
+        print(f"File: {len(files)} ({total / 1024 ** 2:.0f} MB), gruppi di doppioni: {len(naive)}")
+        print(f"{'metodo':<30} {'tempo':>8} {'letti':>10}")
+        print(f"{'hash completo di tutto':<30} {elapsed * 1000:6.0f}ms {total / 1024 ** 2:8.1f}MB")
+        cache = MetadataCache(os.path.join(folder, "metadata.sqlite"))
+        for label, finder_cache in (("a passi, senza cache", None), ("a passi, cache vuota", cache), ("a passi, cache piena", cache)):
+            finder = CountingFinder(finder_cache, read_rate=None)
+            groups, elapsed = timed(finder.run, files)
+            if finder_cache: finder_cache.flush()
+            assert len(groups) == len(naive)
+            print(f"{label:<30} {elapsed * 1000:6.0f}ms {finder.bytes_read / 1024 ** 2:8.1f}MB")
+        cache.close()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
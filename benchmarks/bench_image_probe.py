@@ -0,0 +1,97 @@
+# benchmarks/bench_image_probe.py - Confronto tra Image.open (PIL) e probe_image (solo header)
+#
+# Uso:  python benchmarks/bench_image_probe.py [--count 20] [--width 8000] [--height 6000]
+#
+# Genera un corpus di immagini grandi (JPEG con EXIF, PNG con pHYs, TIFF CMYK
+# multi-pagina) in una cartella temporanea e misura il tempo per ricavare
+# dimensioni, DPI e modalità colore con i due metodi, verificando che i valori coincidano.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from apps.scanner.image_probe import probe_image
+
+Image.MAX_IMAGE_PIXELS = None
+
+
+def build_corpus(folder, count, width, height):
+    base = Image.radial_gradient("L").resize((width, height))
+    rgb = Image.merge("RGB", (base, base.transpose(Image.Transpose.FLIP_LEFT_RIGHT), base.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+    cmyk = rgb.convert("CMYK")
+    exif = Image.Exif()
+    exif[0x0128], exif[0x011A], exif[0x011B] = 2, 300.0, 300.0
+    templates = [
+        ("jpg", lambda path: rgb.save(path, "JPEG", quality=90, exif=exif.tobytes())),
+        ("png", lambda path: rgb.save(path, "PNG", dpi=(150, 150), compress_level=1)),
+        ("tif", lambda path: cmyk.save(path, "TIFF", dpi=(300, 300), compression="tiff_lzw", save_all=True, append_images=[cmyk.reduce(4)])),
+    ]
+    paths = []
+    for i in range(count):
+        ext, save = templates[i % len(templates)]
+        path = os.path.join(folder, f"img_{i:04d}.{ext}")
+        save(path)
+        paths.append(path)
+    return paths
+
+
+def read_with_pil(path):
+    with Image.open(path) as img:
+        return {"size": img.size, "mode": img.mode, "dpi": img.info.get("dpi")}
+
+
+def normalise(info):
+    dpi = tuple(round(float(v), 4) for v in info["dpi"]) if info["dpi"] else None
+    return info["size"], info["mode"], dpi
+
+
+def time_reader(reader, paths, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            reader(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confronto tra Image.open e probe_image")
+    parser.add_argument("--count", type=int, default=15, help="numero di immagini da generare")
+    parser.add_argument("--width", type=int, default=8000)
+    parser.add_argument("--height", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=5, help="ripetizioni (si tiene la migliore)")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="winfile_bench_")
+    try:
+        print(f"Generazione di {args.count} immagini {args.width}x{args.height} in {folder}...")
+        paths = build_corpus(folder, args.count, args.width, args.height)
+        total_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+
+        fallbacks = 0
+        for path in paths:
+            probed = probe_image(path)
+            if probed is None:
+                fallbacks += 1
+            elif normalise(probed) != normalise(read_with_pil(path)):
+                raise SystemExit(f"Valori diversi per {path}: {probed} != {read_with_pil(path)}")
+
+        pil_time = time_reader(read_with_pil, paths, args.repeat)
+        probe_time = time_reader(probe_image, paths, args.repeat)
+        print(f"Corpus: {len(paths)} file, {total_mb:.1f} MB, fallback su PIL: {fallbacks}")
+        print(f"PIL Image.open : {pil_time * 1000:8.2f} ms  ({pil_time / len(paths) * 1e6:8.1f} us/file)")
+        print(f"probe_image    : {probe_time * 1000:8.2f} ms  ({probe_time / len(paths) * 1e6:8.1f} us/file)")
+        print(f"Speedup        : {pil_time / probe_time:8.2f}x")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
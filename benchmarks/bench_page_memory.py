@@ -0,0 +1,84 @@
+# benchmarks/bench_page_memory.py - Memoria per pagina: dizionari contro PageTable
+#
+# Uso:  python benchmarks/bench_page_memory.py [--pages 200000]
+#
+# Misura con tracemalloc la memoria occupata dalle dimensioni di pagina nella forma
+# usata fino alla v5.7 (un dizionario per pagina con stringhe già formattate) e in
+# PageTable, e confronta il tempo dei totali di area.
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.scanner.page_table import PageTable, page_totals
+
+
+def build_pages(count):
+    rng = random.Random(1)
+    files, pages_left = [], count
+    while pages_left > 0:
+        page_count = min(pages_left, rng.choice((1, 1, 1, 2, 8)))
+        pages = []
+        for _ in range(page_count):
+            w, h = rng.uniform(10, 300), rng.uniform(10, 300)
+            page = {"dimensions_cm": f"{w:.2f} x {h:.2f}", "width_cm": w, "height_cm": h, "area_sqm": w * h / 10000}
+            if rng.random() < 0.3:
+                tw, th = w - 0.6, h - 0.6
+                page.update({"trim_dimensions_cm": f"{tw:.2f} x {th:.2f}", "trim_width_cm": tw, "trim_height_cm": th, "trim_area_sqm": tw * th / 10000})
+            pages.append(page)
+        files.append(pages)
+        pages_left -= page_count
+    return files
+
+
+def measure(factory):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = factory()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria per pagina: dizionari contro PageTable")
+    parser.add_argument("--pages", type=int, default=200000)
+    args = parser.parse_args()
+
+    # Per i dizionari si misura anche la creazione di stringhe e float, come durante una scansione;
+    # per PageTable solo la tabella, non i dizionari di partenza
+    dict_files, dict_bytes = measure(lambda: build_pages(args.pages))
+    source = build_pages(args.pages)
+    table = None
+
+    def build_table():
+        nonlocal table
+        table = PageTable()
+        page_lists = [table.add(pages) for pages in source]
+        table.shrink()
+        return page_lists
+
+    table_files, table_bytes = measure(build_table)
+
+    start = time.perf_counter()
+    dict_totals = (sum(p.get('area_sqm', 0) for pages in dict_files for p in pages),
+                   sum(p.get('trim_area_sqm', p.get('area_sqm', 0)) for pages in dict_files for p in pages))
+    dict_time = time.perf_counter() - start
+    start = time.perf_counter()
+    table_totals = page_totals(table_files)
+    table_time = time.perf_counter() - start
+    if any(abs(a - b) > 1e-6 for a, b in zip(dict_totals, table_totals)):
+        raise SystemExit(f"Totali diversi: {dict_totals} != {table_totals}")
+
+    print(f"Pagine: {args.pages} in {len(source)} file")
+    print(f"Dizionari : {dict_bytes / 1e6:8.1f} MB  ({dict_bytes / args.pages:6.0f} byte/pagina)   totali {dict_time * 1000:7.1f} ms")
+    print(f"PageTable : {table_bytes / 1e6:8.1f} MB  ({table_bytes / args.pages:6.0f} byte/pagina)   totali {table_time * 1000:7.1f} ms")
+    print(f"Riduzione : {dict_bytes / table_bytes:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
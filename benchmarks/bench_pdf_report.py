@@ -0,0 +1,155 @@
+# benchmarks/bench_pdf_report.py - Report PDF: story completa con PNG (v5.15) contro streaming con JPEG
+#
+# Uso:  python benchmarks/bench_pdf_report.py [--items 5000] [--columns 4] [--photos 40] [--workers N] [--solo-streaming]
+#
+# Crea un PDF sintetico e alcune foto, poi un report di --items celle (quattro pagine
+# PDF ogni foto) in due modi:
+#   - v5.15: tutta la story in memoria prima di doc.build, pagine PDF in PNG a 150 dpi
+#     e immagini in PNG entro 400x400 px;
+#   - streaming: StreamingDocTemplate, miniature JPEG alla dimensione della cella stampata,
+#     renderizzate una alla volta;
+#   - parallelo: come streaming, con le miniature renderizzate dal RenderPool (come il
+#     report dell'app) in anticipo sull'impaginazione.
+# Misura con tracemalloc il picco di memoria Python (i byte delle miniature, la story e
+# gli oggetti ReportLab), il tempo e la dimensione del file prodotto. La versione v5.15
+# usa circa 5 MB per cella: oltre qualche centinaio di celle conviene --solo-streaming.
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Image as ReportLabImage, Paragraph, SimpleDocTemplate, Table
+
+from apps.scanner.document_cache import shared_documents
+from apps.scanner.render_pool import DEFAULT_RENDER_WORKERS, RenderPool
+from apps.scanner.report_writer import REPORT_THUMB_DPI, StreamingDocTemplate, report_thumb_size
+from apps.scanner.thumbnails import render_thumbnail
+
+MARGINS = dict(topMargin=1.5*cm, bottomMargin=1.5*cm, leftMargin=1.5*cm, rightMargin=1.5*cm)
+
+
+def build_files(work_dir, pdf_pages, photos):
+    pdf_path = os.path.join(work_dir, "tavole.pdf")
+    doc = fitz.open()
+    for i in range(pdf_pages):
+        page = doc.new_page()
+        for j in range(12):
+            page.draw_rect((40 + j * 40, 100 + j * 30, 120 + j * 40, 260 + j * 30), color=(0, 0, 0.6), fill=(j / 12, 0.8, 0.4))
+        page.insert_text((50, 60), f"Tavola {i + 1}", fontsize=24)
+    doc.save(pdf_path)
+    doc.close()
+    rng = np.random.default_rng(0)
+    photo_paths = []
+    for i in range(photos):
+        pixels = rng.integers(0, 255, size=(1, 1, 3), dtype=np.uint8) + np.linspace(0, 60, 3000, dtype=np.uint8)[None, :, None]
+        photo = Image.fromarray(np.broadcast_to(pixels, (2000, 3000, 3)).copy(), "RGB")
+        photo_paths.append(os.path.join(work_dir, f"foto{i:03d}.jpg"))
+        photo.save(photo_paths[-1], quality=90)
+    return pdf_path, photo_paths
+
+
+def report_items(count, pdf_path, pdf_pages, photo_paths):
+    # Quattro pagine PDF ogni foto
+    items = []
+    for i in range(count):
+        if i % 5 == 4: items.append((photo_paths[(i // 5) % len(photo_paths)], "JPG", 0))
+        else: items.append((pdf_path, "PDF", i % pdf_pages))
+    return items
+
+
+def cell(img_data, image_width, label, style):
+    content = [ReportLabImage(io.BytesIO(img_data), width=image_width, height=image_width, kind='proportional')] if img_data else []
+    return content + [Paragraph(label, style)]
+
+
+def rows(cells, columns):
+    for start in range(0, len(cells), columns):
+        row = cells[start:start + columns]
+        yield row + [""] * (columns - len(row))
+
+
+def legacy_report(out_path, items, columns):
+    doc = SimpleDocTemplate(out_path, pagesize=A4, **MARGINS)
+    style = getSampleStyleSheet()['Normal']
+    col_width = (doc.width / columns) - (cm * 0.2 * (columns - 1))
+    cells = []
+    for n, (path, file_type, page_num) in enumerate(items):
+        max_size = None if file_type == "PDF" else (400, 400)
+        img_data = render_thumbnail((path, file_type, page_num, 150, max_size, "PNG", 85, None))
+        cells.append(cell(img_data, col_width * 0.9, f"Elemento {n + 1}", style))
+    story = [Table(list(rows(cells, columns)), colWidths=[col_width] * columns)]
+    doc.build(story)
+
+
+def streaming_report(out_path, items, columns, pool=None):
+    doc = StreamingDocTemplate(out_path, pagesize=A4, **MARGINS)
+    style = getSampleStyleSheet()['Normal']
+    col_width = (doc.width / columns) - (cm * 0.2 * (columns - 1))
+    thumb_size = report_thumb_size(col_width * 0.9)
+    jobs = [(path, file_type, page_num, REPORT_THUMB_DPI, thumb_size, "JPEG", 85, None) for path, file_type, page_num in items]
+    images = pool.imap(render_thumbnail, jobs) if pool else (render_thumbnail(job) for job in jobs)
+
+    def flowables():
+        for start in range(0, len(items), columns):
+            cells = [cell(next(images), col_width * 0.9, f"Elemento {start + n + 1}", style) for n in range(min(columns, len(items) - start))]
+            yield Table(list(rows(cells, columns)), colWidths=[col_width] * columns)
+
+    with contextlib.closing(images):
+        doc.build_streaming(flowables())
+
+
+def pooled_report(out_path, items, columns, workers):
+    streaming_report(out_path, items, columns, RenderPool(max_workers=workers, ahead=64))
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    shared_documents.clear()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report PDF: story completa contro streaming")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--pdf-pages", type=int, default=50)
+    parser.add_argument("--photos", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=DEFAULT_RENDER_WORKERS)
+    parser.add_argument("--solo-streaming", action="store_true", help="salta la versione v5.15")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_report_")
+    try:
+        pdf_path, photo_paths = build_files(work_dir, args.pdf_pages, args.photos)
+        items = report_items(args.items, pdf_path, args.pdf_pages, photo_paths)
+        print(f"Celle: {args.items}, colonne: {args.columns}, worker: {args.workers}, core: {os.cpu_count()}")
+        print(f"{'':<10} {'tempo':>9} {'picco mem.':>11} {'file':>10}")
+        variants = [("v5.15", legacy_report, ()), ("streaming", streaming_report, ()), ("parallelo", pooled_report, (args.workers,))]
+        for label, func, extra in variants[1:] if args.solo_streaming else variants:
+            out_path = os.path.join(work_dir, f"report_{label}.pdf")
+            elapsed, peak = measure(func, out_path, items, args.columns, *extra)
+            print(f"{label:<10} {elapsed:8.1f}s {peak / 1024 / 1024:8.1f} MB {os.path.getsize(out_path) / 1024 / 1024:7.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
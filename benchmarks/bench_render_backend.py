@@ -0,0 +1,67 @@
+# benchmarks/bench_render_backend.py - Miniature PDF: RenderPool con thread contro processi
+#
+# Uso:  python benchmarks/bench_render_backend.py [--pages 1000] [--workers N] [--dpi 150]
+#
+# Crea un PDF sintetico (testo e grafica vettoriale su ogni pagina) in una cartella
+# temporanea e renderizza tutte le pagine come PNG, come il report PDF, con i due backend
+# del RenderPool. Con i processi il guadagno cresce con il numero di core: la
+# rasterizzazione, il ridimensionamento e la codifica PNG non si contendono il GIL.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+
+from apps.scanner.render_pool import DEFAULT_RENDER_WORKERS, RenderPool
+from apps.scanner.thumbnails import render_thumbnail, thumbnail_job
+
+
+def build_pdf(path, page_count):
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page(width=842, height=595)
+        for j in range(40):
+            page.draw_circle((40 + j * 19, 300), 12 + j % 7, color=(j / 40, 0.2, 0.6), fill=(0.9, j / 40, 0.3))
+        page.insert_text((50, 60), f"Tavola {i + 1} - " + "testo di prova " * 6, fontsize=14)
+    doc.save(path)
+    doc.close()
+
+
+def run(pool, jobs):
+    start = time.perf_counter()
+    encoded = sum(len(data) for data in pool.imap(render_thumbnail, jobs))
+    return time.perf_counter() - start, encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Miniature PDF: thread contro processi")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_RENDER_WORKERS)
+    parser.add_argument("--dpi", type=int, default=150)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_render_")
+    try:
+        pdf_path = os.path.join(work_dir, "sintetico.pdf")
+        build_pdf(pdf_path, args.pages)
+        file_info = {"path": work_dir, "filename": "sintetico.pdf", "type": "PDF"}
+        jobs = [thumbnail_job(file_info, n, args.dpi) for n in range(args.pages)]
+
+        print(f"Pagine: {args.pages}, worker: {args.workers}, core: {os.cpu_count()}, {args.dpi} dpi")
+        thread_time, thread_bytes = run(RenderPool(max_workers=args.workers), jobs)
+        process_time, process_bytes = run(RenderPool(max_workers=args.workers, processes=True), jobs)
+        if thread_bytes != process_bytes:
+            raise SystemExit("I due backend hanno prodotto immagini diverse")
+        print(f"Thread   : {thread_time:7.2f} s  ({args.pages / thread_time:6.1f} pag/s)")
+        print(f"Processi : {process_time:7.2f} s  ({args.pages / process_time:6.1f} pag/s)   {thread_time / process_time:.2f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
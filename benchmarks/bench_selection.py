@@ -0,0 +1,124 @@
+# benchmarks/bench_selection.py - Selezione di righe: ricerca lineare (v5.6) contro ResultStore
+#
+# Uso:  python benchmarks/bench_selection.py [--files 10000] [--select 10000]
+#
+# Costruisce in memoria un elenco di risultati simile a quello di una scansione
+# (un file su cinque multi-pagina) e misura, per le stesse righe selezionate:
+#   - la ricerca dei dati di ogni riga (anteprima / doppio clic)
+#   - il calcolo delle pagine per "Esporta selezione"
+# con gli iid basati sul percorso e la ricerca lineare della versione precedente,
+# e con gli id interi di ResultStore. Con i valori predefiniti la versione lineare richiede circa due minuti.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.scanner.results import ResultStore
+
+
+def build_results(count):
+    results = []
+    for i in range(count):
+        page_count = 4 if i % 5 == 0 else 1
+        scan_root = os.path.join(os.sep, "lavori", f"cliente_{i % 20:02d}")
+        results.append({
+            "filename": f"tavola{i:06d}.pdf", "path": os.path.join(scan_root, f"sotto_{i % 7}"), "scan_root": scan_root,
+            "page_count": page_count,
+            "pages_details": [{"dimensions_cm": "21.00 x 29.70", "width_cm": 21.0, "height_cm": 29.7, "area_sqm": 0.06237}] * page_count,
+        })
+    return results
+
+
+# --- Versione precedente: iid con il percorso e scansione lineare di scan_results ---
+
+def legacy_iids(results):
+    iids = []
+    for fi in results:
+        path_id = os.path.join(fi['path'], fi['filename'])
+        if fi['page_count'] > 1:
+            iids.append(f"file_{path_id}")
+            iids.extend(f"{path_id}_{n}" for n in range(fi['page_count']))
+        else:
+            iids.append(f"{path_id}_0")
+    return iids
+
+
+def legacy_find(scan_results, item_id):
+    if not item_id or item_id.startswith("folder_"): return None, -1
+    path_part, page_to_show = item_id.replace("file_", ""), 0
+    if "_" in os.path.basename(path_part):
+        try:
+            base_path, page_str = path_part.rsplit('_', 1)
+            page_to_show = int(page_str)
+            path_part = base_path
+        except ValueError: pass
+    for data in scan_results:
+        if os.path.join(data['path'], data['filename']) == path_part:
+            return data, page_to_show
+    return None, -1
+
+
+def legacy_pages_for(scan_results, sel):
+    selected_pages_set = set()
+    for iid in sel:
+        data, page_num = legacy_find(scan_results, iid)
+        if data:
+            if iid.startswith("file_"):
+                for pn in range(data.get('page_count', 1)):
+                    selected_pages_set.add((data['path'], data['filename'], pn))
+            else:
+                selected_pages_set.add((data['path'], data['filename'], page_num))
+    all_pages = [{'file_info': fi, 'page_num': pn} for fi in scan_results for pn in range(fi.get('page_count', 1))]
+    return [p for p in all_pages if (p['file_info']['path'], p['file_info']['filename'], p['page_num']) in selected_pages_set]
+
+
+# --- ResultStore ---
+
+def store_iids(store, results):
+    iids = []
+    for fi in results:
+        file_id = store.id_of(fi)
+        iids.append(store.file_iid(file_id))
+        if fi['page_count'] > 1:
+            iids.extend(store.page_iid(file_id, n) for n in range(fi['page_count']))
+    return iids
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Selezione di righe: ricerca lineare contro ResultStore")
+    parser.add_argument("--files", type=int, default=10000, help="numero di file nei risultati")
+    parser.add_argument("--select", type=int, default=10000, help="righe selezionate")
+    args = parser.parse_args()
+
+    results = build_results(args.files)
+    store = ResultStore()
+    store.sync(results)
+    old_rows, new_rows = legacy_iids(results), store_iids(store, results)
+    picked = sorted(random.Random(1).sample(range(len(old_rows)), min(args.select, len(old_rows))))
+    old_sel, new_sel = [old_rows[i] for i in picked], [new_rows[i] for i in picked]
+    print(f"Risultati: {len(results)} file, {len(old_rows)} righe; selezionate {len(picked)} righe")
+
+    old_lookup, old_found = timed(lambda: [legacy_find(results, iid) for iid in old_sel])
+    new_lookup, new_found = timed(lambda: [store.lookup(iid)[:2] for iid in new_sel])
+    old_pages_time, old_pages = timed(legacy_pages_for, results, old_sel)
+    new_pages_time, new_pages = timed(store.pages_for, new_sel)
+    if [(id(fi), pn) for fi, pn in old_found] != [(id(fi), pn) for fi, pn in new_found]:
+        raise SystemExit("Le due ricerche restituiscono righe diverse")
+    if [(id(p['file_info']), p['page_num']) for p in old_pages] != [(id(p['file_info']), p['page_num']) for p in new_pages]:
+        raise SystemExit("Le due selezioni restituiscono pagine diverse")
+
+    print(f"Ricerca righe   - lineare: {old_lookup * 1000:10.1f} ms   ResultStore: {new_lookup * 1000:8.2f} ms   ({old_lookup / new_lookup:,.0f}x)")
+    print(f"Pagine export   - lineare: {old_pages_time * 1000:10.1f} ms   ResultStore: {new_pages_time * 1000:8.2f} ms   ({old_pages_time / new_pages_time:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_sort.py - Ordinamento della tabella: chiavi ricalcolate a ogni clic contro chiavi precalcolate
+#
+# Uso:  python benchmarks/bench_sort.py [--files 100000] [--folders 300]
+#
+# Crea risultati sintetici (file in sottocartelle, una pagina ciascuno) in un ScanEngine e
+# confronta, per ogni colonna, l'ordinamento fino alla v5.21 (list.sort con lambda che
+# ricalcolano percorso relativo e minuscole) con ScanEngine.sort (np.lexsort sulle chiavi
+# calcolate all'ingresso dei file). Misura anche il costo di calcolo delle chiavi.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.scanner.engine import ScanEngine
+
+
+def synthetic_files(count, folders):
+    rng = random.Random(0)
+    files = []
+    for i in range(count):
+        width, height = rng.uniform(10, 300), rng.uniform(10, 300)
+        files.append({"filename": f"Tavola_{rng.randrange(count)}_{i}.pdf", "type": "PDF", "page_count": 1, "scan_root": "/lavori",
+                      "path": f"/lavori/cliente{rng.randrange(folders)}/ordine{rng.randrange(20)}",
+                      "pages_details": [{"dimensions_cm": f"{width:.2f} x {height:.2f}", "width_cm": width, "height_cm": height,
+                                         "area_sqm": width * height / 10000}]})
+    return files
+
+
+def legacy_sort(engine, col, reverse):
+    if col == "filename": sort_key = lambda item: item['filename'].lower()
+    elif col == "path": sort_key = lambda item: engine.subfolder_of(item).lower()
+    else:
+        def sort_key(item):
+            page_detail = item['pages_details'][0]
+            return page_detail.get('trim_area_sqm', page_detail.get('area_sqm', 0))
+    engine.results.sort(key=sort_key, reverse=reverse)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ordinamento: lambda contro chiavi precalcolate")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--folders", type=int, default=300)
+    args = parser.parse_args()
+
+    files = synthetic_files(args.files, args.folders)
+    engine = ScanEngine()
+    ingest = timed(engine.add_files, files)
+    keys = timed(engine._index, engine.results)
+    print(f"File: {len(engine.results)}, ingresso {ingest:.2f} s (di cui chiavi di ordinamento circa {keys:.2f} s)")
+    print(f"{'colonna':<28} {'v5.21':>8} {'chiavi':>8} {'di nuovo':>9}")
+    for columns in ([("filename", False)], [("path", False)], [("area_sqm", True)], [("path", False), ("filename", False)]):
+        label = ", ".join(f"{col}{' ▼' if reverse else ''}" for col, reverse in columns)
+        # La versione v5.21 ordinava una colonna alla volta
+        legacy = sum(timed(legacy_sort, engine, col, reverse) for col, reverse in reversed(columns))
+        first = timed(engine.sort, columns)
+        again = timed(engine.sort, columns)
+        print(f"{label:<28} {legacy * 1000:6.0f}ms {first * 1000:6.0f}ms {again * 1000:7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
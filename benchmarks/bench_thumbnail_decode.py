@@ -0,0 +1,127 @@
+# benchmarks/bench_thumbnail_decode.py - Miniature di file grandi: decodifica completa contro risoluzione ridotta
+#
+# Uso:  python benchmarks/bench_thumbnail_decode.py [--scale 1.0] [--size 750] [--dpi 150] [--repeat 3]
+#
+# Crea in una cartella temporanea file sintetici di grande formato (JPEG RGB e CMYK,
+# TIFF piramidale con versioni ridotte, PDF con una tavola A0 vettoriale) e confronta il
+# rendering delle miniature fino alla v5.14 (decodifica a piena risoluzione, poi
+# thumbnail) con quello attuale (draft JPEG, versione ridotta del TIFF, pagina PDF
+# rasterizzata direttamente alla dimensione finale). Con --scale si riducono i file
+# sintetici su macchine con poca memoria (a 1.0 il JPEG è 12000x8000 pixel).
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+from apps.scanner.document_cache import shared_documents
+from apps.scanner.thumbnails import _render
+
+
+def synthetic_image(width, height):
+    # Gradienti e rumore: un contenuto che il JPEG non comprime a costo zero
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    rgb[..., 0] = x
+    rgb[..., 1] = y
+    rgb[..., 2] = (x + y) / 2
+    rgb ^= np.random.default_rng(0).integers(0, 24, size=(1, width, 3), dtype=np.uint8)
+    return Image.fromarray(rgb, "RGB")
+
+
+def build_pyramid_tiff(path, image):
+    """TIFF con la pagina a piena risoluzione seguita da versioni ridotte (NewSubfileType = 1)."""
+    with TiffImagePlugin.AppendingTiffWriter(path, new=True) as tf:
+        level, reduced = image, False
+        while min(level.size) >= 256:
+            info = TiffImagePlugin.ImageFileDirectory_v2()
+            if reduced: info[254] = 1
+            level.save(tf, format="TIFF", tiffinfo=info, compression="tiff_deflate")
+            tf.newFrame()
+            level, reduced = level.reduce(2), True
+
+
+def build_pdf(path):
+    doc = fitz.open()
+    page = doc.new_page(width=2384, height=3370)   # A0
+    for i in range(400):
+        page.draw_circle((100 + (i * 53) % 2200, 100 + (i * 31) % 3200), 20 + i % 60,
+                         color=(i / 400, 0.2, 0.6), fill=(0.9, (i * 7 % 400) / 400, 0.3))
+    page.insert_text((100, 80), "Tavola A0 - " + "testo di prova " * 10, fontsize=28)
+    doc.save(path)
+    doc.close()
+
+
+def legacy_render(full_path, file_type, pdf_dpi, max_size):
+    """Pipeline fino alla v5.14: tutto a piena risoluzione, poi ridimensionamento."""
+    if file_type == "PDF":
+        pix = shared_documents.get(full_path).load_page(0).get_pixmap(dpi=pdf_dpi)
+        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    else:
+        with Image.open(full_path) as source:
+            img = source.convert("RGB") if source.mode != "RGB" else source.copy()
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+def best_of(repeat, func, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Miniature di file grandi: piena risoluzione contro risoluzione ridotta")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--size", type=int, default=750, help="lato massimo della miniatura (esportazione HTML standard: 750)")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = int(12000 * args.scale), int(8000 * args.scale)
+    max_size = (args.size, args.size)
+    work_dir = tempfile.mkdtemp(prefix="bench_decode_")
+    try:
+        image = synthetic_image(width, height)
+        files = [("JPEG RGB", "grande.jpg", "JPG"), ("JPEG CMYK", "grande_cmyk.jpg", "JPG"),
+                 ("TIFF piramidale", "grande.tif", "TIF"), ("PDF A0 vettoriale", "tavola.pdf", "PDF")]
+        image.save(os.path.join(work_dir, "grande.jpg"), quality=90)
+        image.convert("CMYK").save(os.path.join(work_dir, "grande_cmyk.jpg"), quality=90)
+        build_pyramid_tiff(os.path.join(work_dir, "grande.tif"), image)
+        del image
+        build_pdf(os.path.join(work_dir, "tavola.pdf"))
+
+        print(f"Immagini {width}x{height}, miniatura max {args.size}px, PDF a {args.dpi} dpi, migliore di {args.repeat}")
+        print(f"{'File':<18} {'MB':>6} {'v5.14':>9} {'ridotta':>9} {'guadagno':>9}")
+        for label, filename, file_type in files:
+            full_path = os.path.join(work_dir, filename)
+            legacy_time, legacy = best_of(args.repeat, legacy_render, full_path, file_type, args.dpi, max_size)
+            reduced_time, reduced = best_of(args.repeat, _render, full_path, file_type, 0, args.dpi, max_size, "JPEG", 85)
+            shared_documents.clear()
+            if reduced is None:
+                raise SystemExit(f"Rendering non riuscito: {filename}")
+            if Image.open(io.BytesIO(legacy)).size != Image.open(io.BytesIO(reduced)).size:
+                raise SystemExit(f"Dimensioni della miniatura diverse: {filename}")
+            size_mb = os.path.getsize(full_path) / 1024 / 1024
+            print(f"{label:<18} {size_mb:6.1f} {legacy_time:8.3f}s {reduced_time:8.3f}s {legacy_time / reduced_time:8.1f}x")
+    finally:
+        shared_documents.clear()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,7 +20,8 @@ packages = [
     "numpy",
     "cv2",
     "ezdxf",
-    "matplotlib"
+    "matplotlib",
+    "apps" # Moduli condivisi importati dalle app (es. apps.scanner, apps.widgets)
 ]
 
 # --- NUOVO: Trova e include automaticamente la cartella dati di matplotlib ---
@@ -0,0 +1,96 @@
+# tests/test_watch.py - Sorveglianza delle cartelle: eventi persi (coda inotify piena)
+#
+# Uso:  python -m pytest tests   (oppure python -m unittest discover tests)
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.scanner import SCAN_BATCH, WATCH_CHANGES, InotifyBackend, ScanEngine, ScanJob, full_path_of
+from apps.scanner.watch import _EVENT, IN_CLOEXEC, IN_NONBLOCK, IN_Q_OVERFLOW
+
+
+def make_image(path, size):
+    Image.new("RGB", size, "white").save(path, dpi=(72, 72))
+
+
+class OverflowBackend:
+    """Backend che, a ogni segnale del test, riporta le sorgenti intere come InotifyBackend dopo IN_Q_OVERFLOW."""
+    name = "overflow"
+
+    def __init__(self):
+        self.overflow = threading.Semaphore(0)
+
+    def run(self, sources, on_paths, job, on_warning=None):
+        while not job.cancelled:
+            if self.overflow.acquire(timeout=0.1): on_paths(list(sources))
+
+
+class OverflowTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test_watch_")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        for name in ("a.png", "b.png", "c.png"): make_image(self.path(name), (100, 100))
+        self.engine = ScanEngine()
+        self.engine.subscribe(SCAN_BATCH, self.engine.add_files)
+        self.engine.add_sources([self.root])
+        self.engine.scan([self.root], max_workers=2)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_overflow_reports_only_differences(self):
+        backend, job, batches, received = OverflowBackend(), ScanJob(), [], threading.Semaphore(0)
+
+        def on_changes(updated, gone, batch_job):
+            batches.append((sorted(item['filename'] for item in updated), sorted(gone)))
+            self.engine.apply_watch(updated, gone)
+            received.release()
+
+        self.engine.subscribe(WATCH_CHANGES, on_changes)
+        watch = threading.Thread(target=self.engine.watch, args=(self.engine.refresh_snapshot(), job, backend, 2), daemon=True)
+        watch.start()
+        self.addCleanup(watch.join, 5)
+        self.addCleanup(job.cancel)
+
+        make_image(self.path("d.png"), (100, 100))
+        make_image(self.path("b.png"), (200, 100))
+        st = os.stat(self.path("b.png"))
+        os.utime(self.path("b.png"), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        os.remove(self.path("c.png"))
+        backend.overflow.release()
+        self.assertTrue(received.acquire(timeout=10))
+        self.assertEqual(batches[0], (["b.png", "d.png"], [self.path("c.png")]))
+        self.assertEqual(sorted(map(full_path_of, self.engine.results)), [self.path(n) for n in ("a.png", "b.png", "d.png")])
+        self.assertEqual(self.engine.find(self.path("b.png"))['w_px'], 200)
+
+        # Le firme note seguono i gruppi già consegnati: un nuovo overflow riporta solo il file aggiunto dopo
+        make_image(self.path("e.png"), (100, 100))
+        backend.overflow.release()
+        self.assertTrue(received.acquire(timeout=10))
+        self.assertEqual(batches[1], (["e.png"], []))
+
+
+@unittest.skipUnless(InotifyBackend.available(), "inotify non disponibile")
+class InotifyOverflowTest(unittest.TestCase):
+    def test_overflow_reports_sources_and_rewatches_them(self):
+        root = tempfile.mkdtemp(prefix="test_watch_")
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        backend = InotifyBackend()
+        backend._fd = backend._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        self.addCleanup(os.close, backend._fd)
+        # Cartella creata mentre gli eventi andavano persi: ancora senza watch
+        os.makedirs(os.path.join(root, "nuova"))
+        touched = backend._parse(_EVENT.pack(-1, IN_Q_OVERFLOW, 0, 0), [root])
+        self.assertEqual(touched, [root])
+        self.assertIn(os.path.join(root, "nuova"), backend._dirs.values())
+
+
+if __name__ == "__main__":
+    unittest.main()
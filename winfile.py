@@ -1,4 +1,11 @@
 # winfile.py - v2.2
+import sys
+
+# Modalità batch senza interfaccia (python -m winfile scan ...): si avvia prima di importare Tk
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "scan":
+    from apps.cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
 import customtkinter as ctk
 import os
 import importlib.util
@@ -15,7 +22,7 @@ import webbrowser
 from packaging import version
 import tempfile # Aggiunto per la cartella temporanea
 import subprocess # Aggiunto per avviare l'installer
-import sys # Aggiunto per ottenere il percorso dell'eseguibile
+import multiprocessing
 
 # --- CONFIGURAZIONE AGGIORNAMENTI ---
 GITHUB_REPO = "Mobbys/WinFile" 
@@ -321,6 +328,8 @@ def save_config(config_data):
         print(f"Errore: Impossibile salvare la configurazione in 'config.json': {e}")
 
 if __name__ == "__main__":
+    # Necessario nell'eseguibile cx_Freeze per i processi di rendering delle esportazioni
+    multiprocessing.freeze_support()
     config = {
         "window": {"width": 1200, "height": 700, "min_width": 800, "min_height": 600},
         "theme": {"appearance_mode": "System", "color_theme": "blue"},